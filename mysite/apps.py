@@ -0,0 +1,12 @@
+"""mysite application configuration."""
+from django.apps import AppConfig
+
+
+class MysiteConfig(AppConfig):
+    """App configuration."""
+
+    name = 'mysite'
+
+    def ready(self):
+        """Connect the database connection hooks."""
+        from . import db  # noqa: F401
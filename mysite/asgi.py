@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')
+# Under ASGI serve the async polls views, which stay on the event loop.
+os.environ.setdefault('POLLS_ASYNC_VIEWS', 'true')
 
 application = get_asgi_application()
@@ -0,0 +1,40 @@
+"""Database connection profiles for mysite.
+
+``DB_PROFILE`` names one of the SQLite profiles below; its pragmas are run
+on every new SQLite connection by the connection_created hook.  Other
+backends are configured through ``DATABASE_URL`` and ignore the profile.
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+SQLITE_PROFILES = {
+    # SQLite defaults: rollback journal, full sync, no busy timeout.
+    'default': {},
+    # Write-ahead log so readers never block the writer, one fsync per
+    # checkpoint instead of per commit, memory-mapped reads, and writers
+    # that wait for the lock instead of failing with "database is locked".
+    'tuned': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 256 * 1024 * 1024,
+        'busy_timeout': 5000,
+        'temp_store': 'MEMORY',
+        'cache_size': -20000,
+    },
+}
+
+
+def sqlite_pragmas(profile):
+    """Return the pragma statements of the SQLite profile."""
+    return [f'PRAGMA {name} = {value}' for name, value in SQLITE_PROFILES[profile].items()]
+
+
+@receiver(connection_created)
+def apply_sqlite_profile(sender, connection, **kwargs):
+    """Run the pragmas of DB_PROFILE on a new SQLite connection."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for statement in sqlite_pragmas(getattr(settings, 'DB_PROFILE', 'default')):
+            cursor.execute(statement)
@@ -0,0 +1,49 @@
+"""Test runner for mysite.
+
+``TEST_RUNNER`` points here, so the settings below apply to every way of
+running the suite (``manage.py test``, ``django-admin test``) instead of
+depending on how the command line looks.
+"""
+from django.db import connections
+from django.db.models.signals import post_migrate
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+def checkpoint_sqlite(using, **kwargs):
+    """Move the write-ahead log of the SQLite test database into its file.
+
+    ``--parallel`` clones a file test database by copying the main file
+    only, so with the WAL journal of the tuned profile the clones would
+    miss the tables that are still in the log.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+
+class TestRunner(DiscoverRunner):
+    """Discover runner with a fast password hasher and clonable SQLite databases."""
+
+    def setup_test_environment(self, **kwargs):
+        """Hash passwords with MD5: the default hasher is slow on purpose
+        and would take most of the time of every test login.
+        """
+        super().setup_test_environment(**kwargs)
+        self._fast_hashers = override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+        self._fast_hashers.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        """Restore the password hashers."""
+        self._fast_hashers.disable()
+        super().teardown_test_environment(**kwargs)
+
+    def setup_databases(self, **kwargs):
+        """Create the test databases, checkpointing SQLite after each migration."""
+        post_migrate.connect(checkpoint_sqlite, dispatch_uid='mysite.test_runner')
+        try:
+            return super().setup_databases(**kwargs)
+        finally:
+            post_migrate.disconnect(dispatch_uid='mysite.test_runner')
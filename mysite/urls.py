@@ -20,6 +20,7 @@ from . import views
 urlpatterns = [
     path('', views.index, name="main"),
     path('polls/', include('polls.urls')),
+    path('api/polls/', include('polls.api_urls')),
     path('accounts/', include('django.contrib.auth.urls')),
     path('admin/', admin.site.urls),
 ]
@@ -0,0 +1,15 @@
+"""mysite URL Configuration with the async polls views.
+
+Used as ROOT_URLCONF when POLLS_ASYNC_VIEWS is set, see mysite/urls.py.
+"""
+from django.contrib import admin
+from django.urls import path, include
+from . import views
+
+urlpatterns = [
+    path('', views.index, name="main"),
+    path('polls/', include('polls.async_urls')),
+    path('api/polls/', include('polls.api_urls')),
+    path('accounts/', include('django.contrib.auth.urls')),
+    path('admin/', admin.site.urls),
+]
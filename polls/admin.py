@@ -1,7 +1,16 @@
 """Create custom admin page."""
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
+from django.core.exceptions import PermissionDenied
+from django.http import Http404, StreamingHttpResponse
+from django.urls import path
+from django.utils import timezone
 
 from .models import Question, Choice
+from .pagination import EstimatedCountPaginator
+from .search import search
+from .transfer import CONTENT_TYPES, EXPORTS, FORMATS, render
 
 
 # Register your models here.
@@ -12,19 +21,126 @@ class ChoiceInline(admin.TabularInline):
 
     model = Choice
     extra = 3
+    # Votes keep the counter up to date; saving the form would write back a stale count.
+    readonly_fields = ('vote_count',)
+
+
+def request_now(request):
+    """Return the time the changelist of request compares with, the same for every row and filter."""
+    if not hasattr(request, 'polls_now'):
+        request.polls_now = timezone.now()
+    return request.polls_now
+
+
+class QuestionStateFilter(admin.SimpleListFilter):
+    """Filter questions that are open, closed or upcoming."""
+
+    title = 'status'
+    parameter_name = 'status'
+
+    def lookups(self, request, model_admin):
+        """Return the states to filter by."""
+        return [('open', 'Open'), ('closed', 'Closed'), ('upcoming', 'Upcoming')]
+
+    def queryset(self, request, queryset):
+        """Keep the questions in the selected state."""
+        if self.value() in ('open', 'closed', 'upcoming'):
+            return queryset.with_state(self.value(), request_now(request))
+        return queryset
+
+
+class QuestionChangeList(ChangeList):
+    """Changelist that lists search results best match first unless a column is sorted."""
+
+    def get_ordering(self, request, queryset):
+        """Return the search rank order while searching, the usual order otherwise."""
+        if self.query.strip() and ORDER_VAR not in self.params:
+            return ['search_rank', '-pk']
+        return super().get_ordering(request, queryset)
 
 
 class QuestionAdmin(admin.ModelAdmin):
-    """Custom question fields in admin page."""
+    """Custom question fields in admin page.
+
+    The status columns are computed in the changelist query against one
+    timestamp, and the question count of a large unfiltered table is
+    taken from the database statistics.
+    """
 
     fieldsets = [
         (None, {'fields': ['question_text']}),
         ('Date information', {'fields': ['pub_date', 'end_date'], 'classes': ['collapse']})
     ]
     inlines = [ChoiceInline]
-    list_display = ('question_text', 'pub_date', 'was_published_recently', 'is_published', 'can_vote')
-    list_filter = ['pub_date']
+    list_display = ('question_text', 'pub_date', 'vote_total', 'was_published_recently', 'is_published', 'can_vote')
+    list_filter = [QuestionStateFilter, 'pub_date']
+    # Searched through the full-text index, see get_search_results().
     search_fields = ['question_text']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ['export_tallies']
+
+    def get_queryset(self, request):
+        """Annotate the status flags of every question."""
+        return super().get_queryset(request).with_flags(request_now(request))
+
+    def get_search_results(self, request, queryset, search_term):
+        """Return the POLLS_SEARCH_ADMIN_LIMIT best full-text matches of search_term."""
+        if not search_term.strip():
+            return queryset, False
+        return search(queryset, search_term, getattr(settings, 'POLLS_SEARCH_ADMIN_LIMIT', 500)), False
+
+    def get_changelist(self, request, **kwargs):
+        """Return the changelist that orders search results by rank."""
+        return QuestionChangeList
+
+    @admin.display(boolean=True, ordering='pub_date', description='Published recently?')
+    def was_published_recently(self, obj):
+        """Return the published_recently annotation."""
+        return obj.published_recently
+
+    @admin.display(boolean=True, ordering='pub_date', description='Published?')
+    def is_published(self, obj):
+        """Return the published annotation."""
+        return obj.published
+
+    @admin.display(boolean=True, ordering='pub_date', description='Can vote?')
+    def can_vote(self, obj):
+        """Return the is_open annotation."""
+        return obj.is_open
+
+    def get_urls(self):
+        """Add the export downloads to the question admin URLs."""
+        return [
+            path('export/<slug:export>/<slug:fmt>/', self.admin_site.admin_view(self.export_view),
+                 name='polls_question_export'),
+        ] + super().get_urls()
+
+    @staticmethod
+    def export_response(export, fmt, question_ids=None):
+        """Return a streamed download of the export."""
+        response = StreamingHttpResponse(render(EXPORTS[export](question_ids), fmt), content_type=CONTENT_TYPES[fmt])
+        response['Content-Disposition'] = f'attachment; filename="polls-{export}.{fmt}"'
+        return response
+
+    def export_view(self, request, export, fmt):
+        """Download the tallies of every choice or every vote.
+
+        The votes export names the voters, so it also needs the view
+        permission on votes.
+        """
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        if export not in EXPORTS or fmt not in FORMATS:
+            raise Http404('Unknown export.')
+        if export == 'votes' and not request.user.has_perm('polls.view_vote'):
+            raise PermissionDenied
+        return self.export_response(export, fmt)
+
+    @admin.action(description='Export tallies of selected questions as CSV')
+    def export_tallies(self, request, queryset):
+        """Download the tallies of the selected questions."""
+        return self.export_response('tallies', 'csv', list(queryset.values_list('pk', flat=True)))
 
 
 admin.site.register(Question, QuestionAdmin)
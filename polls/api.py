@@ -0,0 +1,164 @@
+"""JSON API of KU Polls.
+
+Read endpoints select only the fields they send, with ``values()`` rows
+instead of model instances, and results come from the results cache; the
+batch endpoint returns the tallies of many questions from one cache round
+trip.  Responses are encoded with orjson when it is installed.
+"""
+import json
+import logging
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from django.utils import timezone
+from django.views.decorators.http import require_GET, require_POST
+
+from .cache import get_many_results, results_data
+from .ingest import cast_vote
+from .models import Question, Choice
+from .pagination import KeysetPage
+from .ratelimit import rate_limit
+from .tallies import tallied_results
+from .views import VOTE_CHOICE_FIELDS, get_client_ip, vote_address_keys, vote_rate_keys
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+logger = logging.getLogger('polls')
+
+QUESTION_FIELDS = ('id', 'question_text', 'pub_date', 'end_date')
+
+
+def dumps(data):
+    """Return data encoded as JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':'), ensure_ascii=False).encode()
+
+
+def json_response(data, status=200):
+    """Return data as a JSON response."""
+    return HttpResponse(dumps(data), status=status, content_type='application/json')
+
+
+def json_error(message, status):
+    """Return an error as a JSON response."""
+    return json_response({'error': message}, status=status)
+
+
+def question_data(row):
+    """Return a question row from values() as a JSON-serializable dict."""
+    return {
+        'id': row['id'],
+        'question_text': row['question_text'],
+        'pub_date': row['pub_date'].isoformat(),
+        'end_date': row['end_date'].isoformat(),
+        'open': row['is_open'],
+    }
+
+
+def parse_ids(value, limit):
+    """Return the distinct question ids of a comma-separated list, in order.
+
+    Raise:
+        ValueError if an id is not a number or there are more than limit ids.
+    """
+    try:
+        ids = list(dict.fromkeys(int(part) for part in value.split(',') if part.strip()))
+    except ValueError:
+        raise ValueError('Invalid ids.') from None
+    if len(ids) > limit:
+        raise ValueError(f'At most {limit} ids.')
+    return ids
+
+
+@require_GET
+def question_list(request):
+    """Questions newest first, one keyset page at a time.
+
+    The ``after`` query parameter is the ``next`` cursor of the previous
+    page, ``limit`` the number of questions on a page.
+    """
+    try:
+        size = min(int(request.GET.get('limit', getattr(settings, 'POLLS_INDEX_PAGE_SIZE', 20))),
+                   getattr(settings, 'POLLS_API_MAX_PAGE_SIZE', 100))
+        if size < 1:
+            raise ValueError
+        page = KeysetPage(
+            Question.objects.with_status(timezone.now()).values(*QUESTION_FIELDS, 'is_open'),
+            cursor=request.GET.get('after'),
+            size=size,
+        )
+    except ValueError:
+        return json_error('Invalid page.', 400)
+    return json_response({'questions': [question_data(row) for row in page], 'next': page.next_cursor})
+
+
+@require_GET
+def question_detail(request, question_id):
+    """A question with its choices."""
+    questions = Question.objects.with_status(timezone.now()).filter(pk=question_id)
+    row = questions.values(*QUESTION_FIELDS, 'is_open').first()
+    if row is None:
+        return json_error('No question matches the given id.', 404)
+    data = question_data(row)
+    data['choices'] = list(Choice.objects.filter(question_id=question_id).order_by('pk').values('id', 'choice_text'))
+    return json_response(data)
+
+
+@require_GET
+def question_results(request, question_id):
+    """The tallies of a question, from the results cache and the tally store."""
+    results = get_many_results([question_id]).get(question_id)
+    if results is None:
+        return json_error('No question matches the given id.', 404)
+    return json_response(results_data(tallied_results(results)))
+
+
+@require_GET
+def results_batch(request):
+    """The tallies of the questions in the ``ids`` query parameter, a comma-separated list.
+
+    Ids of questions that do not exist are left out of the response.
+    """
+    try:
+        ids = parse_ids(request.GET.get('ids', ''), getattr(settings, 'POLLS_API_MAX_BATCH', 100))
+    except ValueError as error:
+        return json_error(str(error), 400)
+    results = get_many_results(ids)
+    return json_response({'results': [results_data(tallied_results(results[pk])) for pk in ids if pk in results]})
+
+
+@require_POST
+@rate_limit('votes_per_address', vote_address_keys)
+@rate_limit('votes', vote_rate_keys)
+def vote(request, question_id):
+    """Cast the vote of the logged-in user for the choice in the ``choice`` form field or JSON body.
+
+    Return:
+        200 with the vote once it is stored, or 202 when it is buffered.
+    """
+    if not request.user.is_authenticated:
+        return json_error('Authentication required.', 401)
+    if request.content_type == 'application/json':
+        try:
+            choice_id = json.loads(request.body).get('choice')
+        except (ValueError, AttributeError):
+            return json_error('Invalid JSON body.', 400)
+    else:
+        choice_id = request.POST.get('choice')
+    try:
+        choice = Choice.objects.select_related('question').only(*VOTE_CHOICE_FIELDS).get(
+            question_id=question_id, pk=choice_id)
+    except (TypeError, ValueError, Choice.DoesNotExist):
+        return json_error('No choice of the question matches the given id.', 400)
+    if not choice.question.can_vote():
+        return json_error('Voting is not allowed.', 403)
+    cast_vote(request.user, choice)
+    logger.info('User %s voted for question id: %s from %s', request.user.username, question_id,
+                get_client_ip(request))
+    buffered = getattr(settings, 'POLLS_VOTE_MODE', 'sync') == 'buffered'
+    return json_response({'question': question_id, 'choice': choice.pk}, status=202 if buffered else 200)
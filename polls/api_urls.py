@@ -0,0 +1,13 @@
+"""URL Configuration for the JSON API of the polls application."""
+from django.urls import path
+
+from . import api
+
+app_name = 'polls-api'
+urlpatterns = [
+    path('questions/', api.question_list, name='question_list'),
+    path('questions/<int:question_id>/', api.question_detail, name='question_detail'),
+    path('questions/<int:question_id>/results/', api.question_results, name='question_results'),
+    path('questions/<int:question_id>/vote/', api.vote, name='vote'),
+    path('results/', api.results_batch, name='results_batch'),
+]
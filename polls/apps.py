@@ -6,3 +6,10 @@ class PollsConfig(AppConfig):
     """App configuration."""
 
     name = 'polls'
+
+    def ready(self):
+        """Configure logging and connect the signal receivers and system checks of the application."""
+        from . import auth, cache, checks, feed, lifecycle, tallies  # noqa: F401
+        from .log import configure
+        from .settings import LOGGING, LOG_MODE, LOG_QUEUE_SIZE
+        configure(LOGGING, mode=LOG_MODE, maxsize=LOG_QUEUE_SIZE)
@@ -0,0 +1,6 @@
+"""URL Configuration for polls application with the async views."""
+from . import async_views
+from .urls import view_patterns
+
+app_name = 'polls'
+urlpatterns = view_patterns(async_views)
@@ -0,0 +1,154 @@
+"""Async versions of the polls views for ASGI deployments.
+
+They do the same work as the views in polls/views.py with the async ORM
+and the async cache API, so a request only leaves the event loop for the
+vote transaction and for rendering the template.  ``mysite.asgi`` serves
+them by default; set ``POLLS_ASYNC_VIEWS`` to choose explicitly.
+"""
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.views import redirect_to_login
+from django.core.cache import InvalidCacheBackendError, caches
+from django.core.cache.utils import make_template_fragment_key
+from django.http import Http404, HttpResponseRedirect
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import reverse
+from django.utils import timezone
+
+from .cache import aget_results, aindex_version, aresults_version
+from .conditional import (
+    conditional_response, index_validators, not_modified, patch_validators, results_max_age, results_validators,
+)
+from .ingest import cast_vote
+from .models import Question, Choice, Vote
+from .pagination import KeysetPage
+from .ratelimit import rate_limit
+from .tallies import tallied_results
+from .views import (  # noqa: F401 - served as is
+    VOTE_CHOICE_FIELDS, get_client_ip, metrics, results_history, results_stream, search, vote_address_keys,
+    vote_rate_keys,
+)
+
+logger = logging.getLogger('polls')
+
+
+async def get_user(request):
+    """Return request.user, loading it from the session off the event loop."""
+    def load():
+        # Touching the lazy user loads it from the session and the database.
+        request.user.is_authenticated
+        return request.user
+    return await sync_to_async(load)()
+
+
+async def get_question(question_id, *related):
+    """Return the question with the id or raise Http404."""
+    try:
+        return await Question.objects.prefetch_related(*related).aget(pk=question_id)
+    except Question.DoesNotExist:
+        raise Http404('No Question matches the given query.')
+
+
+def fragment_cache():
+    """Return the cache used by the {% cache %} template tag."""
+    try:
+        return caches['template_fragments']
+    except InvalidCacheBackendError:
+        return caches['default']
+
+
+async def index(request):
+    """View for polls index page, see polls.views.index.
+
+    The page of questions is only loaded when the cached fragment of the
+    first page is missing, the same as when it is rendered lazily.
+    """
+    now = timezone.now()
+    version = await aindex_version()
+    try:
+        page = KeysetPage(
+            Question.objects.with_status(now),
+            cursor=request.GET.get('after'),
+            size=getattr(settings, 'POLLS_INDEX_PAGE_SIZE', 20),
+        )
+    except ValueError:
+        raise Http404('Invalid page.')
+    user = await get_user(request)
+    validators = await sync_to_async(index_validators)(request, version, now)
+    response = not_modified(request, validators)
+    if response is None:
+        if not page.is_first:
+            version = None
+        key = make_template_fragment_key('polls_index', [version, user.is_authenticated])
+        if not page.is_first or not await fragment_cache().ahas_key(key):
+            await page.aload()
+        response = TemplateResponse(request, 'polls/index.html', {
+            'questions': page,
+            'page': page,
+            'index_version': version,
+            'index_cache_timeout': getattr(settings, 'POLLS_INDEX_CACHE_TIMEOUT', 60),
+        })
+    return patch_validators(request, response, validators)
+
+
+async def detail(request, question_id):
+    """View for polls detail page, see polls.views.detail."""
+    question = await get_question(question_id, 'choice_set')
+    if not question.can_vote():
+        messages.info(request, 'Voting is not allowed!')
+        return redirect('polls:index')
+    context = {'question': question}
+    user = await get_user(request)
+    if user.is_authenticated:
+        vote = await Vote.objects.select_related('choice').filter(question=question, user=user).afirst()
+        if vote is not None:
+            context['previous_choice'] = vote.choice
+    return TemplateResponse(request, 'polls/detail.html', context)
+
+
+async def results(request, question_id):
+    """Results page for the poll question, see polls.views.results."""
+    now = timezone.now()
+    version = await aresults_version(question_id, create=False)
+    results = await sync_to_async(tallied_results)(await aget_results(question_id))
+    version = version or await aresults_version(question_id)
+    question = results['question']
+    await get_user(request)
+    validators = await sync_to_async(results_validators)(request, results, version, now)
+    return conditional_response(
+        request, validators, lambda: TemplateResponse(request, 'polls/results.html', results),
+        max_age=results_max_age(question, now),
+    )
+
+
+@rate_limit('votes_per_address', vote_address_keys)
+@rate_limit('votes', vote_rate_keys)
+async def vote(request, question_id):
+    """Vote for the selected choice in question, see polls.views.vote.
+
+    The vote itself is cast in a transaction, which runs in the request
+    thread because transactions are not available to async code.
+    """
+    user = await get_user(request)
+    if not user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
+    try:
+        selected_choice = await Choice.objects.select_related('question').only(*VOTE_CHOICE_FIELDS).aget(
+            question_id=question_id, pk=request.POST['choice'])
+    except (KeyError, ValueError, Choice.DoesNotExist):
+        question = await get_question(question_id, 'choice_set')
+        messages.error(request, "Please select one choice below for voting.")
+        return TemplateResponse(request, 'polls/detail.html', {'question': question})
+    if not selected_choice.question.can_vote():
+        messages.info(request, 'Voting is not allowed!')
+        return redirect('polls:index')
+    await sync_to_async(cast_vote)(user, selected_choice)
+    vote_again_url = reverse('polls:detail', args=(question_id,))
+    vote_again_url_with_html = f'<a href="{vote_again_url}">here</a>'
+    logger.info('User %s voted for question id: %s from %s', user.username, question_id, get_client_ip(request))
+    messages.success(request, f'Vote successfully. Click {vote_again_url_with_html} to vote again.')
+    return HttpResponseRedirect(reverse('polls:results', args=(question_id,)))
@@ -0,0 +1,79 @@
+"""Cached user lookups for KU Polls.
+
+Django loads ``request.user`` from the database on every request of a
+logged-in user.  get_cached_user() keeps the user object in the cache
+named by ``POLLS_USER_CACHE`` for ``POLLS_USER_CACHE_TIMEOUT`` seconds
+instead, and still checks the session against the backend and the
+password hash of the cached user, so a changed password ends the other
+sessions as before.  The cached user is dropped when the user logs out,
+is saved or is deleted; the polls.E002 check makes sure that cache is
+shared by every process, so no worker keeps a stale user.
+"""
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, get_user_model, user_logged_out
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.crypto import constant_time_compare
+
+from . import metrics
+
+
+def get_cache():
+    """Return the cache that holds the users."""
+    return caches[getattr(settings, 'POLLS_USER_CACHE', 'default')]
+
+
+def user_key(user_id):
+    """Return the cache key of the user."""
+    return f'polls:user:{user_id}'
+
+
+def get_cached_user(request):
+    """Return the user of the session of request, from the cache when possible.
+
+    A request without a logged-in session never touches the cache or the
+    database.  Anything the cached user cannot vouch for, such as an
+    unknown backend or a stale password hash, is left to
+    django.contrib.auth.get_user(), which also flushes a stale session.
+    """
+    try:
+        user_id = auth._get_user_session_key(request)
+    except KeyError:
+        return AnonymousUser()
+    cache = get_cache()
+    key = user_key(user_id)
+    backend_path = request.session.get(BACKEND_SESSION_KEY)
+    user = cache.get(key)
+    if user is not None and backend_path in settings.AUTHENTICATION_BACKENDS:
+        session_hash = request.session.get(HASH_SESSION_KEY)
+        if session_hash and constant_time_compare(session_hash, user.get_session_auth_hash()):
+            metrics.increment('user_cache_hits')
+            user.backend = backend_path
+            return user
+    metrics.increment('user_cache_misses')
+    user = auth.get_user(request)
+    if user.is_authenticated:
+        cache.set(key, user, getattr(settings, 'POLLS_USER_CACHE_TIMEOUT', 300))
+    return user
+
+
+def forget_user(user_id):
+    """Drop the cached user."""
+    get_cache().delete(user_key(user_id))
+
+
+@receiver(user_logged_out, dispatch_uid='polls.auth.user_logged_out_callback')
+def user_logged_out_callback(sender, request, user, **kwargs):
+    """Drop the cached user when it logs out."""
+    if user is not None:
+        forget_user(user.pk)
+
+
+@receiver(post_save, sender=get_user_model(), dispatch_uid='polls.auth.user_saved_callback')
+@receiver(post_delete, sender=get_user_model(), dispatch_uid='polls.auth.user_deleted_callback')
+def user_changed_callback(sender, instance, **kwargs):
+    """Drop the cached user when it changes, e.g. its password or active flag."""
+    forget_user(instance.pk)
@@ -0,0 +1,84 @@
+"""Benchmarks for KU Polls, run with ``manage.py benchmark <suite>``.
+
+Every suite is a module in this package with a ``run(options)`` function
+that returns a JSON-serializable dict, and optionally an
+``add_arguments(parser)`` function for its own options.  Suites run against
+a scratch database so they never touch the configured one.
+"""
+import os
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+
+from django.core.management import call_command
+from django.db import connections
+
+SUITES = {
+    'asgi': 'polls.benchmarks.asgi',
+    'db_contention': 'polls.benchmarks.db_contention',
+    'load': 'polls.benchmarks.load',
+    'logging': 'polls.benchmarks.logging_modes',
+    'templates': 'polls.benchmarks.templates',
+}
+
+
+@contextmanager
+def scratch_database(alias='default'):
+    """Point the database alias at an empty, migrated database for the duration."""
+    connection = connections[alias]
+    settings_dict = connection.settings_dict
+    original_name = settings_dict['NAME']
+    connections.close_all()
+    if connection.vendor == 'sqlite':
+        with tempfile.TemporaryDirectory() as directory:
+            settings_dict['NAME'] = os.path.join(directory, 'benchmark.sqlite3')
+            try:
+                call_command('migrate', database=alias, verbosity=0, interactive=False)
+                yield
+            finally:
+                connections.close_all()
+                settings_dict['NAME'] = original_name
+    else:
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            yield
+        finally:
+            connections.close_all()
+            connection.creation.destroy_test_db(original_name, verbosity=0)
+
+
+@contextmanager
+def timer(samples):
+    """Append the seconds spent in the block to samples."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        samples.append(time.perf_counter() - start)
+
+
+def percentile(ordered, fraction):
+    """Return the value at fraction (0-1) of the sorted samples."""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def summarize(samples, elapsed=None):
+    """Return latency percentiles in milliseconds and the throughput of samples.
+
+    Arguments:
+        samples - seconds taken by each operation.
+        elapsed - wall clock seconds of the run, default to the sum of samples.
+    """
+    ordered = sorted(samples)
+    elapsed = elapsed if elapsed is not None else sum(ordered)
+    return {
+        'count': len(ordered),
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 3) if ordered else 0.0,
+        'p50_ms': round(percentile(ordered, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(ordered, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(ordered, 0.99) * 1000, 3),
+        'per_second': round(len(ordered) / elapsed, 1) if elapsed else 0.0,
+    }
@@ -0,0 +1,264 @@
+"""Throughput of the polls pages under WSGI and under ASGI, side by side.
+
+Seeds a scratch database like the load suite, then sends the same mix of
+index, detail, results and vote requests at the same concurrency twice:
+to the sync views behind Django's threaded WSGI server, and to the async
+views behind uvicorn, each one bound to a local port.
+
+uvicorn is not a dependency of KU Polls.  Without it, or with
+``--in-process``, both handlers are driven in process instead: the WSGI
+handler through the test Client from threads, the ASGI handler through
+the AsyncClient from tasks on one event loop.  That leaves out the HTTP
+parsing and the sockets but keeps the handler, middleware and view work.
+"""
+import asyncio
+import http.client
+import random
+import socket
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from urllib.parse import urlencode
+
+from asgiref.sync import ThreadSensitiveContext
+from django.core.asgi import get_asgi_application
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.core.wsgi import get_wsgi_application
+from django.middleware.csrf import CSRF_ALLOWED_CHARS, CSRF_SECRET_LENGTH
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+
+from . import scratch_database, summarize
+from .load import ENDPOINTS
+from .seed import seed
+
+try:
+    import uvicorn
+except ImportError:
+    uvicorn = None
+
+ASYNC_URLCONF = 'mysite.urls_async'
+
+
+def add_arguments(parser):
+    """Add the option to skip the local servers."""
+    parser.add_argument('--in-process', action='store_true',
+                        help='asgi suite: drive the handlers in process instead of over HTTP.')
+
+
+def requests(rng, questions, iterations):
+    """Yield (endpoint, method, path, data) for one worker, cycling through the endpoints."""
+    for n in range(iterations):
+        endpoint = ENDPOINTS[n % len(ENDPOINTS)]
+        question = rng.choice(questions)
+        if endpoint == 'index':
+            yield endpoint, 'GET', reverse('polls:index'), None
+        elif endpoint == 'vote':
+            yield endpoint, 'POST', reverse('polls:vote', args=(question.pk,)), {
+                'choice': rng.choice(question.choice_ids)}
+        else:
+            yield endpoint, 'GET', reverse(f'polls:{endpoint}', args=(question.pk,)), None
+
+
+def build_report(samples, elapsed):
+    """Return the summary of every endpoint and of all requests from (endpoint, seconds, status) samples."""
+    latencies = defaultdict(list)
+    statuses = defaultdict(lambda: defaultdict(int))
+    for endpoint, seconds, status in samples:
+        latencies[endpoint].append(seconds)
+        statuses[endpoint][status] += 1
+    report = {}
+    for endpoint in ENDPOINTS:
+        report[endpoint] = summarize(latencies[endpoint])
+        report[endpoint]['status_codes'] = dict(statuses[endpoint])
+    report['all'] = summarize([seconds for _, seconds, _ in samples], elapsed)
+    return report
+
+
+def session_cookies(users, count):
+    """Return the session and CSRF cookies of count logged in clients."""
+    cookies = []
+    for index in range(count):
+        client = Client()
+        client.force_login(users[index % len(users)])
+        cookies.append({
+            'sessionid': client.cookies['sessionid'].value,
+            'csrftoken': get_random_string(CSRF_SECRET_LENGTH, CSRF_ALLOWED_CHARS),
+        })
+    return cookies
+
+
+def drive_http(port, questions, cookies, iterations):
+    """Send requests over HTTP from one thread per cookie set and return the report."""
+    samples = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(len(cookies))
+
+    def worker(index):
+        rng = random.Random(index)
+        jar = cookies[index]
+        headers = {
+            'Cookie': '; '.join(f'{name}={value}' for name, value in jar.items()),
+            'X-CSRFToken': jar['csrftoken'],
+        }
+        local = []
+        barrier.wait()
+        for endpoint, method, path, data in requests(rng, questions, iterations):
+            body = None
+            request_headers = dict(headers)
+            if data is not None:
+                body = urlencode(data)
+                request_headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            start = time.perf_counter()
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            try:
+                connection.request(method, path, body=body, headers=request_headers)
+                response = connection.getresponse()
+                response.read()
+                status = response.status
+            finally:
+                connection.close()
+            local.append((endpoint, time.perf_counter() - start, status))
+        with lock:
+            samples.extend(local)
+
+    workers = [threading.Thread(target=worker, args=(index,)) for index in range(len(cookies))]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return build_report(samples, time.perf_counter() - start)
+
+
+def drive_wsgi_client(questions, users, threads, iterations):
+    """Send requests through the test Client from threads and return the report."""
+    samples = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+
+    def worker(index):
+        client = Client()
+        client.force_login(users[index % len(users)])
+        local = []
+        barrier.wait()
+        for endpoint, method, path, data in requests(random.Random(index), questions, iterations):
+            start = time.perf_counter()
+            response = client.generic(method, path, urlencode(data or {}),
+                                      'application/x-www-form-urlencoded')
+            local.append((endpoint, time.perf_counter() - start, response.status_code))
+        with lock:
+            samples.extend(local)
+
+    workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return build_report(samples, time.perf_counter() - start)
+
+
+def drive_asgi_client(questions, users, tasks, iterations):
+    """Send requests through the AsyncClient from tasks on one event loop and return the report."""
+    clients = []
+    for index in range(tasks):
+        client = AsyncClient()
+        client.force_login(users[index % len(users)])
+        clients.append(client)
+    samples = []
+
+    async def worker(index):
+        for endpoint, method, path, data in requests(random.Random(index), questions, iterations):
+            start = time.perf_counter()
+            # The ASGI handler gives every request its own thread for sync code.
+            async with ThreadSensitiveContext():
+                response = await clients[index].generic(method, path, urlencode(data or {}),
+                                                        'application/x-www-form-urlencoded')
+            samples.append((endpoint, time.perf_counter() - start, response.status_code))
+
+    async def main():
+        start = time.perf_counter()
+        await asyncio.gather(*[worker(index) for index in range(tasks)])
+        return time.perf_counter() - start
+
+    return build_report(samples, asyncio.run(main()))
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    """Request handler that does not log every request."""
+
+    def log_message(self, format, *args):
+        """Log nothing."""
+
+
+@contextmanager
+def wsgi_server():
+    """Serve the WSGI application on a free local port and yield the port."""
+    server = ThreadedWSGIServer(('127.0.0.1', 0), QuietRequestHandler)
+    server.set_app(get_wsgi_application())
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server.server_port
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+@contextmanager
+def asgi_server():
+    """Serve the ASGI application with uvicorn on a free local port and yield the port."""
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(
+        get_asgi_application(), host='127.0.0.1', port=port, lifespan='off', log_level='warning'))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError('uvicorn did not start.')
+        time.sleep(0.01)
+    try:
+        yield port
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+def run(options):
+    """Seed a scratch database and return the WSGI and ASGI results at the same concurrency."""
+    threads, iterations = options['threads'], options['iterations']
+    over_http = uvicorn is not None and not options['in_process']
+    with scratch_database(), override_settings(ALLOWED_HOSTS=['testserver', '127.0.0.1'], POLLS_VOTES_RATE=0):
+        questions, users = seed(options['users'], options['questions'], options['choices'], options['votes'])
+        for question in questions:
+            question.choice_ids = list(question.choice_set.values_list('pk', flat=True))
+        if over_http:
+            cookies = session_cookies(users, threads)
+            with wsgi_server() as port:
+                wsgi = drive_http(port, questions, cookies, iterations)
+            with override_settings(ROOT_URLCONF=ASYNC_URLCONF), asgi_server() as port:
+                asgi = drive_http(port, questions, cookies, iterations)
+        else:
+            wsgi = drive_wsgi_client(questions, users, threads, iterations)
+            with override_settings(ROOT_URLCONF=ASYNC_URLCONF):
+                asgi = drive_asgi_client(questions, users, threads, iterations)
+        return {
+            'dataset': {key: options[key] for key in ('users', 'questions', 'choices', 'votes')},
+            'concurrency': threads,
+            'requests_per_worker': iterations,
+            'transport': 'http' if over_http else 'in-process',
+            'servers': {
+                'wsgi': 'django ThreadedWSGIServer' if over_http else 'test Client',
+                'asgi': f'uvicorn {uvicorn.__version__}' if over_http else 'test AsyncClient',
+            },
+            'wsgi': wsgi,
+            'asgi': asgi,
+            'asgi_to_wsgi_throughput': round(asgi['all']['per_second'] / wsgi['all']['per_second'], 2)
+            if wsgi['all']['per_second'] else None,
+        }
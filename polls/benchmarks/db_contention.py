@@ -0,0 +1,75 @@
+"""Write contention on the vote path for each SQLite profile.
+
+Several threads, each with its own connection, cast and change votes on one
+question at the same time, the way concurrent requests do.  With SQLite the
+run is repeated for every profile in ``mysite.db.SQLITE_PROFILES``; other
+backends run once with their configured connection settings.
+"""
+import datetime
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.db import OperationalError, close_old_connections, connection
+from django.test import override_settings
+from django.utils import timezone
+
+from mysite.db import SQLITE_PROFILES
+from polls.models import Question, Vote
+
+from . import scratch_database, summarize, timer
+
+
+def seed(users):
+    """Create an open question with three choices and the voters."""
+    question = Question.objects.create(
+        question_text='Benchmark question',
+        pub_date=timezone.now(),
+        end_date=timezone.now() + datetime.timedelta(days=1),
+    )
+    choices = [question.choice_set.create(choice_text=f'Choice {i}') for i in range(3)]
+    User.objects.bulk_create([User(username=f'bench{i}') for i in range(users)], batch_size=500)
+    return choices, list(User.objects.order_by('pk'))
+
+
+def contend(choices, users, threads, votes_per_thread):
+    """Cast votes from all threads at once and time each one."""
+    samples = []
+    errors = []
+    barrier = threading.Barrier(threads)
+
+    def worker(index):
+        mine = users[index::threads]
+        barrier.wait()
+        for n in range(votes_per_thread):
+            try:
+                with timer(samples):
+                    Vote.objects.cast(mine[n % len(mine)], choices[(index + n) % len(choices)])
+            except OperationalError as error:
+                errors.append(str(error))
+            # Behave like the end of a request: honour CONN_MAX_AGE.
+            close_old_connections()
+        connection.close()
+
+    workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    result = summarize(samples, time.perf_counter() - start)
+    result['errors'] = len(errors)
+    return result
+
+
+def run(options):
+    """Return the contention results of every profile."""
+    threads = options['threads']
+    votes = options['iterations']
+    profiles = list(SQLITE_PROFILES) if connection.vendor == 'sqlite' else [None]
+    results = {}
+    for profile in profiles:
+        with override_settings(DB_PROFILE=profile or 'default'), scratch_database():
+            choices, users = seed(max(threads * 4, 20))
+            results[profile or connection.vendor] = contend(choices, users, threads, votes)
+    return {'threads': threads, 'votes_per_thread': votes, 'profiles': results}
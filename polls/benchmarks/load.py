@@ -0,0 +1,111 @@
+"""Throughput and latency of the polls request paths.
+
+Seeds a scratch database, then drives the index, detail, results and vote
+endpoints through the Django test client from several threads, each one
+standing in for a logged in user.  Reports latency percentiles, requests
+per second and queries per request for every endpoint.
+"""
+import random
+import threading
+import time
+from collections import defaultdict
+
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from . import scratch_database, summarize
+from .seed import seed
+
+ENDPOINTS = ('index', 'detail', 'results', 'vote')
+
+
+def add_arguments(parser):
+    """Add the dataset size options."""
+    parser.add_argument('--users', type=int, default=200, help='Voters to seed (default: 200).')
+    parser.add_argument('--questions', type=int, default=100, help='Questions to seed (default: 100).')
+    parser.add_argument('--choices', type=int, default=4, help='Choices per question (default: 4).')
+    parser.add_argument('--votes', type=int, default=5000, help='Votes to seed (default: 5000).')
+
+
+class QueryCounter:
+    """Execute wrapper that counts the queries run on a connection."""
+
+    def __init__(self):
+        """Start at zero."""
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        """Count the query and run it."""
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def drive(questions, users, threads, iterations, endpoints=ENDPOINTS):
+    """Send requests to every endpoint from all threads and collect samples."""
+    latencies = defaultdict(list)
+    queries = defaultdict(list)
+    statuses = defaultdict(lambda: defaultdict(int))
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+
+    def worker(index):
+        rng = random.Random(index)
+        client = Client()
+        client.force_login(users[index % len(users)])
+        counter = QueryCounter()
+        local = []
+        barrier.wait()
+        with connection.execute_wrapper(counter):
+            for n in range(iterations):
+                endpoint = endpoints[n % len(endpoints)]
+                question = rng.choice(questions)
+                counter.count = 0
+                start = time.perf_counter()
+                if endpoint == 'index':
+                    response = client.get(reverse('polls:index'))
+                elif endpoint == 'vote':
+                    choice_id = rng.choice(question.choice_ids)
+                    response = client.post(reverse('polls:vote', args=(question.pk,)), {'choice': choice_id})
+                else:
+                    response = client.get(reverse(f'polls:{endpoint}', args=(question.pk,)))
+                local.append((endpoint, time.perf_counter() - start, counter.count, response.status_code))
+        connection.close()
+        with lock:
+            for endpoint, seconds, count, status in local:
+                latencies[endpoint].append(seconds)
+                queries[endpoint].append(count)
+                statuses[endpoint][status] += 1
+
+    workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    report = {}
+    for endpoint in endpoints:
+        report[endpoint] = summarize(latencies[endpoint])
+        report[endpoint]['queries_per_request'] = round(sum(queries[endpoint]) / max(len(queries[endpoint]), 1), 2)
+        report[endpoint]['status_codes'] = dict(statuses[endpoint])
+    everything = [seconds for samples in latencies.values() for seconds in samples]
+    report['all'] = summarize(everything, elapsed)
+    report['all']['queries_per_request'] = round(
+        sum(sum(counts) for counts in queries.values()) / max(len(everything), 1), 2)
+    return report
+
+
+def run(options):
+    """Seed a scratch database and return the results of every endpoint."""
+    with scratch_database(), override_settings(ALLOWED_HOSTS=['testserver'], POLLS_VOTES_RATE=0):
+        questions, users = seed(options['users'], options['questions'], options['choices'], options['votes'])
+        for question in questions:
+            question.choice_ids = list(question.choice_set.values_list('pk', flat=True))
+        return {
+            'dataset': {key: options[key] for key in ('users', 'questions', 'choices', 'votes')},
+            'threads': options['threads'],
+            'requests_per_thread': options['iterations'],
+            'endpoints': drive(questions, users, options['threads'], options['iterations']),
+        }
@@ -0,0 +1,82 @@
+"""Latency of the vote path with synchronous and queued logging.
+
+The polls loggers write to a sink that takes ``--sink-delay-ms`` for every
+record, standing in for a blocked or slow stdout.  The same votes are then
+cast through the test client once with the handlers on the request thread
+and once behind the bounded queue of polls.log.
+"""
+import io
+import logging
+import time
+
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from polls import log
+from polls.settings import LOGGING, LOG_MODE, LOG_QUEUE_SIZE
+
+from . import scratch_database, summarize, timer
+from .seed import seed
+
+QUEUED_LOGGERS = ('polls', 'polls.requests')
+
+
+def add_arguments(parser):
+    """Add the sink delay option."""
+    parser.add_argument('--sink-delay-ms', type=float, default=2.0,
+                        help='Time the log sink takes per record (default: 2).')
+
+
+class SlowStream(io.StringIO):
+    """Stream that sleeps on every write, like a pipe nobody is reading fast enough."""
+
+    def __init__(self, delay):
+        """Keep the delay in seconds."""
+        super().__init__()
+        self.delay = delay
+
+    def write(self, text):
+        """Wait, then write."""
+        time.sleep(self.delay)
+        return super().write(text)
+
+
+def point_loggers_at(stream, mode):
+    """Give the polls loggers a single handler on stream, queued in 'queue' mode."""
+    log.stop_listeners()
+    for name in QUEUED_LOGGERS:
+        logger = logging.getLogger(name)
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+        logger.addHandler(logging.StreamHandler(stream))
+        logger.setLevel(logging.INFO)
+        if mode == 'queue':
+            log.queue_logger(logger, LOG_QUEUE_SIZE)
+
+
+def run(options):
+    """Return the vote latency of each logging mode."""
+    delay = options['sink_delay_ms'] / 1000
+    votes = options['iterations']
+    results = {}
+    try:
+        with scratch_database(), override_settings(ALLOWED_HOSTS=['testserver'], POLLS_VOTES_RATE=0):
+            questions, users = seed(users=votes, questions=1, choices=4, votes=0)
+            question = questions[0]
+            choice_ids = list(question.choice_set.values_list('pk', flat=True))
+            for mode in ('sync', 'queue'):
+                point_loggers_at(SlowStream(delay), mode)
+                samples = []
+                client = Client()
+                for n, user in enumerate(users):
+                    client.force_login(user)
+                    with timer(samples):
+                        client.post(reverse('polls:vote', args=(question.pk,)), {'choice': choice_ids[n % 4]})
+                results[mode] = summarize(samples)
+                results[mode]['dropped'] = sum(
+                    handler.dropped for name in QUEUED_LOGGERS for handler in logging.getLogger(name).handlers
+                    if isinstance(handler, log.BoundedQueueHandler)
+                )
+    finally:
+        log.configure(LOGGING, mode=LOG_MODE, maxsize=LOG_QUEUE_SIZE)
+    return {'sink_delay_ms': options['sink_delay_ms'], 'votes': votes, 'modes': results}
@@ -0,0 +1,85 @@
+"""Render time of the index page for long question lists.
+
+Renders polls/index.html, without its fragment cache, for pages of
+several sizes with the default template loaders, which find and compile
+every template on every render, and with the cached loader of the
+production rendering profile.  The questions are built in memory, so only
+the template work is timed.
+"""
+import datetime
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.template.backends.django import DjangoTemplates
+from django.test import RequestFactory
+from django.utils import timezone
+
+from polls.models import Question
+from polls.pagination import KeysetPage
+
+from . import summarize
+
+LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+
+def add_arguments(parser):
+    """Add the page sizes option."""
+    parser.add_argument('--page-sizes', default='20,200,2000',
+                        help='templates suite: comma-separated questions per page (default: 20,200,2000).')
+
+
+def engine(cached):
+    """Return a template backend like the configured one, with or without the cached loader."""
+    config = settings.TEMPLATES[0]
+    options = {key: value for key, value in config.get('OPTIONS', {}).items() if key != 'loaders'}
+    options['loaders'] = [('django.template.loaders.cached.Loader', LOADERS)] if cached else LOADERS
+    return DjangoTemplates({
+        'NAME': 'cached' if cached else 'uncached',
+        'DIRS': config.get('DIRS', []),
+        'APP_DIRS': False,
+        'OPTIONS': options,
+    })
+
+
+def page_of(size):
+    """Return a first index page of size questions, with another page after it."""
+    now = timezone.now()
+    questions = []
+    for i in range(size + 1):
+        question = Question(
+            pk=size + 1 - i,
+            question_text=f'Benchmark question {i}',
+            pub_date=now - datetime.timedelta(minutes=i),
+            end_date=now + datetime.timedelta(days=1 if i % 2 else -1),
+        )
+        question.is_open = bool(i % 2)
+        questions.append(question)
+    page = KeysetPage(Question.objects.none(), size=size)
+    # Set the rows the page would have loaded, so no query runs.
+    page.__dict__['_rows'] = questions
+    return page
+
+
+def run(options):
+    """Return the render times of every page size with both loaders."""
+    request = RequestFactory().get('/polls/')
+    request.user = AnonymousUser()
+    results = {}
+    for size in [int(size) for size in options['page_sizes'].split(',')]:
+        page = page_of(size)
+        context = {'questions': page, 'page': page, 'index_version': None, 'index_cache_timeout': 0}
+        results[size] = {}
+        for name, backend in (('default_loaders', engine(False)), ('cached_loader', engine(True))):
+            samples = []
+            html = ''
+            for _ in range(options['iterations']):
+                start = time.perf_counter()
+                html = backend.get_template('polls/index.html').render(context, request)
+                samples.append(time.perf_counter() - start)
+            results[size][name] = summarize(samples)
+            results[size][name]['html_bytes'] = len(html.encode())
+    return {'iterations': options['iterations'], 'page_sizes': results}
@@ -0,0 +1,267 @@
+"""Results and index caches for KU Polls.
+
+The tallies of a question are cached under its id in the cache named by
+``POLLS_RESULTS_CACHE`` and dropped whenever a vote is cast or the
+question or its choices change.  Questions that cannot be voted on are
+cached without expiry because their tallies no longer change.
+
+The rendered first page of the index is cached as a template fragment
+keyed by the index version, which moves on every Question save or delete.
+The results of every question have a version too, which moves with each
+invalidation.  Versions are the time they were made at, so they also give
+the Last-Modified of the pages.
+"""
+import datetime
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+
+from . import metrics
+from .models import Question, Choice
+from .signals import vote_cast, votes_deleted
+
+INDEX_VERSION_KEY = 'polls:index:version'
+
+
+def get_cache():
+    """Return the cache that holds the results."""
+    return caches[getattr(settings, 'POLLS_RESULTS_CACHE', 'default')]
+
+
+def results_key(question_id):
+    """Return the cache key of the results of the question."""
+    return f'polls:results:{question_id}'
+
+
+def load_results(question_id):
+    """Load the question, its choices and the vote totals from the database.
+
+    A closed question is read with its result snapshot in one query.
+    """
+    question = get_object_or_404(Question.objects.select_related('snapshot'), pk=question_id)
+    snapshot = getattr(question, 'snapshot', None)
+    if question.closed and snapshot is not None:
+        return snapshot.results(question)
+    choices = list(question.choice_set.with_percentage().order_by('pk'))
+    return {'question': question, 'choices': choices, 'total_votes': question.vote_total}
+
+
+def results_timeout(question):
+    """Return how long the results of question are cached, None for ever once it is closed or has ended.
+
+    A poll that has not opened yet expires like an open one: votes cast in
+    other workers after it opens do not drop this worker's entry.
+    """
+    if question.closed or question.end_date < timezone.now():
+        return None
+    return getattr(settings, 'POLLS_RESULTS_CACHE_TIMEOUT', 300)
+
+
+def get_results(question_id):
+    """Return the results of the question, from the cache when possible.
+
+    Raise:
+        Http404 if the question does not exist.
+    """
+    cache = get_cache()
+    key = results_key(question_id)
+    results = cache.get(key)
+    if results is not None:
+        metrics.increment('results_cache_hits')
+        return results
+    metrics.increment('results_cache_misses')
+    results = load_results(question_id)
+    cache.set(key, results, results_timeout(results['question']))
+    return results
+
+
+def load_many_results(question_ids):
+    """Load the results of many questions with two queries, or one when they are all closed.
+
+    Return:
+        Dict of the results by question id, without the questions that do not exist.
+    """
+    results = {}
+    live = {}
+    for pk, question in Question.objects.select_related('snapshot').in_bulk(question_ids).items():
+        snapshot = getattr(question, 'snapshot', None)
+        if question.closed and snapshot is not None:
+            results[pk] = snapshot.results(question)
+        else:
+            results[pk] = live[pk] = {'question': question, 'choices': [], 'total_votes': question.vote_total}
+    if live:
+        choices = Choice.objects.filter(question_id__in=live).with_percentage().order_by('question_id', 'pk')
+        for choice in choices:
+            live[choice.question_id]['choices'].append(choice)
+    return results
+
+
+def get_many_results(question_ids):
+    """Return the results of many questions, by id, from one cache round trip when possible.
+
+    The results missing from the cache are loaded with load_many_results()
+    and cached.  Questions that do not exist are left out.
+    """
+    cache = get_cache()
+    keys = {results_key(pk): pk for pk in question_ids}
+    results = {keys[key]: value for key, value in cache.get_many(keys).items()}
+    metrics.increment('results_cache_hits', len(results))
+    missing = [pk for pk in keys.values() if pk not in results]
+    if missing:
+        metrics.increment('results_cache_misses', len(missing))
+        loaded = load_many_results(missing)
+        by_timeout = {}
+        for pk, value in loaded.items():
+            by_timeout.setdefault(results_timeout(value['question']), {})[results_key(pk)] = value
+        for timeout, values in by_timeout.items():
+            cache.set_many(values, timeout)
+        results.update(loaded)
+    return results
+
+
+def results_data(results):
+    """Return results from get_results() as a JSON-serializable dict."""
+    return {
+        'question': results['question'].pk,
+        'open': results['question'].can_vote(),
+        'total_votes': results['total_votes'],
+        'choices': [
+            {'id': choice.pk, 'votes': choice.vote_count, 'percentage': round(choice.percentage, 1)}
+            for choice in results['choices']
+        ],
+    }
+
+
+async def aload_results(question_id):
+    """Load the results like load_results() with the async ORM."""
+    try:
+        question = await Question.objects.select_related('snapshot').aget(pk=question_id)
+    except Question.DoesNotExist:
+        raise Http404('No Question matches the given query.')
+    snapshot = getattr(question, 'snapshot', None)
+    if question.closed and snapshot is not None:
+        return snapshot.results(question)
+    choices = [choice async for choice in question.choice_set.with_percentage().order_by('pk')]
+    return {'question': question, 'choices': choices, 'total_votes': question.vote_total}
+
+
+async def aget_results(question_id):
+    """Return the results like get_results() without blocking the event loop."""
+    cache = get_cache()
+    key = results_key(question_id)
+    results = await cache.aget(key)
+    if results is not None:
+        metrics.increment('results_cache_hits')
+        return results
+    metrics.increment('results_cache_misses')
+    results = await aload_results(question_id)
+    await cache.aset(key, results, results_timeout(results['question']))
+    return results
+
+
+def invalidate_results(question_id):
+    """Drop the cached results of the question and move its results version on."""
+    get_cache().delete(results_key(question_id))
+    bump_version(results_version_key(question_id))
+    metrics.increment('results_cache_invalidations')
+
+
+def get_version(key, create=True):
+    """Return the version stored under key, a time in nanoseconds, starting one if there is none and create."""
+    cache = get_cache()
+    version = cache.get(key)
+    if version is None and create:
+        version = time.time_ns()
+        cache.add(key, version, None)
+        version = cache.get(key, version)
+    return version
+
+
+async def aget_version(key, create=True):
+    """Return the version stored under key like get_version() without blocking."""
+    cache = get_cache()
+    version = await cache.aget(key)
+    if version is None and create:
+        version = time.time_ns()
+        await cache.aadd(key, version, None)
+        version = await cache.aget(key, version)
+    return version
+
+
+def bump_version(key):
+    """Move the version stored under key to the current time, and always forward."""
+    cache = get_cache()
+    cache.set(key, max(time.time_ns(), (cache.get(key) or 0) + 1), None)
+
+
+def version_time(version):
+    """Return the aware datetime at which a version was made."""
+    return datetime.datetime.fromtimestamp(version / 1e9, tz=datetime.timezone.utc)
+
+
+def index_version():
+    """Return the current version of the index page fragment."""
+    return get_version(INDEX_VERSION_KEY)
+
+
+async def aindex_version():
+    """Return the current version of the index page fragment without blocking."""
+    return await aget_version(INDEX_VERSION_KEY)
+
+
+def bump_index_version():
+    """Move the index to a new version so the cached fragment is not used again."""
+    bump_version(INDEX_VERSION_KEY)
+
+
+def results_version_key(question_id):
+    """Return the cache key of the version of the results of the question."""
+    return f'polls:results:version:{question_id}'
+
+
+def results_version(question_id, create=True):
+    """Return the current version of the results of the question.
+
+    With create false None is returned when it has none yet, so a request
+    for a question that may not exist leaves no key behind.
+    """
+    return get_version(results_version_key(question_id), create)
+
+
+async def aresults_version(question_id, create=True):
+    """Return the current version of the results of the question without blocking."""
+    return await aget_version(results_version_key(question_id), create)
+
+
+@receiver(vote_cast)
+def vote_cast_callback(sender, question_id, **kwargs):
+    """Drop the results when a vote is cast."""
+    invalidate_results(question_id)
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def question_changed_callback(sender, instance, **kwargs):
+    """Drop the results and the index page when the question is edited or deleted."""
+    invalidate_results(instance.pk)
+    bump_index_version()
+
+
+@receiver(post_save, sender=Choice)
+@receiver(post_delete, sender=Choice)
+def choice_changed_callback(sender, instance, **kwargs):
+    """Drop the results when one of the question choices is edited or deleted."""
+    invalidate_results(instance.question_id)
+
+
+@receiver(votes_deleted)
+def votes_deleted_callback(sender, question_ids, **kwargs):
+    """Drop the results of the questions that lost votes."""
+    for question_id in question_ids:
+        invalidate_results(question_id)
@@ -0,0 +1,49 @@
+"""System checks of KU Polls."""
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Error, Tags, register
+
+from .search import missing_triggers
+
+
+@register(Tags.database)
+def check_search_triggers(app_configs, databases=None, **kwargs):
+    """Report SQLite databases whose full-text index of questions lost its triggers.
+
+    Database checks run with ``migrate``, the test runner and
+    ``check --database``.
+    """
+    errors = []
+    for alias in databases or ():
+        missing = missing_triggers(alias)
+        if missing:
+            errors.append(Error(
+                f'The full-text index of questions on database {alias!r} is not kept up to date, '
+                f'its triggers {", ".join(missing)} are missing.',
+                hint='A migration rebuilt the polls_question table; call polls.search.create_triggers() '
+                     'at the end of it.',
+                id='polls.E001',
+            ))
+    return errors
+
+
+@register(Tags.caches)
+def check_user_cache(app_configs, **kwargs):
+    """Report a cached user kept in the memory of each process.
+
+    A saved, deactivated or deleted user is only dropped from the cache
+    of the process that changed it, so every worker must share the cache.
+    """
+    if 'polls.middleware.CachedAuthenticationMiddleware' not in settings.MIDDLEWARE:
+        return []
+    alias = getattr(settings, 'POLLS_USER_CACHE', 'default')
+    if not isinstance(caches[alias], LocMemCache):
+        return []
+    return [Error(
+        f'SESSION_PROFILE {getattr(settings, "SESSION_PROFILE", None)!r} caches logged-in users in the '
+        f'{alias!r} cache, which every process keeps in its own memory.',
+        hint='Set CACHE_URL to a cache the processes share, such as memcached, redis, the database or '
+             'a file cache, or use SESSION_PROFILE database.',
+        id='polls.E002',
+    )]
@@ -0,0 +1,122 @@
+"""Conditional GET for the pages of KU Polls.
+
+The index page gets an ETag made from its version in polls.cache, and
+the results page one made from the tallies it shows, so a client that
+already has the page is answered with a 304 before anything is rendered.  The ETag also covers the user, because
+the pages greet the logged-in user; Last-Modified is only sent on the
+anonymous pages, which are the same for every reader.  While flash
+messages are waiting the page is always rendered, so they are shown.
+"""
+import datetime
+import hashlib
+
+from django.conf import settings
+from django.contrib import messages
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .cache import version_time
+
+
+def page_validators(request, parts, modified):
+    """Return the (ETag, Last-Modified) of a page for request.
+
+    Arguments:
+        parts - the values the page depends on besides the user, such as
+            versions and open flags.
+        modified - aware datetime of the last change of the page.
+    Return:
+        (None, None) when the page must be rendered anyway.
+    """
+    if request.method not in ('GET', 'HEAD') or len(messages.get_messages(request)):
+        return None, None
+    user = request.user
+    key = ':'.join(map(str, [*parts, f'user{user.pk}' if user.is_authenticated else 'anonymous']))
+    etag = f'"{hashlib.md5(key.encode(), usedforsecurity=False).hexdigest()}"'
+    return etag, None if user.is_authenticated else int(modified.timestamp())
+
+
+def not_modified(request, validators):
+    """Return a 304 response if the client has the page, otherwise None.
+
+    Arguments:
+        validators - (ETag, Last-Modified) from page_validators().
+    """
+    etag, last_modified = validators
+    if etag is None:
+        return None
+    return get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+
+def patch_validators(request, response, validators, max_age=None):
+    """Add the validators and the Cache-Control header to response and return it.
+
+    Arguments:
+        max_age - seconds the client may keep the page without asking
+            again, default to revalidating every time.
+    """
+    etag, last_modified = validators
+    if etag is not None:
+        response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    cache_control = {'max_age': max_age} if max_age else {'no_cache': True}
+    if request.user.is_authenticated:
+        cache_control['private'] = True
+    else:
+        cache_control['public'] = True
+    patch_cache_control(response, **cache_control)
+    return response
+
+
+def conditional_response(request, validators, render, max_age=None):
+    """Return a 304 when the client has the page, otherwise the response of render(), see patch_validators()."""
+    response = not_modified(request, validators)
+    if response is None:
+        response = render()
+    return patch_validators(request, response, validators, max_age)
+
+
+def index_validators(request, version, now):
+    """Return the (ETag, Last-Modified) of the index page at index version.
+
+    The open status on the page changes with time, so the validators
+    also move every ``POLLS_INDEX_CACHE_TIMEOUT`` seconds, the age the
+    cached index fragment may have anyway.
+    """
+    period = max(getattr(settings, 'POLLS_INDEX_CACHE_TIMEOUT', 60), 1)
+    bucket = int(now.timestamp()) // period
+    modified = max(version_time(version), datetime.datetime.fromtimestamp(bucket * period, tz=datetime.timezone.utc))
+    return page_validators(request, ['index', version, bucket], modified)
+
+
+def results_validators(request, results, version, now):
+    """Return the (ETag, Last-Modified) of the results page showing results.
+
+    The ETag is made from the question, the choices and their counts as
+    loaded, not from the results version: the version lives in the cache
+    of this process and misses the votes committed by other workers,
+    which show up here once the cached results expire.
+
+    Arguments:
+        results - results from polls.cache.get_results(), with the
+            ``tally_version`` of polls.tallies.tallied_results() if the
+            counts come from the tally store.
+        version - the results version, for Last-Modified.
+    """
+    question = results['question']
+    versions = [version, results.get('tally_version') or version]
+    modified = max([*map(version_time, versions), *[when for when in (question.pub_date, question.end_date) if when <= now]])
+    parts = [
+        'results', question.pk, question.question_text, question.pub_date.timestamp(), question.end_date.timestamp(),
+        question.can_vote(), results['total_votes'],
+        *[f'{choice.pk}={choice.vote_count}:{choice.choice_text}' for choice in results['choices']],
+    ]
+    return page_validators(request, parts, modified)
+
+
+def results_max_age(question, now):
+    """Return how long the results of question may be kept, None while they can change."""
+    if question.closed or question.end_date < now:
+        return getattr(settings, 'POLLS_CLOSED_RESULTS_MAX_AGE', 86400)
+    return None
@@ -0,0 +1,244 @@
+"""In-process change feed of poll results for KU Polls.
+
+Every committed vote publishes the id of its question to one feed per
+process.  Clients of the results stream subscribe to the topic of their
+question and wait on an asyncio event, so an idle stream costs a
+coroutine and nothing else.  A vote only wakes the streams of its own
+question, and the tallies are loaded once per change of a question, not
+once per client.
+
+Votes are published from whatever thread commits them, so the events are
+set through ``loop.call_soon_threadsafe`` on the loop of each subscriber.
+"""
+import asyncio
+import json
+import threading
+
+from asgiref.sync import sync_to_async
+from django.dispatch import receiver
+
+from . import metrics
+from .cache import aget_results, aload_results, results_data
+from .signals import vote_cast
+from .tallies import tallied_results
+
+
+class Topic:
+    """Subscribers and change version of one question."""
+
+    def __init__(self):
+        """Start at version 0 with nobody subscribed."""
+        self.version = 0
+        self.subscriptions = set()
+        self.snapshot_version = None
+        self.snapshot = None
+        self._lock = None
+        self._lock_loop = None
+
+    def lock(self):
+        """Return the lock that lets one subscriber load a snapshot for the others."""
+        loop = asyncio.get_running_loop()
+        if self._lock_loop is not loop:
+            self._lock, self._lock_loop = asyncio.Lock(), loop
+        return self._lock
+
+
+class Subscription:
+    """Subscription of one stream to the changes of one question.
+
+    Created by ResultsFeed.subscribe() on the event loop of the stream.
+    """
+
+    def __init__(self, feed, question_id, topic):
+        """Keep the topic and make the event that publish() sets."""
+        self.feed = feed
+        self.question_id = question_id
+        self.topic = topic
+        self.loop = asyncio.get_running_loop()
+        self.event = asyncio.Event()
+        self.version = None
+
+    def notify(self):
+        """Wake the subscriber from any thread."""
+        try:
+            self.loop.call_soon_threadsafe(self.event.set)
+        except RuntimeError:
+            # The loop of the subscriber is closed, it is going away.
+            pass
+
+    @property
+    def changed(self):
+        """Return true if the question changed since the last snapshot."""
+        return self.version != self.topic.version
+
+    async def wait(self, timeout):
+        """Wait up to timeout seconds for a change.
+
+        Return:
+            True if the question changed since the last snapshot.
+        """
+        if not self.changed:
+            try:
+                await asyncio.wait_for(self.event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        self.event.clear()
+        return self.changed
+
+    async def snapshot(self, load):
+        """Return the current snapshot of the question, loading it at most once per change.
+
+        Arguments:
+            load - coroutine function that takes the question id and
+                returns the snapshot.
+        """
+        topic = self.topic
+        async with topic.lock():
+            version = topic.version
+            if topic.snapshot_version != version:
+                topic.snapshot = await load(self.question_id)
+                topic.snapshot_version = version
+                metrics.increment('results_stream_snapshots')
+        self.version = version
+        return topic.snapshot
+
+    def close(self):
+        """Stop receiving changes."""
+        self.feed.unsubscribe(self)
+
+
+class ResultsFeed:
+    """Fan out question changes to the subscribed streams of this process."""
+
+    def __init__(self):
+        """Start without topics."""
+        self._topics = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, question_id):
+        """Return a new subscription to the changes of the question, call on the event loop."""
+        with self._lock:
+            topic = self._topics.get(question_id)
+            if topic is None:
+                topic = self._topics[question_id] = Topic()
+            subscription = Subscription(self, question_id, topic)
+            topic.subscriptions.add(subscription)
+        metrics.increment('results_stream_subscribed')
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Remove the subscription, and its topic when it was the last one."""
+        with self._lock:
+            topic = self._topics.get(subscription.question_id)
+            if topic is None:
+                return
+            topic.subscriptions.discard(subscription)
+            if not topic.subscriptions:
+                del self._topics[subscription.question_id]
+
+    def publish(self, question_id):
+        """Record a change of the question and wake its subscribers."""
+        with self._lock:
+            topic = self._topics.get(question_id)
+            if topic is None:
+                return
+            topic.version += 1
+            subscriptions = list(topic.subscriptions)
+        for subscription in subscriptions:
+            subscription.notify()
+        metrics.increment('results_stream_published')
+
+    def subscriber_count(self, question_id=None):
+        """Return the number of subscriptions to the question, or to all questions."""
+        with self._lock:
+            if question_id is not None:
+                topic = self._topics.get(question_id)
+                return len(topic.subscriptions) if topic else 0
+            return sum(len(topic.subscriptions) for topic in self._topics.values())
+
+
+feed = ResultsFeed()
+
+
+async def load_snapshot(question_id):
+    """Return the tallies of the question as a JSON-serializable dict.
+
+    Raise:
+        Http404 if the question does not exist.
+    """
+    return results_data(await aload_results(question_id))
+
+
+async def cached_snapshot(question_id):
+    """Return the tallies of the question like load_snapshot(), from the results cache and the tally store.
+
+    Raise:
+        Http404 if the question does not exist.
+    """
+    return results_data(await sync_to_async(tallied_results)(await aget_results(question_id)))
+
+
+def format_event(snapshot, retry_ms):
+    """Return the snapshot as one Server-Sent Event."""
+    return f'retry: {retry_ms}\nevent: results\ndata: {json.dumps(snapshot, separators=(",", ":"))}\n\n'
+
+
+async def stream_events(subscription, snapshot, max_rate=2.0, heartbeat=15, timeout=300, retry_ms=5000):
+    """Yield Server-Sent Events with the tallies of the subscribed question.
+
+    Arguments:
+        subscription - subscription to the question, closed when the
+            stream ends.
+        snapshot - the current tallies, sent first.
+        max_rate - most updates sent per second; the votes cast in between
+            are coalesced into the next update.
+        heartbeat - seconds of silence after which a comment is sent, so
+            proxies keep the connection open.
+        timeout - seconds after which the stream ends and the browser
+            reconnects, so a vanished client does not stay subscribed.
+        retry_ms - milliseconds the browser waits before it reconnects.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    try:
+        while True:
+            yield format_event(snapshot, retry_ms)
+            if not snapshot['open']:
+                # The tallies of a closed poll no longer change.
+                return
+            await asyncio.sleep(1 / max_rate)
+            while not await subscription.wait(min(heartbeat, max(deadline - loop.time(), 0))):
+                if loop.time() >= deadline:
+                    return
+                yield ': keep-alive\n\n'
+            snapshot = await subscription.snapshot(load_snapshot)
+    finally:
+        subscription.close()
+
+
+class EventStream:
+    """Async iterable of the events of stream_events() for a StreamingHttpResponse.
+
+    Django calls close() when the response is finished or the client went
+    away, which ends the subscription even if the events were not consumed.
+    """
+
+    def __init__(self, subscription, snapshot, **options):
+        """Keep the arguments of stream_events()."""
+        self.subscription = subscription
+        self.snapshot = snapshot
+        self.options = options
+
+    def __aiter__(self):
+        """Return the event generator."""
+        return stream_events(self.subscription, self.snapshot, **self.options)
+
+    def close(self):
+        """End the subscription."""
+        self.subscription.close()
+
+
+@receiver(vote_cast, dispatch_uid='polls.feed.vote_cast_callback')
+def vote_cast_callback(sender, question_id, **kwargs):
+    """Publish the question of every committed vote."""
+    feed.publish(question_id)
@@ -0,0 +1,39 @@
+"""Database indexes of KU Polls that the ORM cannot declare portably."""
+from django.db import models
+from django.db.models.functions import Collate, Upper
+
+
+class TextPrefixIndex(models.Index):
+    """Index that answers case-insensitive prefix searches (``istartswith``) on one text field.
+
+    Django runs istartswith as ``LIKE`` on SQLite, which can use an index
+    with the NOCASE collation, and as ``UPPER(...) LIKE UPPER(...)`` on
+    PostgreSQL, which can use an index on the upper-cased text with
+    text_pattern_ops.  Other databases get a plain index on the field.
+
+    Being part of the model state, the index is created again whenever
+    SQLite rebuilds the table.
+    """
+
+    def __init__(self, *, field, name):
+        """Index field under name."""
+        super().__init__(fields=[field], name=name)
+
+    def deconstruct(self):
+        """Return the arguments of __init__ for migrations."""
+        path, args, kwargs = super().deconstruct()
+        return path, args, {'field': self.fields[0], 'name': self.name}
+
+    def create_sql(self, model, schema_editor, using='', **kwargs):
+        """Return the statement that creates the index on the database of schema_editor."""
+        field = self.fields[0]
+        vendor = schema_editor.connection.vendor
+        if vendor == 'sqlite':
+            index = models.Index(Collate(field, 'NOCASE'), name=self.name)
+        elif vendor == 'postgresql':
+            from django.contrib.postgres.indexes import OpClass
+
+            index = models.Index(OpClass(Upper(field), name='text_pattern_ops'), name=self.name)
+        else:
+            index = models.Index(fields=[field], name=self.name)
+        return index.create_sql(model, schema_editor, using=using, **kwargs)
@@ -0,0 +1,384 @@
+"""Buffered vote ingestion for KU Polls.
+
+With ``POLLS_VOTE_MODE = 'buffered'`` a vote is acknowledged as soon as it
+is appended to a journal file and synced to disk.  A background thread
+takes the votes from a queue and writes them with ``Vote.objects.cast_many``
+in batches, one transaction per batch, so a burst of votes costs a handful
+of commits instead of one each.
+
+Every process appends to its own journal and holds a lock on it.  A
+checkpoint file next to the journal keeps the offset up to which the votes
+are in the database.  Journals left behind by a process that died are
+replayed when the next ingestor starts, or by the ``flush_votes`` command.
+
+A batch the database keeps refusing (an OperationalError after every
+retry, or any other database error) is set aside in ``rejected-votes.jsonl``
+so the votes after it are still written; ``flush_votes --rejected`` tries
+those votes again.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, OperationalError, connection
+
+from .models import Vote
+
+logger = logging.getLogger('polls')
+
+REJECTED_VOTES = 'rejected-votes.jsonl'
+
+
+class VoteJournal:
+    """Append-only file of votes that may not be in the database yet.
+
+    Arguments:
+        path - path of the journal file.
+        fsync - sync every appended vote to disk before returning.
+    """
+
+    def __init__(self, path, fsync=True):
+        """Keep the paths, the journal is opened by open()."""
+        self.path = Path(path)
+        self.checkpoint_path = self.path.with_suffix('.offset')
+        self.fsync = fsync
+        self._file = None
+        self._lock = threading.Lock()
+
+    def open(self):
+        """Open the journal for appending and take its lock.
+
+        Return:
+            False if another live process holds the journal.
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, 'ab')
+        if fcntl is not None:
+            try:
+                fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                self._file.close()
+                self._file = None
+                return False
+        return True
+
+    def close(self, remove=False):
+        """Release the journal, and delete it and its checkpoint if remove is true."""
+        if self._file is None:
+            return
+        if remove:
+            self.path.unlink(missing_ok=True)
+            self.checkpoint_path.unlink(missing_ok=True)
+        self._file.close()
+        self._file = None
+
+    def _size(self):
+        return os.fstat(self._file.fileno()).st_size
+
+    def append(self, entry, written=None):
+        """Write entry to the journal durably.
+
+        Arguments:
+            entry - the vote, a JSON-serializable dict.
+            written - called with the offset while the journal is still
+                locked, so whatever it records is in journal order.
+        Return:
+            The journal offset just after the entry.
+        """
+        line = (json.dumps(entry, separators=(',', ':')) + '\n').encode()
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            offset = self._size()
+            if written is not None:
+                written(offset)
+            return offset
+
+    def read_checkpoint(self):
+        """Return the offset up to which the votes are in the database."""
+        try:
+            return int(self.checkpoint_path.read_text())
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def pending(self):
+        """Return the (entry, offset) pairs written after the checkpoint."""
+        offset = self.read_checkpoint()
+        entries = []
+        with open(self.path, 'rb') as journal:
+            journal.seek(offset)
+            for line in journal:
+                if not line.endswith(b'\n'):
+                    # A torn write: the vote was never acknowledged.
+                    break
+                offset += len(line)
+                entries.append((json.loads(line), offset))
+        return entries
+
+    def checkpoint(self, offset):
+        """Record that the votes up to offset are in the database.
+
+        When every appended vote is in the database the journal is emptied,
+        so it only ever holds the votes that are still in flight.
+        """
+        with self._lock:
+            if offset >= self._size():
+                self._file.truncate(0)
+                offset = 0
+            temporary = self.checkpoint_path.with_suffix('.tmp')
+            temporary.write_text(str(offset))
+            os.replace(temporary, self.checkpoint_path)
+
+
+def entry_tuple(entry):
+    """Return the (user_id, question_id, choice_id) tuple of a journal entry."""
+    return entry['user'], entry['question'], entry['choice']
+
+
+def write_batch(entries):
+    """Write a batch of vote tuples, dropping the ones the database rejects.
+
+    Return:
+        The number of votes that were added or changed.
+    """
+    try:
+        return Vote.objects.cast_many(entries)
+    except IntegrityError:
+        # One of the votes points at a deleted question or choice; keep the rest.
+        written = 0
+        for entry in entries:
+            try:
+                written += Vote.objects.cast_many([entry])
+            except IntegrityError:
+                logger.error('Dropped buffered vote %s: its question or choice no longer exists', entry)
+        return written
+
+
+def set_aside(directory, entries):
+    """Append vote tuples the database refused to the rejected votes file in directory.
+
+    Return:
+        The path of the rejected votes file.
+    """
+    path = Path(directory) / REJECTED_VOTES
+    with open(path, 'a') as rejected:
+        for user_id, question_id, choice_id in entries:
+            rejected.write(json.dumps({'user': user_id, 'question': question_id, 'choice': choice_id},
+                                      separators=(',', ':')) + '\n')
+    return path
+
+
+def replay_rejected(directory, batch_size=500):
+    """Write the votes set aside in directory again and delete their file.
+
+    Return:
+        The number of votes replayed.
+    Raise:
+        DatabaseError if the database still refuses them; they stay set aside.
+    """
+    path = Path(directory) / REJECTED_VOTES
+    replaying = path.with_suffix('.replaying')
+    if not replaying.exists():
+        try:
+            # Votes set aside while this runs go to a new file.
+            os.replace(path, replaying)
+        except FileNotFoundError:
+            return 0
+    with open(replaying) as rejected:
+        entries = [entry_tuple(json.loads(line)) for line in rejected if line.strip()]
+    try:
+        for start in range(0, len(entries), batch_size):
+            write_batch(entries[start:start + batch_size])
+    except DatabaseError:
+        set_aside(directory, entries)
+        replaying.unlink()
+        raise
+    replaying.unlink()
+    return len(entries)
+
+
+def recover_journals(directory, batch_size=500):
+    """Replay and delete the journals in directory that no live process holds.
+
+    Return:
+        The number of journal entries replayed.
+    """
+    replayed = 0
+    for path in sorted(Path(directory).glob('votes-*.jsonl')):
+        journal = VoteJournal(path)
+        if not journal.open():
+            continue
+        entries = [entry_tuple(entry) for entry, _ in journal.pending()]
+        for start in range(0, len(entries), batch_size):
+            write_batch(entries[start:start + batch_size])
+        journal.close(remove=True)
+        replayed += len(entries)
+        if entries:
+            logger.warning('Recovered %d buffered votes from %s', len(entries), path)
+    return replayed
+
+
+class VoteIngestor:
+    """Journal votes on the request thread and write them in batches.
+
+    Arguments:
+        directory - directory of the journal files.
+        batch_size - largest number of votes written in one transaction.
+        flush_interval - seconds the writer waits for new votes before it
+            checks whether it should stop.
+        fsync - sync every journaled vote to disk before acknowledging it.
+        retries - times a batch is tried again after an OperationalError
+            before it is set aside.
+    """
+
+    def __init__(self, directory, batch_size=500, flush_interval=0.2, fsync=True, retries=5):
+        """Keep the settings, nothing runs until start()."""
+        self.directory = Path(directory)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.retries = retries
+        self.queue = queue.Queue()
+        self.journal = None
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self, worker=True):
+        """Replay journals left by dead processes, open this process journal and start the writer.
+
+        Arguments:
+            worker - start the background writer thread; without it the
+                queued votes are only written by drain().
+        """
+        recover_journals(self.directory, self.batch_size)
+        self.journal = VoteJournal(self.directory / f'votes-{os.getpid()}.jsonl', fsync=self.fsync)
+        if not self.journal.open():
+            raise RuntimeError(f'Vote journal {self.journal.path} is held by another process.')
+        if worker:
+            self._thread = threading.Thread(target=self._run, name='polls-vote-writer', daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def submit(self, user_id, question_id, choice_id):
+        """Journal a vote and queue it for the writer.
+
+        The vote is queued under the journal lock: the writer checkpoints
+        the offset of the last vote of each batch, and empties the journal
+        when that offset is its end, so the queue must be in journal order.
+        """
+        vote = (user_id, question_id, choice_id)
+        self.journal.append({'user': user_id, 'question': question_id, 'choice': choice_id},
+                            written=lambda offset: self.queue.put((vote, offset)))
+
+    def drain(self):
+        """Write every queued vote on the calling thread."""
+        while True:
+            batch = self._next_batch(block=False)
+            if not batch:
+                return
+            self._flush(batch)
+
+    def stop(self, timeout=10):
+        """Write the queued votes, stop the writer and release the journal."""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        else:
+            self.drain()
+        if self.journal is not None:
+            self.journal.close(remove=self.queue.empty() and not self.journal.pending())
+            self.journal = None
+
+    def _next_batch(self, block=True):
+        batch = []
+        try:
+            batch.append(self.queue.get(timeout=self.flush_interval) if block else self.queue.get_nowait())
+            while len(batch) < self.batch_size:
+                batch.append(self.queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _set_aside(self, entries):
+        path = set_aside(self.directory, entries)
+        logger.exception('Writing %d buffered votes failed, set them aside in %s', len(entries), path)
+
+    def _flush(self, batch):
+        entries = [entry for entry, _ in batch]
+        delay = self.flush_interval
+        retries = 0
+        while True:
+            try:
+                write_batch(entries)
+                break
+            except OperationalError:
+                # Most likely a locked database; the votes are safe in the journal.
+                if retries >= self.retries:
+                    self._set_aside(entries)
+                    break
+                retries += 1
+                logger.warning('Writing %d buffered votes failed, retry %d of %d in %.1fs',
+                               len(entries), retries, self.retries, delay, exc_info=True)
+                time.sleep(delay)
+                delay = min(delay * 2, 5)
+            except DatabaseError:
+                # Trying the same batch again would fail the same way.
+                self._set_aside(entries)
+                break
+        self.journal.checkpoint(batch[-1][1])
+
+    def _run(self):
+        try:
+            while not (self._stopping.is_set() and self.queue.empty()):
+                batch = self._next_batch()
+                if batch:
+                    self._flush(batch)
+        finally:
+            connection.close()
+
+
+_ingestor = None
+_ingestor_lock = threading.Lock()
+
+
+def get_ingestor():
+    """Return the ingestor of this process, starting it on first use."""
+    global _ingestor
+    with _ingestor_lock:
+        if _ingestor is None:
+            _ingestor = VoteIngestor(
+                settings.POLLS_VOTE_JOURNAL_DIR,
+                batch_size=getattr(settings, 'POLLS_VOTE_BATCH_SIZE', 500),
+                flush_interval=getattr(settings, 'POLLS_VOTE_FLUSH_INTERVAL', 0.2),
+                fsync=getattr(settings, 'POLLS_VOTE_JOURNAL_FSYNC', True),
+                retries=getattr(settings, 'POLLS_VOTE_WRITE_RETRIES', 5),
+            )
+            _ingestor.start()
+    return _ingestor
+
+
+def cast_vote(user, choice):
+    """Cast the vote of user for choice in the mode set by POLLS_VOTE_MODE.
+
+    In ``'sync'`` mode the vote is in the database when this returns; in
+    ``'buffered'`` mode it is in the journal and reaches the database with
+    the next batch.
+    """
+    if getattr(settings, 'POLLS_VOTE_MODE', 'sync') == 'buffered':
+        get_ingestor().submit(user.pk, choice.question_id, choice.pk)
+    else:
+        Vote.objects.cast(user, choice)
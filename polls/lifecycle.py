@@ -0,0 +1,124 @@
+"""Poll lifecycle for KU Polls.
+
+close_due_polls() finds the open polls whose end date has passed, writes
+the final tallies of each to a ResultSnapshot and marks it closed, so the
+results of a closed poll are read from one row.  It runs from the
+``close_polls`` management command, once or as a worker on an interval.
+
+With ``archive`` the Vote rows of a closed poll are also packed into a
+VoteArchive row and deleted.  The counters on Choice and Question and the
+hourly rollup are kept.  Editing a closed poll so that its end date is in
+the future again reopens it: the snapshot is dropped and the archived votes
+are put back.
+"""
+import datetime
+import logging
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import metrics
+from .models import Question, ResultSnapshot, Vote, VoteArchive
+
+logger = logging.getLogger('polls')
+
+
+def archive_votes(question):
+    """Pack the votes of question into a VoteArchive and delete them.
+
+    Return:
+        The number of votes archived.
+    """
+    votes = list(question.vote_set.order_by('pk').values_list('user_id', 'choice_id', 'cast_at'))
+    VoteArchive.objects.create(question=question, vote_count=len(votes), data=VoteArchive.pack(votes))
+    # Deleted past VoteQuerySet.delete(): the counters of an archived poll keep its votes.
+    votes_query = question.vote_set.all()
+    votes_query._raw_delete(votes_query.db)
+    return len(votes)
+
+
+def restore_votes(question):
+    """Put the archived votes of question back into the Vote table.
+
+    Votes of users or choices deleted since are left out.
+
+    Return:
+        The number of votes restored.
+    """
+    archive = VoteArchive.objects.filter(question=question).first()
+    if archive is None:
+        return 0
+    votes = archive.votes()
+    choice_ids = set(question.choice_set.values_list('pk', flat=True))
+    user_ids = set(User.objects.filter(pk__in={user_id for user_id, _, _ in votes}).values_list('pk', flat=True))
+    restored = Vote.objects.bulk_create([
+        Vote(question=question, user_id=user_id, choice_id=choice_id, cast_at=cast_at)
+        for user_id, choice_id, cast_at in votes
+        if choice_id in choice_ids and (user_id is None or user_id in user_ids)
+    ], batch_size=500)
+    archive.delete()
+    return len(restored)
+
+
+def close_poll(question_id, archive=False):
+    """Freeze the results of the question and mark it closed.
+
+    Return:
+        True if the question was closed by this call.
+    """
+    with transaction.atomic():
+        question = Question.objects.select_for_update().filter(pk=question_id, closed=False).first()
+        if question is None:
+            return False
+        ResultSnapshot.objects.create(
+            question=question,
+            total_votes=question.vote_total,
+            choices=[
+                {'id': pk, 'text': text, 'votes': votes}
+                for pk, text, votes in question.choice_set.order_by('pk').values_list('pk', 'choice_text', 'vote_count')
+            ],
+        )
+        if archive:
+            archive_votes(question)
+        question.closed = True
+        # Saved, not updated, so the results cache and the index move on.
+        question.save(update_fields=['closed'])
+    metrics.increment('polls_closed')
+    return True
+
+
+def close_due_polls(now=None, grace=60, archive=False):
+    """Close every open poll that ended more than grace seconds before now.
+
+    The grace period lets votes that were accepted just before the end,
+    or are still waiting in the vote buffer, reach the counters first.
+
+    Return:
+        The ids of the questions closed.
+    """
+    now = now or timezone.now()
+    due = Question.objects.filter(closed=False, end_date__lt=now - datetime.timedelta(seconds=grace))
+    closed = [pk for pk in due.order_by('end_date').values_list('pk', flat=True) if close_poll(pk, archive)]
+    if closed:
+        logger.info('Closed %d polls', len(closed))
+    return closed
+
+
+@receiver(pre_save, sender=Question, dispatch_uid='polls.lifecycle.question_pre_save')
+def question_pre_save(sender, instance, update_fields=None, **kwargs):
+    """Reopen a closed question whose end date was moved into the future."""
+    if instance.closed and instance.end_date >= timezone.now() and update_fields is None:
+        instance.closed = False
+        instance._reopened = True
+
+
+@receiver(post_save, sender=Question, dispatch_uid='polls.lifecycle.question_post_save')
+def question_post_save(sender, instance, **kwargs):
+    """Drop the snapshot and restore the archived votes of a reopened question."""
+    if instance.__dict__.pop('_reopened', False):
+        ResultSnapshot.objects.filter(question=instance).delete()
+        restore_votes(instance)
+        metrics.increment('polls_reopened')
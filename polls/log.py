@@ -0,0 +1,116 @@
+"""Logging helpers for KU Polls.
+
+In ``'queue'`` mode (``POLLS_LOG_MODE``) the handlers of the polls loggers
+are moved behind a bounded queue and run by a listener thread, so a slow
+or blocked log sink never holds up a request.  When the queue is full the
+record is dropped and counted instead of waiting for room.
+"""
+import atexit
+import json
+import logging
+import logging.config
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+from . import metrics
+
+# Attributes every LogRecord has; anything else was passed with ``extra``.
+_RECORD_ATTRIBUTES = set(logging.LogRecord('', 0, '', 0, '', (), None).__dict__) | {'message', 'asctime'}
+
+_listeners = []
+
+
+def extra_fields(record):
+    """Return the fields passed to the logging call with ``extra``."""
+    return {key: value for key, value in record.__dict__.items() if key not in _RECORD_ATTRIBUTES}
+
+
+class KeyValueFormatter(logging.Formatter):
+    """Formatter that appends the ``extra`` fields of a record as key=value pairs."""
+
+    def format(self, record):
+        """Format the record and append its extra fields."""
+        message = super().format(record)
+        fields = ' '.join(f'{key}={value}' for key, value in extra_fields(record).items())
+        return f'{message} {fields}' if fields else message
+
+
+class JsonFormatter(logging.Formatter):
+    """Formatter that writes a record and its ``extra`` fields as one JSON line."""
+
+    def format(self, record):
+        """Return the record as a JSON object."""
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update(extra_fields(record))
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class BoundedQueueHandler(QueueHandler):
+    """Queue handler that drops records instead of blocking when the queue is full.
+
+    Arguments:
+        maxsize - largest number of records waiting for the listener.
+    """
+
+    def __init__(self, maxsize=10000):
+        """Create the handler with its own bounded queue."""
+        super().__init__(queue.Queue(maxsize))
+        self.dropped = 0
+
+    def enqueue(self, record):
+        """Put the record on the queue, or count it as dropped."""
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            metrics.increment('log_records_dropped')
+
+
+class BoundedQueueListener(QueueListener):
+    """Queue listener that waits for room in a full queue to stop."""
+
+    def enqueue_sentinel(self):
+        """Put the stop marker on the queue once there is room for it."""
+        self.queue.put(self._sentinel)
+
+
+def stop_listeners():
+    """Stop the listener threads, writing out the records they still hold."""
+    while _listeners:
+        _listeners.pop().stop()
+
+
+def queue_logger(logger, maxsize=10000):
+    """Move the handlers of logger behind a bounded queue served by a listener thread.
+
+    Return:
+        The queue handler now attached to logger.
+    """
+    handlers = list(logger.handlers)
+    handler = BoundedQueueHandler(maxsize)
+    listener = BoundedQueueListener(handler.queue, *handlers, respect_handler_level=True)
+    for target in handlers:
+        logger.removeHandler(target)
+    logger.addHandler(handler)
+    listener.start()
+    _listeners.append(listener)
+    return handler
+
+
+def configure(config, mode='sync', queued_loggers=('polls', 'polls.requests'), maxsize=10000):
+    """Apply the dictConfig config, then queue the given loggers in 'queue' mode."""
+    stop_listeners()
+    logging.config.dictConfig(config)
+    if mode == 'queue':
+        for name in queued_loggers:
+            queue_logger(logging.getLogger(name), maxsize)
+
+
+atexit.register(stop_listeners)
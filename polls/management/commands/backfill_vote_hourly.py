@@ -0,0 +1,25 @@
+"""Rebuild the hourly vote rollup from the Vote table."""
+from django.core.management.base import BaseCommand
+
+from polls.models import VoteHourly
+
+
+class Command(BaseCommand):
+    """Recount every VoteHourly bucket from the cast times of the votes."""
+
+    help = ('Rebuild the hourly vote rollup from Vote.cast_at. '
+            'Votes cast before cast times were recorded are left out.')
+
+    def add_arguments(self, parser):
+        """Add the --batch-size option."""
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Buckets inserted per query (default: 1000).',
+        )
+
+    def handle(self, *args, **options):
+        """Rebuild the rollup and report its size."""
+        buckets = VoteHourly.objects.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(f'Wrote {buckets} hourly vote buckets.')
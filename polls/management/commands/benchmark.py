@@ -0,0 +1,53 @@
+"""Run a benchmark suite and print its results as JSON."""
+import json
+import subprocess
+from importlib import import_module
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from polls.benchmarks import SUITES
+
+
+def current_commit():
+    """Return the git commit of the working tree, or None outside a checkout."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    """Run one of the suites in polls.benchmarks."""
+
+    help = 'Run a benchmark suite against a scratch database and print JSON results.'
+
+    def add_arguments(self, parser):
+        """Add the suite name and the shared options."""
+        parser.add_argument('suite', choices=sorted(SUITES), help='Benchmark suite to run.')
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent workers (default: 8).')
+        parser.add_argument('--iterations', type=int, default=200,
+                            help='Operations per worker (default: 200).')
+        parser.add_argument('--output', help='Write the JSON results to this file instead of stdout.')
+        for module in SUITES.values():
+            add_suite_arguments = getattr(import_module(module), 'add_arguments', None)
+            if add_suite_arguments is not None:
+                add_suite_arguments(parser)
+
+    def handle(self, *args, **options):
+        """Run the suite and write its results."""
+        run = import_module(SUITES[options['suite']]).run
+        report = {
+            'suite': options['suite'],
+            'commit': current_commit(),
+            'started': timezone.now().isoformat(),
+            'results': run(options),
+        }
+        text = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(text + '\n')
+        else:
+            self.stdout.write(text)
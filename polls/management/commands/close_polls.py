@@ -0,0 +1,43 @@
+"""Close the polls that have ended and freeze their results."""
+import time
+
+from django.core.management.base import BaseCommand
+
+from polls.lifecycle import close_due_polls
+
+
+class Command(BaseCommand):
+    """Write the result snapshot of every ended poll and mark it closed."""
+
+    help = ('Close the polls whose end date has passed, freezing their results in a snapshot. '
+            'With --interval, keep running and close polls as they end.')
+
+    def add_arguments(self, parser):
+        """Add the --grace, --archive-votes and --interval options."""
+        parser.add_argument(
+            '--grace',
+            type=int,
+            default=60,
+            help='Seconds after the end date before a poll is closed (default: 60).',
+        )
+        parser.add_argument(
+            '--archive-votes',
+            action='store_true',
+            help='Also pack the Vote rows of each closed poll into one archive row and delete them.',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=None,
+            help='Run as a worker, looking for ended polls every this many seconds.',
+        )
+
+    def handle(self, *args, **options):
+        """Close the ended polls once, or on every interval until interrupted."""
+        while True:
+            closed = close_due_polls(grace=options['grace'], archive=options['archive_votes'])
+            if closed or options['interval'] is None:
+                self.stdout.write(f'Closed {len(closed)} polls.')
+            if options['interval'] is None:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,31 @@
+"""Export vote tallies or votes as CSV or JSON Lines."""
+from django.core.management.base import BaseCommand
+
+from polls.transfer import EXPORTS, FORMATS, render
+
+
+class Command(BaseCommand):
+    """Stream the tallies of every choice, or every vote, to a file or stdout."""
+
+    help = 'Export the tallies of every choice or every vote as CSV or JSON Lines.'
+
+    def add_arguments(self, parser):
+        """Add the export, format and output options."""
+        parser.add_argument('export', choices=sorted(EXPORTS), help='What to export.')
+        parser.add_argument('--format', choices=FORMATS, default='csv', help='Output format (default: csv).')
+        parser.add_argument('--output', help='Write to this file instead of stdout.')
+        parser.add_argument('--question', type=int, action='append', dest='questions',
+                            help='Only export this question, can be repeated.')
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help='Rows fetched from the database at a time (default: 2000).')
+
+    def handle(self, *args, **options):
+        """Write the export chunk by chunk."""
+        rows = EXPORTS[options['export']](options['questions'], chunk_size=options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as output:
+                for chunk in render(rows, options['format']):
+                    output.write(chunk)
+        else:
+            for chunk in render(rows, options['format']):
+                self.stdout.write(chunk, ending='')
@@ -0,0 +1,36 @@
+"""Write the votes left in buffered vote journals to the database."""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from polls.ingest import recover_journals, replay_rejected
+
+
+class Command(BaseCommand):
+    """Replay the journals of processes that stopped before writing their votes."""
+
+    help = 'Replay buffered vote journals that no running process holds.'
+
+    def add_arguments(self, parser):
+        """Add the --directory option."""
+        parser.add_argument(
+            '--directory',
+            default=settings.POLLS_VOTE_JOURNAL_DIR,
+            help='Directory of the vote journals (default: POLLS_VOTE_JOURNAL_DIR).',
+        )
+        parser.add_argument(
+            '--rejected',
+            action='store_true',
+            help='Also try the votes the database refused again, from rejected-votes.jsonl.',
+        )
+
+    def handle(self, *args, **options):
+        """Replay the journals and report how many votes were found."""
+        replayed = recover_journals(options['directory'], settings.POLLS_VOTE_BATCH_SIZE)
+        self.stdout.write(f'Replayed {replayed} buffered votes.')
+        if options['rejected']:
+            try:
+                replayed = replay_rejected(options['directory'], settings.POLLS_VOTE_BATCH_SIZE)
+            except DatabaseError as error:
+                raise CommandError(f'The rejected votes were refused again: {error}') from error
+            self.stdout.write(f'Replayed {replayed} rejected votes.')
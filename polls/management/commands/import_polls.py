@@ -0,0 +1,38 @@
+"""Import questions and choices from a CSV or JSON Lines file."""
+import sys
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from polls.transfer import FORMATS, import_polls
+
+
+class Command(BaseCommand):
+    """Create questions and choices in bulk from one record per choice."""
+
+    help = ('Import questions and choices from CSV or JSON Lines with the fields '
+            'question_text, pub_date, end_date and choice_text, one record per choice.')
+
+    def add_arguments(self, parser):
+        """Add the file and the format options."""
+        parser.add_argument('path', help='File to import, or - for standard input.')
+        parser.add_argument('--format', choices=FORMATS,
+                            help='Format of the file (default: from its extension).')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Questions created per transaction (default: 500).')
+
+    def handle(self, *args, **options):
+        """Import the file and report what was created."""
+        path = options['path']
+        fmt = options['format'] or Path(path).suffix.lstrip('.').lower()
+        if fmt not in FORMATS:
+            raise CommandError(f'Cannot tell the format of {path}, use --format.')
+        try:
+            if path == '-':
+                created = import_polls(sys.stdin, fmt, options['batch_size'])
+            else:
+                with open(path, newline='', encoding='utf-8') as stream:
+                    created = import_polls(stream, fmt, options['batch_size'])
+        except (OSError, ValueError) as error:
+            raise CommandError(error)
+        self.stdout.write(f'Imported {created[0]} questions with {created[1]} choices.')
@@ -0,0 +1,28 @@
+"""Rebuild the stored vote counters from the Vote table."""
+from django.core.management.base import BaseCommand, CommandError
+
+from polls.models import Vote
+
+
+class Command(BaseCommand):
+    """Recount Choice.vote_count and Question.vote_total from Vote rows."""
+
+    help = 'Rebuild or check the per-choice and per-question vote counters.'
+
+    def add_arguments(self, parser):
+        """Add the --check option."""
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only report counters that are out of date, do not fix them.',
+        )
+
+    def handle(self, *args, **options):
+        """Reconcile the counters and report what was out of date."""
+        fix = not options['check']
+        stale_choices, stale_questions = Vote.objects.reconcile_counters(fix=fix)
+        verb = 'Fixed' if fix else 'Found'
+        self.stdout.write(f'{verb} {len(stale_choices)} stale choice counters '
+                          f'and {len(stale_questions)} stale question totals.')
+        if not fix and (stale_choices or stale_questions):
+            raise CommandError('Vote counters are out of date, run rebuild_vote_counts to fix them.')
@@ -0,0 +1,29 @@
+"""In-process counters for KU Polls that can be scraped from the metrics page."""
+import threading
+from collections import defaultdict
+
+_lock = threading.Lock()
+_counters = defaultdict(int)
+
+
+def increment(name, amount=1):
+    """Add amount to the counter called name."""
+    with _lock:
+        _counters[name] += amount
+
+
+def get_counters():
+    """Return a copy of all counters sorted by name."""
+    with _lock:
+        return dict(sorted(_counters.items()))
+
+
+def reset():
+    """Set every counter back to zero."""
+    with _lock:
+        _counters.clear()
+
+
+def render():
+    """Return the counters in the Prometheus text exposition format."""
+    return ''.join(f'polls_{name}_total {value}\n' for name, value in get_counters().items())
@@ -0,0 +1,283 @@
+"""Middleware for KU Polls."""
+import json
+import logging
+import mimetypes
+import os
+import random
+import time
+from contextlib import ExitStack
+from urllib.parse import urlsplit
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.utils.functional import SimpleLazyObject
+from django.utils.http import http_date, parse_http_date_safe
+
+from .auth import get_cached_user
+from .storage import ENCODINGS
+
+logger = logging.getLogger('polls.requests')
+
+
+class RequestTiming:
+    """Queries and timings of one request.
+
+    Also an execute wrapper, so it sees every query the request runs.
+    """
+
+    def __init__(self):
+        """Start with no queries and the clock running."""
+        self.start = time.perf_counter()
+        self.view_end = None
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        """Run the query and record its SQL and duration."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start))
+
+    @property
+    def db_ms(self):
+        """Return the milliseconds spent in queries."""
+        return sum(duration for _, duration in self.queries) * 1000
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2)
+
+
+class TimingMiddleware:
+    """Measure the queries, view and template render time of every request.
+
+    The numbers are sent back in a ``Server-Timing`` header and logged as
+    fields of a record on the ``polls.requests`` logger.  Requests slower
+    than ``POLLS_SLOW_REQUEST_MS`` are logged at WARNING with their queries,
+    for a ``POLLS_SLOW_REQUEST_SAMPLE_RATE`` share of them.
+
+    The render time is only separate for views that return a
+    TemplateResponse, which is rendered after the view returns.
+
+    Under ASGI the middleware runs on the event loop.  The queries of a
+    request then run on its thread-sensitive executor thread, so the
+    wrappers are installed on the connections of that thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        """Keep the next handler."""
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        """Time the request and annotate the response."""
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timing = request.timing = RequestTiming()
+        with ExitStack() as stack:
+            self._wrap_connections(stack, timing)
+            response = self.get_response(request)
+        return self._finish(request, timing, response)
+
+    async def __acall__(self, request):
+        """Time the request on the event loop and annotate the response."""
+        timing = request.timing = RequestTiming()
+        stack = ExitStack()
+        await sync_to_async(self._wrap_connections)(stack, timing)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self._finish(request, timing, response)
+
+    @staticmethod
+    def _wrap_connections(stack, timing):
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(timing))
+
+    def _finish(self, request, timing, response):
+        end = time.perf_counter()
+        view_end = timing.view_end or end
+        fields = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': len(timing.queries),
+            'db_ms': round(timing.db_ms, 2),
+            'view_ms': _ms(view_end - timing.start),
+            'render_ms': _ms(end - view_end),
+            'total_ms': _ms(end - timing.start),
+        }
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={fields["db_ms"]};desc="{fields["queries"]} queries"',
+            f'view;dur={fields["view_ms"]}',
+            f'render;dur={fields["render_ms"]}',
+            f'total;dur={fields["total_ms"]}',
+        ])
+        slow = fields['total_ms'] >= getattr(settings, 'POLLS_SLOW_REQUEST_MS', 500)
+        if slow and random.random() < getattr(settings, 'POLLS_SLOW_REQUEST_SAMPLE_RATE', 1.0):
+            fields['sql'] = [(sql, _ms(duration)) for sql, duration in timing.queries]
+            logger.warning('Slow request %s %s', request.method, request.path, extra=fields)
+        else:
+            logger.info('Request %s %s', request.method, request.path, extra=fields)
+        return response
+
+    def process_template_response(self, request, response):
+        """Mark the end of the view, the template is rendered after this."""
+        request.timing.view_end = time.perf_counter()
+        return response
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """AuthenticationMiddleware that loads request.user through polls.auth.get_cached_user()."""
+
+    def process_request(self, request):
+        """Set request.user to the lazily loaded, cached user of the session."""
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: _cached_user(request))
+
+
+def _cached_user(request):
+    if not hasattr(request, '_cached_user'):
+        request._cached_user = get_cached_user(request)
+    return request._cached_user
+
+
+def accepted_encodings(header):
+    """Return the content codings an Accept-Encoding header allows."""
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.partition(';')
+        coding = coding.strip().lower()
+        params = params.strip()
+        quality = 1.0
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                pass
+        if coding and quality > 0:
+            accepted.add(coding)
+    if '*' in accepted:
+        accepted.update(ENCODINGS)
+    return accepted
+
+
+class StaticFile:
+    """A collected static file and its precompressed copies.
+
+    Files up to ``StaticFilesMiddleware.memory_limit`` bytes are kept in
+    memory, so serving them touches neither the disk nor a thread.
+    """
+
+    def __init__(self, path, memory_limit):
+        """Stat the file and its copies, and read the small ones."""
+        stat = os.stat(path)
+        self.mtime = int(stat.st_mtime)
+        self.content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.variants = {}
+        for encoding, suffix in [*ENCODINGS.items(), (None, '')]:
+            if os.path.exists(path + suffix):
+                size = os.path.getsize(path + suffix)
+                content = None
+                if size <= memory_limit:
+                    with open(path + suffix, 'rb') as variant:
+                        content = variant.read()
+                self.variants[encoding] = (path + suffix, content)
+
+    def variant(self, accepted):
+        """Return the (encoding, path, content) to send to a client that accepts accepted."""
+        for encoding in ENCODINGS:
+            if encoding in accepted and encoding in self.variants:
+                return (encoding, *self.variants[encoding])
+        return (None, *self.variants[None])
+
+
+class StaticFilesMiddleware:
+    """Serve the files collected in STATIC_ROOT with long-lived cache headers.
+
+    The files are indexed when the server starts, so run collectstatic
+    first.  Names from the staticfiles manifest carry a content hash and
+    are cached by clients for a year as immutable; other files for
+    ``POLLS_STATIC_MAX_AGE`` seconds.  The precompressed copies written by
+    CompressedManifestStaticFilesStorage are sent to clients that accept
+    them.
+    """
+
+    sync_capable = True
+    async_capable = True
+    memory_limit = 1024 * 1024
+
+    def __init__(self, get_response):
+        """Index STATIC_ROOT, or step aside if nothing was collected."""
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        root = settings.STATIC_ROOT
+        if not root or not os.path.isdir(root):
+            raise MiddlewareNotUsed(f'STATIC_ROOT {root} does not exist, run collectstatic.')
+        self.prefix = urlsplit(settings.STATIC_URL).path
+        self.files = {}
+        for directory, _, names in os.walk(root):
+            for name in names:
+                if name.endswith(tuple(ENCODINGS.values())):
+                    continue
+                path = os.path.join(directory, name)
+                self.files[os.path.relpath(path, root).replace(os.sep, '/')] = StaticFile(path, self.memory_limit)
+        self.immutable = set()
+        try:
+            with open(os.path.join(root, 'staticfiles.json')) as manifest:
+                self.immutable.update(json.load(manifest).get('paths', {}).values())
+        except (OSError, ValueError):
+            pass
+        self.max_age = getattr(settings, 'POLLS_STATIC_MAX_AGE', 60)
+
+    def __call__(self, request):
+        """Serve a collected file, or pass the request on."""
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.serve(request)
+        return response if response is not None else self.get_response(request)
+
+    async def __acall__(self, request):
+        """Serve a collected file, or pass the request on to the async handler."""
+        response = self.serve(request)
+        return response if response is not None else await self.get_response(request)
+
+    def serve(self, request):
+        """Return the response for a collected file, or None for any other request."""
+        if request.method not in ('GET', 'HEAD') or not request.path.startswith(self.prefix):
+            return None
+        name = request.path[len(self.prefix):]
+        static_file = self.files.get(name)
+        if static_file is None:
+            return None
+        modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+        if modified_since is not None and static_file.mtime <= modified_since:
+            response = HttpResponseNotModified()
+        else:
+            encoding, path, content = static_file.variant(accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', '')))
+            if content is not None:
+                response = HttpResponse(content, content_type=static_file.content_type)
+                response['Content-Length'] = len(content)
+            else:
+                response = FileResponse(open(path, 'rb'), content_type=static_file.content_type)
+            if encoding:
+                response['Content-Encoding'] = encoding
+        response['Last-Modified'] = http_date(static_file.mtime)
+        if len(static_file.variants) > 1:
+            response['Vary'] = 'Accept-Encoding'
+        if name in self.immutable:
+            response['Cache-Control'] = 'public, max-age=31536000, immutable'
+        else:
+            response['Cache-Control'] = f'public, max-age={self.max_age}'
+        return response
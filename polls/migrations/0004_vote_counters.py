@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:10
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_votes(apps, schema_editor):
+    Choice = apps.get_model('polls', 'Choice')
+    Question = apps.get_model('polls', 'Question')
+    Vote = apps.get_model('polls', 'Vote')
+    for choice_id, n in Vote.objects.values_list('choice').annotate(n=Count('id')).order_by():
+        Choice.objects.filter(pk=choice_id).update(vote_count=n)
+    for question_id, n in Vote.objects.values_list('question').annotate(n=Count('id')).order_by():
+        Question.objects.filter(pk=question_id).update(vote_total=n)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0003_auto_20201024_1631'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='choice',
+            name='vote_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='votes'),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='vote_total',
+            field=models.PositiveIntegerField(default=0, verbose_name='total votes'),
+        ),
+        migrations.RunPython(count_votes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:13
+
+from django.db import migrations, models
+from django.db.models import Count, F, Max
+
+
+def remove_duplicate_votes(apps, schema_editor):
+    """Keep only the latest vote of each user on each question and recount."""
+    Choice = apps.get_model('polls', 'Choice')
+    Question = apps.get_model('polls', 'Question')
+    Vote = apps.get_model('polls', 'Vote')
+    duplicates = (Vote.objects.filter(user__isnull=False).values('question', 'user')
+                  .annotate(n=Count('id'), latest=Max('id')).filter(n__gt=1).order_by())
+    if not duplicates:
+        return
+    for row in duplicates:
+        Vote.objects.filter(question=row['question'], user=row['user']).exclude(pk=row['latest']).delete()
+    Choice.objects.update(vote_count=0)
+    Question.objects.update(vote_total=0)
+    for choice_id, n in Vote.objects.values_list('choice').annotate(n=Count('id')).order_by():
+        Choice.objects.filter(pk=choice_id).update(vote_count=F('vote_count') + n)
+    for question_id, n in Vote.objects.values_list('question').annotate(n=Count('id')).order_by():
+        Question.objects.filter(pk=question_id).update(vote_total=F('vote_total') + n)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0005_question_pub_date_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_votes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='vote',
+            constraint=models.UniqueConstraint(fields=('question', 'user'), name='polls_vote_unique_question_user'),
+        ),
+    ]
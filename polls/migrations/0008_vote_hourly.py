@@ -0,0 +1,43 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:36
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0007_hot_query_indexes'),
+    ]
+
+    operations = [
+        # Existing votes keep a null cast time, it was never recorded.
+        migrations.AddField(
+            model_name='vote',
+            name='cast_at',
+            field=models.DateTimeField(null=True, verbose_name='cast at'),
+        ),
+        migrations.AlterField(
+            model_name='vote',
+            name='cast_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, null=True, verbose_name='cast at'),
+        ),
+        migrations.CreateModel(
+            name='VoteHourly',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField(verbose_name='hour')),
+                ('count', models.IntegerField(default=0, verbose_name='votes')),
+                ('choice', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='polls.choice')),
+                ('question', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='polls.question')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['question', 'hour'], name='polls_votehourly_question_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='votehourly',
+            constraint=models.UniqueConstraint(fields=('choice', 'hour'), name='polls_votehourly_unique_choice_hour'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:52
+
+from django.db import migrations
+
+INDEX_NAME = 'polls_question_text_prefix_idx'
+
+
+def create_index(apps, schema_editor):
+    """Create an index that answers case-insensitive prefix searches on question_text.
+
+    Django runs istartswith as ``LIKE`` on SQLite, which can use an index
+    with the NOCASE collation, and as ``UPPER(...) LIKE UPPER(...)`` on
+    PostgreSQL, which can use an index on the upper-cased text.
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(f'CREATE INDEX {INDEX_NAME} ON polls_question (question_text COLLATE NOCASE)')
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            f'CREATE INDEX {INDEX_NAME} ON polls_question ((UPPER(question_text::text)) text_pattern_ops)')
+
+
+def drop_index(apps, schema_editor):
+    """Drop the prefix search index where it was created."""
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0008_vote_hourly'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
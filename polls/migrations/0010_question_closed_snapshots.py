@@ -0,0 +1,55 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+TEXT_INDEX_NAME = 'polls_question_text_prefix_idx'
+
+
+def restore_text_index(apps, schema_editor):
+    """Create the prefix search index of migration 0009 again.
+
+    SQLite adds the closed column by rebuilding the table, which drops the
+    indexes that are not part of the model state.
+    """
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {TEXT_INDEX_NAME} ON polls_question (question_text COLLATE NOCASE)')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0009_question_text_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResultSnapshot',
+            fields=[
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='snapshot', serialize=False, to='polls.question')),
+                ('total_votes', models.PositiveIntegerField(verbose_name='total votes')),
+                ('choices', models.JSONField()),
+                ('closed_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='closed at')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='VoteArchive',
+            fields=[
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='vote_archive', serialize=False, to='polls.question')),
+                ('vote_count', models.PositiveIntegerField(verbose_name='votes')),
+                ('data', models.BinaryField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='closed',
+            field=models.BooleanField(default=False, verbose_name='closed'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['closed', 'end_date'], name='polls_question_closed_end_idx'),
+        ),
+        migrations.RunPython(restore_text_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:21
+
+from django.db import migrations
+
+FTS_TABLE = 'polls_question_fts'
+
+INDEX_NAME = 'polls_question_search_idx'
+
+SQLITE_TRIGGERS = {
+    'polls_question_fts_insert': (
+        f'AFTER INSERT ON polls_question BEGIN '
+        f'INSERT INTO {FTS_TABLE} (rowid, question_text) VALUES (new.id, new.question_text); END'
+    ),
+    'polls_question_fts_delete': (
+        f'AFTER DELETE ON polls_question BEGIN '
+        f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, question_text) VALUES ('delete', old.id, old.question_text); END"
+    ),
+    'polls_question_fts_update': (
+        f'AFTER UPDATE OF question_text ON polls_question BEGIN '
+        f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, question_text) VALUES ('delete', old.id, old.question_text); "
+        f'INSERT INTO {FTS_TABLE} (rowid, question_text) VALUES (new.id, new.question_text); END'
+    ),
+}
+
+
+def create_search_index(apps, schema_editor):
+    """Create the full-text index of question_text, see polls.search.
+
+    On SQLite it is an FTS5 table over the rows of polls_question, kept in
+    sync by triggers on every insert, update and delete, bulk ones too.
+    Migrations that make SQLite rebuild polls_question drop the triggers
+    and must create them again.  On PostgreSQL it is a GIN index on the
+    same to_tsvector() expression that polls.search queries.
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(question_text, content=polls_question, '
+            f"content_rowid=id, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        for name, body in SQLITE_TRIGGERS.items():
+            schema_editor.execute(f'CREATE TRIGGER {name} {body}')
+        schema_editor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')")
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            f'CREATE INDEX {INDEX_NAME} ON polls_question USING gin '
+            f"(to_tsvector('english'::regconfig, COALESCE((question_text)::text, '')))"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    """Drop the full-text index where it was created."""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for name in SQLITE_TRIGGERS:
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {name}')
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+    elif vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0010_question_closed_snapshots'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
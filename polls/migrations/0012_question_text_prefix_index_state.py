@@ -0,0 +1,45 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:31
+
+from django.db import migrations
+import polls.indexes
+
+INDEX_NAME = 'polls_question_text_prefix_idx'
+
+
+def create_index(apps, schema_editor):
+    """Create the prefix search index on the databases where migration 0009 did not."""
+    if schema_editor.connection.vendor not in ('sqlite', 'postgresql'):
+        Question = apps.get_model('polls', 'Question')
+        schema_editor.add_index(Question, polls.indexes.TextPrefixIndex(field='question_text', name=INDEX_NAME))
+
+
+def drop_index(apps, schema_editor):
+    """Drop the index created by create_index()."""
+    if schema_editor.connection.vendor not in ('sqlite', 'postgresql'):
+        Question = apps.get_model('polls', 'Question')
+        schema_editor.remove_index(Question, polls.indexes.TextPrefixIndex(field='question_text', name=INDEX_NAME))
+
+
+class Migration(migrations.Migration):
+    """Track the prefix search index of migration 0009 in the model state.
+
+    The index was raw SQL outside the state, so every SQLite table rebuild
+    dropped it (see 0010).  The database already has it on SQLite and
+    PostgreSQL, so only the state changes there.
+    """
+
+    dependencies = [
+        ('polls', '0011_question_fulltext_search'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[migrations.RunPython(create_index, drop_index)],
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='question',
+                    index=polls.indexes.TextPrefixIndex(field='question_text', name=INDEX_NAME),
+                ),
+            ],
+        ),
+    ]
@@ -1,14 +1,91 @@
 """Create models for KU Polls."""
 import datetime
+import struct
+import zlib
+from collections import Counter
 
 from django.contrib.auth.models import User
-from django.db import models
+from django.db import IntegrityError, connections, models, router, transaction
+from django.db.models import Case, Count, F, Q, Value, When
+from django.db.models.functions import Cast, Coalesce, NullIf, TruncHour
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
 from django.utils import timezone
 
+from .indexes import TextPrefixIndex
+from .signals import send_vote_cast, send_votes_deleted
+
 
 # Create your models here.
 
 
+def hour_bucket(when):
+    """Return the start of the UTC hour that when falls in."""
+    return when.astimezone(datetime.timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+class QuestionQuerySet(models.QuerySet):
+    """QuerySet for questions with status computed in the database."""
+
+    def with_status(self, now=None):
+        """Annotate each question with is_open, compared against one timestamp, as can_vote() is.
+
+        Arguments:
+            now - the time to compare with, default to the current time.
+        """
+        now = now or timezone.now()
+        return self.annotate(is_open=Case(
+            When(closed=False, pub_date__lte=now, end_date__gte=now, then=Value(True)),
+            default=Value(False),
+            output_field=models.BooleanField(),
+        ))
+
+    def before(self, pub_date, pk):
+        """Return questions that come after (pub_date, pk) in newest first order.
+
+        The redundant pub_date__lte bound lets the database seek into the
+        pub_date, id index instead of scanning it from the start.
+        """
+        return self.filter(Q(pub_date__lt=pub_date) | Q(pk__lt=pk), pub_date__lte=pub_date)
+
+    def with_flags(self, now=None):
+        """Annotate is_open, published and published_recently, compared against one timestamp.
+
+        Arguments:
+            now - the time to compare with, default to the current time.
+        """
+        now = now or timezone.now()
+        return self.with_status(now).annotate(
+            published=Case(
+                When(pub_date__lte=now, then=Value(True)),
+                default=Value(False),
+                output_field=models.BooleanField(),
+            ),
+            published_recently=Case(
+                When(pub_date__gte=now - datetime.timedelta(days=1), pub_date__lte=now, then=Value(True)),
+                default=Value(False),
+                output_field=models.BooleanField(),
+            ),
+        )
+
+    def with_state(self, state, now=None):
+        """Return the questions that are 'open', 'closed' or 'upcoming' at now.
+
+        Each state is a range on pub_date or end_date, so it is answered
+        from the pub_date and end_date indexes.  A question closed by
+        close_polls before its end date is closed.
+        """
+        now = now or timezone.now()
+        if state == 'open':
+            return self.filter(closed=False, pub_date__lte=now, end_date__gte=now)
+        if state == 'closed':
+            # Ended, or closed early; split on end_date so both halves are ranges on an index.
+            return self.filter(Q(end_date__lt=now) | Q(closed=True, end_date__gte=now))
+        if state == 'upcoming':
+            return self.filter(closed=False, pub_date__gt=now)
+        raise ValueError(f'Unknown question state {state!r}')
+
+
 class Question(models.Model):
     """Question model for KU Polls.
 
@@ -18,6 +95,19 @@ class Question(models.Model):
     question_text = models.CharField(max_length=200)
     pub_date = models.DateTimeField('date published')
     end_date = models.DateTimeField('ending date')
+    vote_total = models.PositiveIntegerField('total votes', default=0)
+    # Set by close_polls once the poll has ended and its results are frozen in a ResultSnapshot.
+    closed = models.BooleanField('closed', default=False)
+
+    objects = QuestionQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['pub_date', 'id'], name='polls_question_pub_id_idx'),
+            models.Index(fields=['end_date', 'pub_date'], name='polls_question_end_pub_idx'),
+            models.Index(fields=['closed', 'end_date'], name='polls_question_closed_end_idx'),
+            TextPrefixIndex(field='question_text', name='polls_question_text_prefix_idx'),
+        ]
 
     def __str__(self):
         """Return question text."""
@@ -34,7 +124,7 @@ class Question(models.Model):
 
     def can_vote(self):
         """Return ture if question can vote."""
-        return self.end_date >= timezone.now() >= self.pub_date
+        return not self.closed and self.end_date >= timezone.now() >= self.pub_date
 
     was_published_recently.admin_order_field = 'pub_date'
     was_published_recently.boolean = True
@@ -47,6 +137,18 @@ class Question(models.Model):
     can_vote.short_description = 'Can vote?'
 
 
+class ChoiceQuerySet(models.QuerySet):
+    """QuerySet for choices with result aggregates."""
+
+    def with_percentage(self):
+        """Annotate each choice with its share of the question votes in percent."""
+        return self.annotate(percentage=Coalesce(
+            Cast(F('vote_count'), models.FloatField()) * 100 / NullIf(F('question__vote_total'), 0),
+            0.0,
+            output_field=models.FloatField(),
+        ))
+
+
 class Choice(models.Model):
     """Choice model for KU Polls.
 
@@ -55,6 +157,9 @@ class Choice(models.Model):
 
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
     choice_text = models.CharField(max_length=200)
+    vote_count = models.PositiveIntegerField('votes', default=0)
+
+    objects = ChoiceQuerySet.as_manager()
 
     def __str__(self):
         """Return choice text."""
@@ -63,7 +168,252 @@ class Choice(models.Model):
     @property
     def votes(self):
         """Return votes in the question."""
-        return self.question.vote_set.filter(choice=self).count()
+        return self.vote_count
+
+
+class VoteQuerySet(models.QuerySet):
+    """QuerySet for votes that takes deleted votes off the counters.
+
+    There is no post_delete receiver for votes: one would make Django
+    load and delete every vote of a deleted choice or user one by one.
+    Deleted votes come off the counters in grouped updates instead, here
+    and in the pre_delete receivers of Choice and User.
+    """
+
+    def _take_off_counters(self, choices=True):
+        """Take the votes off the question totals, and off the choice counters and hourly rollup if choices.
+
+        The votes are counted by question, choice and hour in one query,
+        and each table gets one UPDATE.  votes_deleted is sent once the
+        deletion commits.
+        """
+        question_deltas = Counter()
+        choice_deltas = Counter()
+        hourly = Counter()
+        for question_id, choice_id, hour, n in (
+            self.annotate(hour=TruncHour('cast_at', tzinfo=datetime.timezone.utc))
+            .values_list('question_id', 'choice_id', 'hour')
+            .annotate(n=Count('id'))
+            .order_by()
+        ):
+            question_deltas[question_id] -= n
+            choice_deltas[choice_id] -= n
+            if hour is not None:
+                hourly[question_id, choice_id, hour] -= n
+        if not question_deltas:
+            return
+        VoteManager._apply_deltas(Question, 'vote_total', question_deltas, using=self.db)
+        if choices:
+            VoteManager._apply_deltas(Choice, 'vote_count', choice_deltas, using=self.db)
+            VoteHourly.objects.db_manager(self.db).add(hourly)
+        question_ids = set(question_deltas)
+        transaction.on_commit(lambda: send_votes_deleted(sender=Vote, question_ids=question_ids), using=self.db)
+
+    def delete(self):
+        """Delete the votes and take them off the counters."""
+        with transaction.atomic(using=self.db):
+            self._take_off_counters()
+            return super().delete()
+
+
+class VoteManager(models.Manager.from_queryset(VoteQuerySet)):
+    """Manager that keeps the vote counters in step with the Vote table."""
+
+    def _insert_if_absent(self, question_id, choice_id, user_id, cast_at):
+        """Insert a vote unless the user already voted on the question.
+
+        Use ``INSERT ... ON CONFLICT DO NOTHING`` where the backend supports
+        it, otherwise let the unique constraint reject the row.
+
+        Return:
+            True if the vote was inserted.
+        Raise:
+            IntegrityError if the row is rejected for another reason, such
+            as a choice deleted at the same time.
+        """
+        connection = connections[self.db]
+        if not connection.features.supports_update_conflicts_with_target:
+            try:
+                with transaction.atomic(using=self.db):
+                    self.create(question_id=question_id, choice_id=choice_id, user_id=user_id, cast_at=cast_at)
+            except IntegrityError:
+                # Only a vote of the user on the question means "already voted"; cast()
+                # would look for it again and again if anything else was wrong.
+                if not self.filter(question_id=question_id, user_id=user_id).exists():
+                    raise
+                return False
+            return True
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {quote(self.model._meta.db_table)} '
+                f'({quote("question_id")}, {quote("choice_id")}, {quote("user_id")}, {quote("cast_at")}) '
+                f'VALUES (%s, %s, %s, %s) '
+                f'ON CONFLICT ({quote("question_id")}, {quote("user_id")}) DO NOTHING',
+                [question_id, choice_id, user_id, connection.ops.adapt_datetimefield_value(cast_at)],
+            )
+            return cursor.rowcount == 1
+
+    def cast(self, user, choice):
+        """Cast or change the vote of user to choice.
+
+        A new vote is a single conflict-ignoring insert.  When the user has
+        already voted, the vote is moved with a compare-and-swap update on
+        the previous choice, so concurrent submits from the same user can
+        neither create a second row nor count a change twice.  The vote row,
+        the counters on Choice and Question and the hourly rollup are
+        written in one transaction, so they always match the Vote table.
+
+        Return:
+            The id of the previously voted choice, or None for a new vote.
+        """
+        question_id = choice.question_id
+        while True:
+            now = timezone.now()
+            hourly = Counter({(question_id, choice.pk, hour_bucket(now)): 1})
+            with transaction.atomic(using=self.db):
+                if self._insert_if_absent(question_id, choice.pk, user.pk, now):
+                    previous_choice_id = None
+                    Choice.objects.filter(pk=choice.pk).update(vote_count=F('vote_count') + 1)
+                    Question.objects.filter(pk=question_id).update(vote_total=F('vote_total') + 1)
+                else:
+                    mine = self.filter(question_id=question_id, user_id=user.pk)
+                    previous_choice_id, previous_cast_at = mine.values_list('choice_id', 'cast_at').first() or (None, None)
+                    if previous_choice_id == choice.pk:
+                        return previous_choice_id
+                    if previous_choice_id is None or not mine.filter(choice_id=previous_choice_id).update(
+                            choice=choice, cast_at=now):
+                        # The vote changed under us, look at it again.
+                        continue
+                    Choice.objects.filter(pk__in=[previous_choice_id, choice.pk]).update(vote_count=Case(
+                        When(pk=choice.pk, then=F('vote_count') + 1),
+                        default=F('vote_count') - 1,
+                    ))
+                    if previous_cast_at is not None:
+                        hourly[question_id, previous_choice_id, hour_bucket(previous_cast_at)] -= 1
+                VoteHourly.objects.add(hourly)
+                transaction.on_commit(lambda: send_vote_cast(
+                    sender=Vote,
+                    question_id=question_id,
+                    choice_id=choice.pk,
+                    previous_choice_id=previous_choice_id,
+                ), using=self.db)
+            return previous_choice_id
+
+    def cast_many(self, entries):
+        """Cast a batch of votes with bulk upserts in one transaction.
+
+        Arguments:
+            entries - (user_id, question_id, choice_id) tuples in the order
+                they were submitted; the last vote of a user on a question
+                wins, votes for a choice that is not in the question are skipped.
+        Return:
+            The number of votes that were added or changed.
+        """
+        latest = {}
+        for user_id, question_id, choice_id in entries:
+            latest[question_id, user_id] = choice_id
+        if not latest:
+            return 0
+        question_ids = {question_id for question_id, _ in latest}
+        now = timezone.now()
+        hour = hour_bucket(now)
+        with transaction.atomic(using=self.db):
+            # A no-op write first, so the batch holds the Question row locks
+            # (or the SQLite write lock) before it reads the current votes.
+            Question.objects.filter(pk__in=question_ids).update(vote_total=F('vote_total'))
+            valid = set(Choice.objects.filter(pk__in=set(latest.values())).values_list('question_id', 'pk'))
+            latest = {key: choice_id for key, choice_id in latest.items() if (key[0], choice_id) in valid}
+            current = {}
+            cast_times = {}
+            for question_id, user_id, choice_id, cast_at in self.filter(
+                question_id__in=question_ids,
+                user_id__in={user_id for _, user_id in latest},
+            ).values_list('question_id', 'user_id', 'choice_id', 'cast_at'):
+                current[question_id, user_id] = choice_id
+                cast_times[question_id, user_id] = cast_at
+            changed = {key: choice_id for key, choice_id in latest.items() if current.get(key) != choice_id}
+            if not changed:
+                return 0
+            features = connections[self.db].features
+            self.bulk_create(
+                [Vote(question_id=question_id, user_id=user_id, choice_id=choice_id, cast_at=now)
+                 for (question_id, user_id), choice_id in changed.items()],
+                batch_size=500,
+                update_conflicts=True,
+                unique_fields=['question', 'user'] if features.supports_update_conflicts_with_target else None,
+                update_fields=['choice', 'cast_at'],
+            )
+            choice_deltas = Counter()
+            question_deltas = Counter()
+            hourly = Counter()
+            for key, choice_id in changed.items():
+                choice_deltas[choice_id] += 1
+                hourly[key[0], choice_id, hour] += 1
+                if key in current:
+                    choice_deltas[current[key]] -= 1
+                    if cast_times[key] is not None:
+                        hourly[key[0], current[key], hour_bucket(cast_times[key])] -= 1
+                else:
+                    question_deltas[key[0]] += 1
+            self._apply_deltas(Choice, 'vote_count', choice_deltas)
+            self._apply_deltas(Question, 'vote_total', question_deltas)
+            VoteHourly.objects.add(hourly)
+
+            def send_signals():
+                for (question_id, user_id), choice_id in changed.items():
+                    send_vote_cast(
+                        sender=Vote,
+                        question_id=question_id,
+                        choice_id=choice_id,
+                        previous_choice_id=current.get((question_id, user_id)),
+                    )
+
+            transaction.on_commit(send_signals, using=self.db)
+        return len(changed)
+
+    @staticmethod
+    def _apply_deltas(model, field, deltas, using=None):
+        """Add each delta to field of the row with its key, in one UPDATE."""
+        deltas = {pk: delta for pk, delta in deltas.items() if delta}
+        if deltas:
+            model.objects.db_manager(using).filter(pk__in=deltas).update(**{field: Case(
+                *[When(pk=pk, then=F(field) + delta) for pk, delta in deltas.items()],
+                default=F(field),
+                output_field=model._meta.get_field(field),
+            )})
+
+    def reconcile_counters(self, fix=True):
+        """Compare the stored counters with the Vote table, except for polls whose votes were archived.
+
+        Arguments:
+            fix - write the counted values back when they differ.
+        Return:
+            Tuple of (choices, questions) whose counters were out of date.
+        """
+        # The votes of archived polls are no longer in the Vote table, their counters are final.
+        archived = VoteArchive.objects.using(self.db).values('question_id')
+        with transaction.atomic(using=self.db):
+            # Lock the counters before counting, in the order cast() updates them: a vote
+            # committed between the count and the lock would be overwritten by a stale count.
+            choices = list(Choice.objects.using(self.db).exclude(question_id__in=archived)
+                           .select_for_update().only('vote_count'))
+            questions = list(Question.objects.using(self.db).exclude(pk__in=archived)
+                             .select_for_update().only('vote_total'))
+            choice_counts = dict(self.values_list('choice').annotate(n=Count('id')).order_by())
+            question_counts = dict(self.values_list('question').annotate(n=Count('id')).order_by())
+            stale_choices = [choice for choice in choices if choice.vote_count != choice_counts.get(choice.pk, 0)]
+            stale_questions = [
+                question for question in questions if question.vote_total != question_counts.get(question.pk, 0)
+            ]
+            if fix:
+                for choice in stale_choices:
+                    choice.vote_count = choice_counts.get(choice.pk, 0)
+                for question in stale_questions:
+                    question.vote_total = question_counts.get(question.pk, 0)
+                Choice.objects.using(self.db).bulk_update(stale_choices, ['vote_count'], batch_size=500)
+                Question.objects.using(self.db).bulk_update(stale_questions, ['vote_total'], batch_size=500)
+        return stale_choices, stale_questions
 
 
 class Vote(models.Model):
@@ -72,7 +422,8 @@ class Vote(models.Model):
     Vote with its question, choice, and user.
     """
 
-    question = models.ForeignKey(Question, on_delete=models.CASCADE, default=0)
+    # Lookups by question are served by the composite indexes below.
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, default=0, db_index=False)
     choice = models.ForeignKey(Choice, on_delete=models.CASCADE, default=0)
     user = models.ForeignKey(
         User,
@@ -80,7 +431,212 @@ class Vote(models.Model):
         blank=True,
         null=True,
         default=0)
+    # When the vote was cast or last changed; unknown for votes from before it was recorded.
+    cast_at = models.DateTimeField('cast at', null=True, default=timezone.now)
+
+    objects = VoteManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['question', 'user'], name='polls_vote_unique_question_user'),
+        ]
+        indexes = [
+            models.Index(fields=['question', 'choice'], name='polls_vote_question_choice_idx'),
+        ]
+
+    def delete(self, using=None, keep_parents=False):
+        """Delete the vote and take it off the counters and the hourly rollup."""
+        using = using or router.db_for_write(Vote, instance=self)
+        with transaction.atomic(using=using):
+            Vote.objects.using(using).filter(pk=self.pk)._take_off_counters()
+            return super().delete(using=using, keep_parents=keep_parents)
 
     def __str__(self):
         """Return which question, choice, user that voted for."""
         return f'Vote for {self.question.question_text}, choice: {self.choice.choice_text} by {self.user.username}'
+
+
+class VoteHourlyManager(models.Manager):
+    """Manager that keeps the hourly vote rollup."""
+
+    def add(self, deltas):
+        """Add each delta to the count of its bucket.
+
+        Arguments:
+            deltas - mapping of (question_id, choice_id, hour) to the
+                change of the count; hour is the start of a UTC hour.
+        """
+        rows = [(question_id, choice_id, hour, delta) for (question_id, choice_id, hour), delta in deltas.items() if delta]
+        if not rows:
+            return
+        connection = connections[self.db]
+        if not connection.features.supports_update_conflicts_with_target:
+            for question_id, choice_id, hour, delta in rows:
+                bucket = self.filter(choice_id=choice_id, hour=hour)
+                if bucket.update(count=F('count') + delta):
+                    continue
+                try:
+                    with transaction.atomic(using=self.db):
+                        self.create(question_id=question_id, choice_id=choice_id, hour=hour, count=delta)
+                except IntegrityError:
+                    bucket.update(count=F('count') + delta)
+            return
+        quote = connection.ops.quote_name
+        table = quote(self.model._meta.db_table)
+        columns = ', '.join(quote(column) for column in ('question_id', 'choice_id', 'hour', 'count'))
+        with connection.cursor() as cursor:
+            for start in range(0, len(rows), 500):
+                batch = rows[start:start + 500]
+                cursor.execute(
+                    f'INSERT INTO {table} ({columns}) VALUES {", ".join(["(%s, %s, %s, %s)"] * len(batch))} '
+                    f'ON CONFLICT ({quote("choice_id")}, {quote("hour")}) '
+                    f'DO UPDATE SET {quote("count")} = {table}.{quote("count")} + EXCLUDED.{quote("count")}',
+                    [value for question_id, choice_id, hour, delta in batch
+                     for value in (question_id, choice_id, connection.ops.adapt_datetimefield_value(hour), delta)],
+                )
+
+    def rebuild(self, batch_size=1000):
+        """Recount every bucket from the cast times of the Vote table.
+
+        Votes without a cast time are left out, and the buckets of polls
+        whose votes were archived are kept as they are.
+
+        Return:
+            The number of buckets written.
+        """
+        with transaction.atomic(using=self.db):
+            # The votes of archived polls are no longer in the Vote table, keep their buckets.
+            self.exclude(question_id__in=VoteArchive.objects.values('question_id')).delete()
+            buckets = (
+                Vote.objects.filter(cast_at__isnull=False)
+                .annotate(hour=TruncHour('cast_at', tzinfo=datetime.timezone.utc))
+                .values_list('question_id', 'choice_id', 'hour')
+                .annotate(n=Count('id'))
+                .order_by()
+            )
+            self.bulk_create(
+                [VoteHourly(question_id=question_id, choice_id=choice_id, hour=hour, count=n)
+                 for question_id, choice_id, hour, n in buckets],
+                batch_size=batch_size,
+            )
+        return len(buckets)
+
+
+class VoteHourly(models.Model):
+    """Number of votes for a choice cast in one UTC hour.
+
+    Kept up to date by VoteManager, so the vote history of a question is
+    read from one row per choice and hour instead of from every vote.  The
+    counts of a choice add up to its votes that have a cast time.
+    """
+
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, db_index=False)
+    choice = models.ForeignKey(Choice, on_delete=models.CASCADE, db_index=False)
+    hour = models.DateTimeField('hour')
+    count = models.IntegerField('votes', default=0)
+
+    objects = VoteHourlyManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['choice', 'hour'], name='polls_votehourly_unique_choice_hour'),
+        ]
+        indexes = [
+            models.Index(fields=['question', 'hour'], name='polls_votehourly_question_idx'),
+        ]
+
+    def __str__(self):
+        """Return the choice, hour and count of the bucket."""
+        return f'{self.count} votes for choice {self.choice_id} at {self.hour:%Y-%m-%d %H:00}'
+
+
+class ResultSnapshot(models.Model):
+    """Final results of a closed poll, written once by close_polls and never changed."""
+
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, primary_key=True, related_name='snapshot')
+    total_votes = models.PositiveIntegerField('total votes')
+    # [{"id": choice id, "text": choice text, "votes": votes}, ...] in choice id order.
+    choices = models.JSONField()
+    closed_at = models.DateTimeField('closed at', default=timezone.now)
+
+    def __str__(self):
+        """Return which question the snapshot is of."""
+        return f'Results of {self.question_id}'
+
+    def save(self, *args, **kwargs):
+        """Save a new snapshot.
+
+        Raise:
+            ValueError if the snapshot is already saved.
+        """
+        if not self._state.adding:
+            raise ValueError('Result snapshots cannot be changed.')
+        super().save(*args, **kwargs)
+
+    def results(self, question):
+        """Return the snapshot in the form of polls.cache.load_results(), for question."""
+        choices = []
+        for data in self.choices:
+            choice = Choice(pk=data['id'], question=question, choice_text=data['text'], vote_count=data['votes'])
+            choice.percentage = data['votes'] * 100 / self.total_votes if self.total_votes else 0.0
+            choices.append(choice)
+        return {'question': question, 'choices': choices, 'total_votes': self.total_votes}
+
+
+class VoteArchive(models.Model):
+    """The votes of a closed poll packed into one row, see polls.lifecycle."""
+
+    # One little-endian (user id, choice id, cast time in microseconds) record per vote, -1 for none.
+    RECORD = struct.Struct('<qqq')
+
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, primary_key=True, related_name='vote_archive')
+    vote_count = models.PositiveIntegerField('votes')
+    # zlib-compressed RECORDs.
+    data = models.BinaryField()
+
+    def __str__(self):
+        """Return which question the votes are of."""
+        return f'Votes of {self.question_id}'
+
+    @classmethod
+    def pack(cls, votes):
+        """Return (user id, choice id, cast at) tuples packed for data."""
+        epoch = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+        return zlib.compress(b''.join(
+            cls.RECORD.pack(
+                -1 if user_id is None else user_id,
+                choice_id,
+                -1 if cast_at is None else (cast_at - epoch) // datetime.timedelta(microseconds=1),
+            ) for user_id, choice_id, cast_at in votes
+        ))
+
+    def votes(self):
+        """Return the archived votes as (user id, choice id, cast at) tuples."""
+        epoch = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+        return [
+            (None if user_id == -1 else user_id, choice_id,
+             None if cast_at == -1 else epoch + datetime.timedelta(microseconds=cast_at))
+            for user_id, choice_id, cast_at in self.RECORD.iter_unpack(zlib.decompress(bytes(self.data)))
+        ]
+
+
+def deleted_by_question(origin):
+    """Return True if origin, the object or queryset a deletion started from, is a question."""
+    return issubclass(origin.model if isinstance(origin, models.QuerySet) else type(origin), Question)
+
+
+@receiver(pre_delete, sender=Choice, dispatch_uid='polls.models.choice_deleted_callback')
+def choice_deleted_callback(sender, instance, using, origin=None, **kwargs):
+    """Take the votes of a deleted choice off its question total.
+
+    The choice counter and its hourly buckets go with the choice, and
+    nothing outlives a deleted question.
+    """
+    if not deleted_by_question(origin):
+        Vote.objects.using(using).filter(choice=instance)._take_off_counters(choices=False)
+
+
+@receiver(pre_delete, sender=User, dispatch_uid='polls.models.user_deleted_callback')
+def user_deleted_callback(sender, instance, using, **kwargs):
+    """Take the votes of a deleted user off the counters and the hourly rollup."""
+    Vote.objects.using(using).filter(user=instance)._take_off_counters()
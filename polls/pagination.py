@@ -0,0 +1,161 @@
+"""Pagination for KU Polls.
+
+Index pages are addressed by the ``(pub_date, id)`` of the last question
+of the previous page instead of an offset, so every page is an index range
+scan on ``polls_question_pub_id_idx`` however deep the reader goes.
+
+The admin changelists use EstimatedCountPaginator, which takes the row
+count of an unfiltered table from the database statistics.
+"""
+import base64
+import binascii
+import datetime
+from urllib.parse import urlencode
+
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.utils.functional import cached_property
+
+
+def encode_cursor(question):
+    """Return the cursor that points just after question, a model instance or a dict from values()."""
+    if isinstance(question, dict):
+        raw = f'{question["pub_date"].isoformat()}|{question["id"]}'
+    else:
+        raw = f'{question.pub_date.isoformat()}|{question.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return the (pub_date, id) pair stored in cursor.
+
+    Raise:
+        ValueError if the cursor is malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        pub_date, pk = raw.split('|')
+        return datetime.datetime.fromisoformat(pub_date), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as error:
+        raise ValueError(f'Invalid cursor {cursor!r}') from error
+
+
+class KeysetPage:
+    """One page of questions, newest first, loaded on first use.
+
+    Arguments:
+        queryset - questions to paginate.
+        cursor - cursor of the previous page, or None for the first page.
+        size - number of questions on a page.
+    """
+
+    def __init__(self, queryset, cursor=None, size=20):
+        """Keep the arguments, the query runs when the page is used."""
+        self.queryset = queryset
+        self.position = decode_cursor(cursor) if cursor else None
+        self.size = size
+
+    @property
+    def is_first(self):
+        """Return true if this is the first page."""
+        return self.position is None
+
+    def _page_queryset(self):
+        queryset = self.queryset.order_by('-pub_date', '-pk')
+        if self.position is not None:
+            queryset = queryset.before(*self.position)
+        return queryset[:self.size + 1]
+
+    @cached_property
+    def _rows(self):
+        return list(self._page_queryset())
+
+    async def aload(self):
+        """Load the page with the async ORM, so later use runs no query."""
+        if '_rows' not in self.__dict__:
+            self.__dict__['_rows'] = [question async for question in self._page_queryset()]
+        return self
+
+    @property
+    def object_list(self):
+        """Return the questions on this page."""
+        return self._rows[:self.size]
+
+    @property
+    def has_next(self):
+        """Return true if there are older questions after this page."""
+        return len(self._rows) > self.size
+
+    @property
+    def next_cursor(self):
+        """Return the cursor of the next page, or None on the last page."""
+        return encode_cursor(self.object_list[-1]) if self.has_next else None
+
+    @property
+    def next_query(self):
+        """Return the query string of the next page, or None on the last page."""
+        return urlencode({'after': self.next_cursor}) if self.has_next else None
+
+    def __iter__(self):
+        """Iterate over the questions on this page."""
+        return iter(self.object_list)
+
+    def __len__(self):
+        """Return the number of questions on this page."""
+        return len(self.object_list)
+
+    def __bool__(self):
+        """Return true if the page has questions."""
+        return bool(self.object_list)
+
+
+def estimate_row_count(model, using='default'):
+    """Return the row count of the model table from the database statistics.
+
+    Return:
+        The estimate, or None if the database has no statistics for it.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    if connection.vendor == 'postgresql':
+        sql, params = 'SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)', [table]
+    elif connection.vendor == 'sqlite':
+        # Filled in by ANALYZE; the first number is the row count.
+        sql, params = 'SELECT stat FROM sqlite_stat1 WHERE tbl = %s AND idx IS NULL', [table]
+    elif connection.vendor == 'mysql':
+        sql, params = ('SELECT table_rows FROM information_schema.tables '
+                       'WHERE table_schema = DATABASE() AND table_name = %s'), [table]
+    else:
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    if row is None or row[0] is None:
+        return None
+    estimate = int(str(row[0]).split()[0])
+    # PostgreSQL reports -1 for a table that was never analyzed.
+    return estimate if estimate >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that does not count a large unfiltered table.
+
+    When the queryset has no filter and the statistics say the table has
+    at least ``estimate_threshold`` rows, the estimate is used as the
+    count instead of a ``COUNT(*)`` over the whole table.
+    """
+
+    estimate_threshold = 10000
+
+    @cached_property
+    def count(self):
+        """Return the estimated or the exact number of objects."""
+        queryset = self.object_list
+        if hasattr(queryset, 'query') and not queryset.query.where:
+            estimate = estimate_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= self.estimate_threshold:
+                return estimate
+        return super().count
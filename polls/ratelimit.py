@@ -0,0 +1,191 @@
+"""Rate limiting for KU Polls.
+
+Requests are limited with token buckets: every key, such as a user or a
+client address, holds up to ``burst`` tokens, refilled at ``rate`` per
+second, and each limited request takes one.  The buckets of a process are
+kept in memory, at most ``POLLS_RATELIMIT_MAX_KEYS`` of them with the
+least recently used dropped first.  With ``POLLS_RATELIMIT_SHARED`` the
+buckets are also kept in the cache, so the workers share one limit; the
+in-memory bucket is still asked first, so a flood from one client is
+turned away without a cache round trip.
+
+A throttled request is answered with a 429 before the view runs, so it
+costs no query beyond reading the session.
+"""
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+from . import metrics
+
+logger = logging.getLogger('polls')
+
+
+class TokenBucketLimiter:
+    """Token buckets of one process, least recently used dropped past max_keys."""
+
+    def __init__(self, rate, burst, max_keys=10000):
+        """Start without buckets.
+
+        Arguments:
+            rate - tokens added to a bucket per second.
+            burst - tokens a full bucket holds.
+            max_keys - most buckets kept.
+        """
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, key, now=None):
+        """Take a token from the bucket of key.
+
+        Return:
+            0 if a token was taken, otherwise the seconds until there is one.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            bucket = self._buckets.pop(key, None)
+            tokens = self.burst if bucket is None else min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            wait = 0 if tokens >= 1 else (1 - tokens) / self.rate
+            if not wait:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+                metrics.increment('ratelimit_evictions')
+        return wait
+
+    def __len__(self):
+        """Return the number of buckets kept."""
+        return len(self._buckets)
+
+
+class SharedTokenBucketLimiter(TokenBucketLimiter):
+    """Token buckets kept in a cache, behind the buckets of the process.
+
+    A bucket is read and written back without a lock, so workers that take
+    a token from the same bucket at the same moment may both get one.
+    """
+
+    def __init__(self, rate, burst, max_keys=10000, cache='default'):
+        """Start without buckets, the shared ones are kept in the cache called cache."""
+        super().__init__(rate, burst, max_keys)
+        self.cache = caches[cache]
+        # A bucket left alone this long is full again and need not be kept.
+        self.timeout = math.ceil(burst / rate) + 1
+
+    def acquire(self, key, now=None):
+        """Take a token from the bucket of key in the process, then in the cache."""
+        wait = super().acquire(key, now)
+        if wait:
+            return wait
+        now = time.time() if now is None else now
+        cache_key = f'polls:ratelimit:{key}'
+        bucket = self.cache.get(cache_key)
+        tokens = self.burst if bucket is None else min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        if tokens < 1:
+            return (1 - tokens) / self.rate
+        self.cache.set(cache_key, (tokens - 1, now), self.timeout)
+        return 0
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(name):
+    """Return the limiter called name, configured by the POLLS_RATELIMIT settings.
+
+    Arguments:
+        name - the settings of the limiter are POLLS_<NAME>_RATE and
+            POLLS_<NAME>_BURST; a rate of 0 turns it off.
+    Return:
+        The limiter, or None when it is off.
+    """
+    prefix = f'POLLS_{name.upper()}'
+    rate = getattr(settings, f'{prefix}_RATE', 0)
+    if not rate:
+        return None
+    config = (
+        name, rate, getattr(settings, f'{prefix}_BURST', 1),
+        getattr(settings, 'POLLS_RATELIMIT_MAX_KEYS', 10000),
+        getattr(settings, 'POLLS_RATELIMIT_SHARED', False) and getattr(settings, 'POLLS_RATELIMIT_CACHE', 'default'),
+    )
+    with _limiters_lock:
+        limiter = _limiters.get(config)
+        if limiter is None:
+            _, rate, burst, max_keys, cache = config
+            if cache:
+                limiter = SharedTokenBucketLimiter(rate, burst, max_keys, cache)
+            else:
+                limiter = TokenBucketLimiter(rate, burst, max_keys)
+            _limiters[config] = limiter
+    return limiter
+
+
+def reset():
+    """Drop every limiter and its buckets."""
+    with _limiters_lock:
+        _limiters.clear()
+
+
+def throttle(request, name, keys):
+    """Return a 429 response if a key of request has no token left, otherwise None.
+
+    Arguments:
+        name - name of the limiter, see get_limiter().
+        keys - function of the request that yields its keys, cheapest first;
+            no more keys are asked for once one is throttled.
+    """
+    limiter = get_limiter(name)
+    if limiter is None:
+        return None
+    for key in keys(request):
+        wait = limiter.acquire(key)
+        if wait:
+            metrics.increment(f'{name}_throttled')
+            metrics.increment(f'{name}_throttled_{key.partition(":")[0]}')
+            logger.info('Throttled %s %s for %s', request.method, request.path, key)
+            response = HttpResponse('Too many requests, try again later.\n', status=429, content_type='text/plain')
+            response['Retry-After'] = str(math.ceil(wait))
+            return response
+    return None
+
+
+def rate_limit(name, keys, methods=('POST',)):
+    """Decorate a sync or async view so that requests over the limit called name get a 429.
+
+    Arguments:
+        keys - see throttle().
+        methods - the request methods that are limited.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def wrapper(request, *args, **kwargs):
+                if request.method in methods:
+                    # The keys may read the session, which is sync.
+                    response = await sync_to_async(throttle)(request, name, keys)
+                    if response is not None:
+                        return response
+                return await view(request, *args, **kwargs)
+        else:
+            @wraps(view)
+            def wrapper(request, *args, **kwargs):
+                if request.method in methods:
+                    response = throttle(request, name, keys)
+                    if response is not None:
+                        return response
+                return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
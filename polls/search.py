@@ -0,0 +1,199 @@
+"""Full-text search over questions for KU Polls.
+
+Searches are answered from the full-text index of migration 0011: an FTS5
+table ranked with bm25 on SQLite, and a GIN index on the ``english``
+tsvector of question_text ranked with ts_rank on PostgreSQL.  Other
+databases fall back to ``icontains`` on every word, newest first.
+
+Every word of the search has to match, the last one as a prefix once it
+has MIN_PREFIX letters, so results narrow as the reader types.  Only the ids of one page are read
+from the index, in rank order, and the questions are loaded by primary
+key afterwards.
+"""
+import re
+from urllib.parse import urlencode
+
+from django.db import connections
+from django.db.models import Case, IntegerField, Value, When
+from django.utils.functional import cached_property
+
+from .models import Question
+
+FTS_TABLE = 'polls_question_fts'
+
+# The triggers that keep the SQLite index in sync with polls_question, see
+# migration 0011.  SQLite drops them whenever a migration rebuilds the table.
+SQLITE_TRIGGERS = {
+    'polls_question_fts_insert': (
+        f'AFTER INSERT ON polls_question BEGIN '
+        f'INSERT INTO {FTS_TABLE} (rowid, question_text) VALUES (new.id, new.question_text); END'
+    ),
+    'polls_question_fts_delete': (
+        f'AFTER DELETE ON polls_question BEGIN '
+        f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, question_text) VALUES ('delete', old.id, old.question_text); END"
+    ),
+    'polls_question_fts_update': (
+        f'AFTER UPDATE OF question_text ON polls_question BEGIN '
+        f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, question_text) VALUES ('delete', old.id, old.question_text); "
+        f'INSERT INTO {FTS_TABLE} (rowid, question_text) VALUES (new.id, new.question_text); END'
+    ),
+}
+
+# The text search configuration of the PostgreSQL index, see migration 0011.
+SEARCH_CONFIG = 'english'
+
+# Words past this many are ignored, they hardly narrow the results.
+MAX_WORDS = 8
+
+# A shorter last word is matched whole: a one or two letter prefix matches
+# so many questions that ranking them all is slow on a large table.
+MIN_PREFIX = 3
+
+WORD = re.compile(r'\w+')
+
+
+def missing_triggers(using='default'):
+    """Return the names of the triggers of the SQLite index that are missing, none without the index."""
+    connection = connections[using]
+    if connection.vendor != 'sqlite' or FTS_TABLE not in connection.introspection.table_names():
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'polls_question'")
+        existing = {row[0] for row in cursor.fetchall()}
+    return [name for name in SQLITE_TRIGGERS if name not in existing]
+
+
+def create_triggers(schema_editor):
+    """Create the missing triggers of the SQLite index and rebuild it from polls_question.
+
+    Call it from a migration that rebuilds the polls_question table, after
+    the rebuild.
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for name, body in SQLITE_TRIGGERS.items():
+        schema_editor.execute(f'CREATE TRIGGER IF NOT EXISTS {name} {body}')
+    schema_editor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def search_words(text):
+    """Return the words of a search, without any query syntax."""
+    return WORD.findall(text or '')[:MAX_WORDS]
+
+
+def is_prefix(word):
+    """Return true if word is matched as the start of longer words."""
+    return len(word) >= MIN_PREFIX
+
+
+def fts_query(words):
+    """Return the FTS5 MATCH expression for words: all of them, the last as a prefix."""
+    last = f'"{words[-1]}"*' if is_prefix(words[-1]) else f'"{words[-1]}"'
+    return ' '.join([f'"{word}"' for word in words[:-1]] + [last])
+
+
+def ranked_ids(text, limit, offset=0, using='default'):
+    """Return the ids of the questions that match text, best match first.
+
+    Arguments:
+        text - the search as typed.
+        limit - the most ids to return.
+        offset - the number of better matches to skip.
+    """
+    words = search_words(text)
+    if not words:
+        return []
+    connection = connections[using]
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s ORDER BY rank, rowid DESC '
+                f'LIMIT %s OFFSET %s',
+                [fts_query(words), limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()]
+    questions = Question.objects.using(using)
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+
+        vector = SearchVector('question_text', config=SEARCH_CONFIG)
+        query = ' & '.join(words) + (':*' if is_prefix(words[-1]) else '')
+        query = SearchQuery(query, config=SEARCH_CONFIG, search_type='raw')
+        questions = (
+            questions.annotate(search_vector=vector, rank=SearchRank(vector, query))
+            .filter(search_vector=query).order_by('-rank', '-pk')
+        )
+    else:
+        for word in words:
+            questions = questions.filter(question_text__icontains=word)
+        questions = questions.order_by('-pub_date', '-pk')
+    return list(questions.values_list('pk', flat=True)[offset:offset + limit])
+
+
+def rank_order(ids):
+    """Return an expression that numbers the questions by their position in ids."""
+    if not ids:
+        return Value(0, output_field=IntegerField())
+    return Case(*[When(pk=pk, then=Value(position)) for position, pk in enumerate(ids)],
+                output_field=IntegerField())
+
+
+def search(queryset, text, limit):
+    """Return the questions of queryset among the limit best matches of text.
+
+    The questions are annotated with their ``search_rank``, 0 for the
+    best match, and ordered by it.
+    """
+    ids = ranked_ids(text, limit, using=queryset.db)
+    return queryset.filter(pk__in=ids).annotate(search_rank=rank_order(ids)).order_by('search_rank')
+
+
+class SearchPage:
+    """One page of search results, best match first, loaded on first use.
+
+    Arguments:
+        queryset - questions to show, e.g. with their status annotated.
+        text - the search as typed.
+        number - the page number, from 1.
+        size - number of questions on a page.
+    """
+
+    def __init__(self, queryset, text, number=1, size=20):
+        """Keep the arguments, the queries run when the page is used."""
+        self.queryset = queryset
+        self.text = text
+        self.number = number
+        self.size = size
+
+    @cached_property
+    def _rows(self):
+        ids = ranked_ids(self.text, self.size + 1, (self.number - 1) * self.size, using=self.queryset.db)
+        questions = self.queryset.in_bulk(ids[:self.size])
+        return [questions[pk] for pk in ids[:self.size] if pk in questions], len(ids) > self.size
+
+    @property
+    def object_list(self):
+        """Return the questions on this page."""
+        return self._rows[0]
+
+    @property
+    def has_next(self):
+        """Return true if there are more matches after this page."""
+        return self._rows[1]
+
+    @property
+    def next_query(self):
+        """Return the query string of the next page, or None on the last page."""
+        return urlencode({'q': self.text, 'page': self.number + 1}) if self.has_next else None
+
+    def __iter__(self):
+        """Iterate over the questions on this page."""
+        return iter(self.object_list)
+
+    def __len__(self):
+        """Return the number of questions on this page."""
+        return len(self.object_list)
+
+    def __bool__(self):
+        """Return true if the page has questions."""
+        return bool(self.object_list)
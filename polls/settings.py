@@ -1,6 +1,18 @@
-"""Logging configuration file."""
+"""Logging configuration file.
+
+POLLS_LOG_MODE is 'sync' to write records on the calling thread, or 'queue'
+to hand them to a listener thread through a queue of POLLS_LOG_QUEUE_SIZE
+records (see polls/log.py).  POLLS_LOG_JSON_FILE adds a rotating file of
+JSON lines, written in batches of 100 records.
+"""
 import os
 
+LOG_MODE = os.getenv('POLLS_LOG_MODE', 'sync')
+
+LOG_QUEUE_SIZE = int(os.getenv('POLLS_LOG_QUEUE_SIZE', '10000'))
+
+LOG_JSON_FILE = os.getenv('POLLS_LOG_JSON_FILE')
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -9,11 +21,19 @@ LOGGING = {
             'class': 'logging.StreamHandler',
             'formatter': 'simple',
         },
+        'structured': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'structured',
+        },
     },
     'formatters': {
         'simple': {
             'format': '%(asctime)s - %(message)s'
-        }
+        },
+        'structured': {
+            '()': 'polls.log.KeyValueFormatter',
+            'format': '%(asctime)s - %(message)s'
+        },
     },
     'root': {
         'handlers': ['console'],
@@ -25,5 +45,33 @@ LOGGING = {
             'level': os.getenv('DJANGO_LOG_LEVEL', 'INFO'),
             'propagate': False,
         },
+        # One record per request from polls.middleware.TimingMiddleware at
+        # INFO, slow requests with their queries at WARNING.
+        'polls.requests': {
+            'handlers': ['structured'],
+            'level': os.getenv('POLLS_REQUEST_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
     },
 }
+
+
+if LOG_JSON_FILE:
+    LOGGING['formatters']['json'] = {
+        '()': 'polls.log.JsonFormatter',
+    }
+    LOGGING['handlers']['json_file'] = {
+        'class': 'logging.handlers.RotatingFileHandler',
+        'filename': LOG_JSON_FILE,
+        'maxBytes': 10 * 1024 * 1024,
+        'backupCount': 5,
+        'formatter': 'json',
+    }
+    LOGGING['handlers']['json_batch'] = {
+        'class': 'logging.handlers.MemoryHandler',
+        'capacity': 100,
+        'flushLevel': 'ERROR',
+        'target': 'json_file',
+    }
+    for logger in LOGGING['loggers'].values():
+        logger['handlers'].append('json_batch')
@@ -0,0 +1,39 @@
+"""Custom signals for KU Polls."""
+import logging
+
+from django.dispatch import Signal
+
+logger = logging.getLogger('polls')
+
+# Sent after the transaction that cast or changed a vote has committed.
+# Arguments: question_id, choice_id, previous_choice_id (None for a new vote).
+vote_cast = Signal()
+
+# Sent after the transaction that deleted votes has committed, once per
+# deletion rather than once per vote.
+# Arguments: question_ids, the set of questions that lost votes.
+votes_deleted = Signal()
+
+
+def _send_robust(signal, name, about, sender, **kwargs):
+    """Send signal to every receiver, logging the ones that raise with name and about."""
+    for receiver, result in signal.send_robust(sender=sender, **kwargs):
+        if isinstance(result, Exception):
+            logger.error('%s receiver %r failed for %s', name, receiver, about,
+                         exc_info=(type(result), result, result.__traceback__))
+
+
+def send_vote_cast(sender, **kwargs):
+    """Send vote_cast to every receiver, logging the ones that raise.
+
+    The vote is already committed when the signal is sent, so a failing
+    receiver, such as an unreachable cache, must not turn it into an error
+    for the voter or keep the other receivers from running.
+    """
+    _send_robust(vote_cast, 'vote_cast', f'question id: {kwargs.get("question_id")}', sender, **kwargs)
+
+
+def send_votes_deleted(sender, question_ids):
+    """Send votes_deleted to every receiver, logging the ones that raise, as send_vote_cast() does."""
+    _send_robust(votes_deleted, 'votes_deleted', f'question ids: {sorted(question_ids)}', sender,
+                 question_ids=question_ids)
@@ -0,0 +1,21 @@
+// Keep the results page up to date from the live results stream.
+(function () {
+    var script = document.currentScript;
+    if (!window.EventSource || !script) {
+        return;
+    }
+    var source = new EventSource(script.dataset.stream);
+    source.addEventListener('results', function (event) {
+        var results = JSON.parse(event.data);
+        results.choices.forEach(function (choice) {
+            var votes = document.querySelector('[data-choice="' + choice.id + '"] .votes');
+            if (votes) {
+                votes.textContent = choice.votes + ' (' + choice.percentage.toFixed(1) + '%)';
+            }
+        });
+        document.getElementById('total-votes').textContent = 'Total votes: ' + results.total_votes;
+        if (!results.open) {
+            source.close();
+        }
+    });
+})();
@@ -0,0 +1,70 @@
+"""Static files storage for KU Polls.
+
+``collectstatic`` with CompressedManifestStaticFilesStorage writes every
+file under a content-hashed name, as ManifestStaticFilesStorage does, and
+next to each text asset a gzip copy and, when the ``brotli`` package is
+installed, a brotli copy.  StaticFilesMiddleware serves those copies to
+the clients that accept them without compressing anything per request.
+"""
+import gzip
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.map', '.svg', '.txt', '.html', '.json', '.xml', '.ico')
+
+# Below this size the compressed copy saves less than a network packet.
+MIN_COMPRESS_SIZE = 256
+
+# File suffix of each precompressed copy, in order of preference.
+ENCODINGS = {'br': '.br', 'gzip': '.gz'}
+
+
+def compress_file(path):
+    """Write the gzip and brotli copies of the file at path.
+
+    Copies that are not smaller than the file are not kept.
+
+    Return:
+        The suffixes of the copies that were written.
+    """
+    with open(path, 'rb') as source:
+        content = source.read()
+    if len(content) < MIN_COMPRESS_SIZE:
+        return []
+    copies = {'.gz': gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        copies['.br'] = brotli.compress(content)
+    written = []
+    for suffix, compressed in copies.items():
+        if len(compressed) < len(content):
+            with open(path + suffix, 'wb') as target:
+                target.write(compressed)
+            written.append(suffix)
+    return written
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Manifest storage that also writes precompressed copies of text assets."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        """Hash the files, then compress the hashed copies of text assets."""
+        hashed_names = []
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if hashed_name and not isinstance(processed, Exception):
+                hashed_names.append(hashed_name)
+            yield name, hashed_name, processed
+        if dry_run:
+            return
+        for hashed_name in hashed_names:
+            if hashed_name.endswith(COMPRESSIBLE_EXTENSIONS):
+                compress_file(self.path(hashed_name))
+        for name in paths:
+            # Unhashed names are still served, e.g. to code that builds URLs by hand.
+            if name.endswith(COMPRESSIBLE_EXTENSIONS) and os.path.exists(self.path(name)):
+                compress_file(self.path(name))
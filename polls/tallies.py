@@ -0,0 +1,305 @@
+"""Vote tallies shared by the workers of KU Polls.
+
+Every worker has its own results cache, so a vote cast in one worker only
+drops the cached results of that worker.  A tally store keeps the vote
+count of every choice where all workers see it, and the results pages
+take their counts from it, one dictionary lookup per choice.
+
+``POLLS_TALLY_STORE`` selects the store:
+
+* ``'none'`` - no store, the counts come with the cached results.
+* ``'local'`` - LocalTallyStore, in the memory of the process.
+* ``'sqlite'`` - SQLiteTallyStore, in the SQLite file at
+  ``POLLS_TALLY_PATH`` that every process on the host opens.
+
+A committed vote adds one to its choice and, when it moved the vote,
+takes one from the previous choice, in one atomic step.  The counts of a
+question are loaded from the Vote table the first time it is read, and
+reconciled with the Vote table again when they are older than
+``POLLS_TALLY_RECONCILE_INTERVAL`` seconds, so a vote missed while the
+counts were loaded is only missing until then.  Every change of the
+counts of a question moves its version, a time in nanoseconds like the
+versions in polls.cache.
+"""
+import abc
+import copy
+import os
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Count
+from django.dispatch import receiver
+
+from . import metrics
+from .models import Choice, Vote
+from .signals import vote_cast, votes_deleted
+
+
+def next_version(version):
+    """Return a version after version, the current time when that is later."""
+    return max(time.time_ns(), version + 1)
+
+
+class TallyStore(abc.ABC):
+    """Vote counts per choice of every question, with a version per question."""
+
+    @abc.abstractmethod
+    def get(self, question_id):
+        """Return (version, counts by choice id, time reconciled) of the question, or None if it has none."""
+
+    @abc.abstractmethod
+    def record(self, question_id, choice_id, previous_choice_id=None):
+        """Count a vote for choice_id, moved from previous_choice_id when that is not None.
+
+        Votes for a question the store has no counts of are not counted;
+        its counts are loaded from the Vote table when it is first read.
+        """
+
+    @abc.abstractmethod
+    def reconcile(self, question_id, counts):
+        """Replace the counts of the question and return its (version, counts)."""
+
+    @abc.abstractmethod
+    def clear(self):
+        """Drop every count."""
+
+
+class LocalTallyStore(TallyStore):
+    """Tally store in the memory of one process."""
+
+    def __init__(self):
+        """Start without counts."""
+        self._questions = {}
+        self._lock = threading.Lock()
+
+    def get(self, question_id):
+        """Return (version, counts by choice id, time reconciled) of the question, or None if it has none."""
+        with self._lock:
+            entry = self._questions.get(question_id)
+            if entry is None:
+                return None
+            version, counts, reconciled_at = entry
+            return version, dict(counts), reconciled_at
+
+    def record(self, question_id, choice_id, previous_choice_id=None):
+        """Count a vote for choice_id, moved from previous_choice_id when that is not None."""
+        with self._lock:
+            entry = self._questions.get(question_id)
+            if entry is None:
+                return
+            counts = entry[1]
+            counts[choice_id] = counts.get(choice_id, 0) + 1
+            if previous_choice_id is not None:
+                counts[previous_choice_id] = counts.get(previous_choice_id, 0) - 1
+            entry[0] = next_version(entry[0])
+
+    def reconcile(self, question_id, counts):
+        """Replace the counts of the question and return its (version, counts)."""
+        with self._lock:
+            entry = self._questions.get(question_id)
+            if entry is None:
+                entry = self._questions[question_id] = [time.time_ns(), dict(counts), time.time()]
+            else:
+                if entry[1] != counts:
+                    entry[0] = next_version(entry[0])
+                    entry[1] = dict(counts)
+                entry[2] = time.time()
+            return entry[0], dict(entry[1])
+
+    def clear(self):
+        """Drop every count."""
+        with self._lock:
+            self._questions.clear()
+
+
+class SQLiteTallyStore(TallyStore):
+    """Tally store in an SQLite file shared by the processes of one host.
+
+    Each thread opens its own connection.  The file is in WAL mode, so
+    reads never wait for a vote being counted, and every change is one
+    write transaction, so concurrent workers never lose a count.
+    """
+
+    SCHEMA = [
+        'CREATE TABLE IF NOT EXISTS tally_question ('
+        ' question_id INTEGER PRIMARY KEY, version INTEGER NOT NULL, reconciled_at REAL NOT NULL)',
+        'CREATE TABLE IF NOT EXISTS tally ('
+        ' question_id INTEGER NOT NULL, choice_id INTEGER NOT NULL, count INTEGER NOT NULL,'
+        ' PRIMARY KEY (question_id, choice_id)) WITHOUT ROWID',
+    ]
+
+    def __init__(self, path):
+        """Create the file and its tables at path if they do not exist."""
+        self.path = str(path)
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        connection = self._connection()
+        for statement in self.SCHEMA:
+            connection.execute(statement)
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode = WAL')
+            connection.execute('PRAGMA synchronous = NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def get(self, question_id):
+        """Return (version, counts by choice id, time reconciled) of the question, or None if it has none."""
+        rows = self._connection().execute(
+            'SELECT q.version, q.reconciled_at, t.choice_id, t.count FROM tally_question q '
+            'LEFT JOIN tally t ON t.question_id = q.question_id WHERE q.question_id = ?',
+            [question_id],
+        ).fetchall()
+        if not rows:
+            return None
+        return rows[0][0], {choice_id: count for _, _, choice_id, count in rows if choice_id is not None}, rows[0][1]
+
+    def record(self, question_id, choice_id, previous_choice_id=None):
+        """Count a vote for choice_id, moved from previous_choice_id when that is not None."""
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(
+                'SELECT version FROM tally_question WHERE question_id = ?', [question_id]).fetchone()
+            if row is not None:
+                deltas = [(choice_id, 1)] if previous_choice_id is None else [(choice_id, 1), (previous_choice_id, -1)]
+                connection.executemany(
+                    'INSERT INTO tally (question_id, choice_id, count) VALUES (?, ?, ?) '
+                    'ON CONFLICT (question_id, choice_id) DO UPDATE SET count = count + excluded.count',
+                    [(question_id, pk, delta) for pk, delta in deltas],
+                )
+                connection.execute('UPDATE tally_question SET version = ? WHERE question_id = ?',
+                                   [next_version(row[0]), question_id])
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+
+    def reconcile(self, question_id, counts):
+        """Replace the counts of the question and return its (version, counts)."""
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(
+                'SELECT version FROM tally_question WHERE question_id = ?', [question_id]).fetchone()
+            current = dict(connection.execute(
+                'SELECT choice_id, count FROM tally WHERE question_id = ?', [question_id]).fetchall())
+            if row is None:
+                version = time.time_ns()
+            else:
+                version = row[0] if current == counts else next_version(row[0])
+            if current != counts:
+                connection.execute('DELETE FROM tally WHERE question_id = ?', [question_id])
+                connection.executemany('INSERT INTO tally (question_id, choice_id, count) VALUES (?, ?, ?)',
+                                       [(question_id, pk, count) for pk, count in counts.items()])
+            connection.execute(
+                'INSERT INTO tally_question (question_id, version, reconciled_at) VALUES (?, ?, ?) '
+                'ON CONFLICT (question_id) DO UPDATE SET version = excluded.version, '
+                'reconciled_at = excluded.reconciled_at',
+                [question_id, version, time.time()],
+            )
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return version, dict(counts)
+
+    def clear(self):
+        """Drop every count."""
+        connection = self._connection()
+        connection.execute('DELETE FROM tally')
+        connection.execute('DELETE FROM tally_question')
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store():
+    """Return the tally store selected by POLLS_TALLY_STORE, or None when there is none."""
+    kind = getattr(settings, 'POLLS_TALLY_STORE', 'none')
+    if kind == 'none':
+        return None
+    config = (kind, str(getattr(settings, 'POLLS_TALLY_PATH', '')))
+    with _stores_lock:
+        store = _stores.get(config)
+        if store is None:
+            if kind == 'local':
+                store = LocalTallyStore()
+            elif kind == 'sqlite':
+                store = SQLiteTallyStore(config[1])
+            else:
+                raise ValueError(f'Unknown tally store {kind!r}')
+            _stores[config] = store
+    return store
+
+
+def reset():
+    """Forget the stores, so the next get_store() opens them again."""
+    with _stores_lock:
+        _stores.clear()
+
+
+def count_votes(question_id):
+    """Return the votes of every choice of the question counted from the Vote table."""
+    counts = dict.fromkeys(Choice.objects.filter(question_id=question_id).values_list('pk', flat=True), 0)
+    counts.update(
+        Vote.objects.filter(question_id=question_id).values_list('choice').annotate(n=Count('id')).order_by()
+    )
+    return counts
+
+
+def get_tally(store, question_id):
+    """Return the (version, counts) of the question, reconciling them when they are missing or old."""
+    tally = store.get(question_id)
+    interval = getattr(settings, 'POLLS_TALLY_RECONCILE_INTERVAL', 60)
+    if tally is not None and time.time() - tally[2] < interval:
+        metrics.increment('tally_hits')
+        return tally[:2]
+    metrics.increment('tally_reconciles')
+    return store.reconcile(question_id, count_votes(question_id))
+
+
+def tallied_results(results):
+    """Return results from polls.cache.get_results() with the counts of the tally store.
+
+    The returned results also carry the ``tally_version`` of the counts.
+    Results are returned as they are when there is no store or the
+    question is closed, whose counts no longer change.
+    """
+    store = get_store()
+    question = results['question']
+    if store is None or question.closed:
+        return results
+    version, counts = get_tally(store, question.pk)
+    choices = []
+    for choice in results['choices']:
+        choice = copy.copy(choice)
+        choice.vote_count = counts.get(choice.pk, 0)
+        choices.append(choice)
+    total_votes = sum(choice.vote_count for choice in choices)
+    for choice in choices:
+        choice.percentage = choice.vote_count * 100 / total_votes if total_votes else 0.0
+    return {**results, 'choices': choices, 'total_votes': total_votes, 'tally_version': version}
+
+
+@receiver(vote_cast, dispatch_uid='polls.tallies.vote_cast_callback')
+def vote_cast_callback(sender, question_id, choice_id, previous_choice_id=None, **kwargs):
+    """Count every committed vote in the tally store."""
+    store = get_store()
+    if store is not None:
+        store.record(question_id, choice_id, previous_choice_id)
+
+
+@receiver(votes_deleted, dispatch_uid='polls.tallies.votes_deleted_callback')
+def votes_deleted_callback(sender, question_ids, **kwargs):
+    """Recount the questions that lost votes in the tally store, once each."""
+    store = get_store()
+    if store is not None:
+        for question_id in question_ids:
+            store.reconcile(question_id, count_votes(question_id))
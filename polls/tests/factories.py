@@ -0,0 +1,126 @@
+"""Test data for the polls tests.
+
+The create_* functions make one object with the fields a test cares
+about.  The make_* functions bulk create many rows in a handful of
+queries, for tests that need large tables; call them from
+setUpTestData so the rows are made once per test case class.
+"""
+import datetime
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection
+from django.utils import timezone
+
+from ..models import Choice, Question, Vote, VoteHourly
+
+PASSWORD = 'ha159357'
+
+
+def offset(value):
+    """Return value as a timedelta, numbers are days."""
+    return value if isinstance(value, datetime.timedelta) else datetime.timedelta(days=value)
+
+
+def create_question(question_text='Question.', pub=-1, end=1, choices=0, counts=None, now=None):
+    """Create a question with its choices.
+
+    Arguments:
+        question_text - the text of the question.
+        pub, end - publication and end dates as offsets to now, in days
+            or as timedeltas, negative for the past.
+        choices - the number of choices, named ``Choice 0`` onwards, or
+            a list of choice texts.
+        counts - the stored vote counters of the choices, with the
+            question total set to their sum.
+        now - the time the offsets are taken from, default the current time.
+    """
+    now = now or timezone.now()
+    texts = [f'Choice {i}' for i in range(choices)] if isinstance(choices, int) else list(choices)
+    counts = counts or [0] * len(texts)
+    question = Question.objects.create(
+        question_text=question_text,
+        pub_date=now + offset(pub),
+        end_date=now + offset(end),
+        vote_total=sum(counts),
+    )
+    question.choices = make_choices([question], texts, counts)
+    return question
+
+
+def create_user(username='voter', password=PASSWORD, **fields):
+    """Create a user who logs in with password."""
+    return User.objects.create_user(username=username, password=password, **fields)
+
+
+def make_choices(questions, texts, counts=None):
+    """Bulk create the choices texts, with vote counters counts, for every question.
+
+    Return:
+        The choices, question by question.
+    """
+    counts = counts or [0] * len(texts)
+    choices = [Choice(question=question, choice_text=text, vote_count=count)
+               for question in questions for text, count in zip(texts, counts)]
+    if connection.features.can_return_rows_from_bulk_insert:
+        return Choice.objects.bulk_create(choices, batch_size=1000)
+    for choice in choices:
+        choice.save()
+    return choices
+
+
+def make_questions(count, choices=0, now=None, spacing=1, length=30):
+    """Bulk create count questions named ``Question 0`` onwards, each with choices choices.
+
+    Question ``i`` is published ``i * spacing`` days before now and ends
+    ``length`` days after it was published.
+
+    Return:
+        The questions, newest first, with their choices in ``choices``.
+    """
+    now = now or timezone.now()
+    questions = []
+    for i in range(count):
+        pub_date = now - offset(spacing) * i
+        questions.append(Question(question_text=f'Question {i}', pub_date=pub_date, end_date=pub_date + offset(length)))
+    if connection.features.can_return_rows_from_bulk_insert:
+        Question.objects.bulk_create(questions, batch_size=1000)
+    else:
+        for question in questions:
+            question.save()
+    texts = [f'Choice {i}' for i in range(choices)]
+    all_choices = make_choices(questions, texts)
+    for position, question in enumerate(questions):
+        question.choices = all_choices[position * choices:(position + 1) * choices]
+    return questions
+
+
+def make_users(count, prefix='user'):
+    """Bulk create count users named prefix0 onwards, who all log in with PASSWORD.
+
+    Return:
+        The users, in name order.
+    """
+    password = make_password(PASSWORD)
+    User.objects.bulk_create([User(username=f'{prefix}{i}', password=password) for i in range(count)])
+    return list(User.objects.filter(username__startswith=prefix).order_by('pk'))
+
+
+def make_votes(pairs, cast_at=None):
+    """Bulk create a vote for every (user, choice) pair, then bring the counters up to date.
+
+    The vote counters of the choices and questions and the hourly rollup
+    are recounted from the Vote table, so use this in setUpTestData
+    before the tests read them.
+
+    Return:
+        The number of votes created.
+    """
+    cast_at = cast_at or timezone.now()
+    votes = Vote.objects.bulk_create(
+        [Vote(question_id=choice.question_id, choice=choice, user=user, cast_at=cast_at) for user, choice in pairs],
+        batch_size=1000,
+    )
+    Vote.objects.reconcile_counters()
+    VoteHourly.objects.rebuild()
+    return len(votes)
@@ -0,0 +1,128 @@
+"""Question admin tests."""
+from django.contrib.auth.models import User
+from django.db import connection
+from django.shortcuts import reverse
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from ..models import Question
+from ..pagination import EstimatedCountPaginator
+from .factories import PASSWORD, create_question as create_poll, make_questions
+from .utils import MaxQueriesMixin
+
+
+def create_question(question_text, days, length=2):
+    """Create a question published `days` from now that stays open for `length` days."""
+    return create_poll(question_text, pub=days, end=days + length)
+
+
+class QuestionAdminTest(MaxQueriesMixin, TestCase):
+    """Test cases for the question changelist."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create a superuser."""
+        User.objects.create_superuser(username='admin', password=PASSWORD)
+
+    def setUp(self):
+        """Log the superuser in."""
+        self.client.login(username='admin', password=PASSWORD)
+        self.url = reverse('admin:polls_question_changelist')
+
+    def changelist(self, **params):
+        """Return the titles of the questions listed by the changelist."""
+        with self.assertMaxQueries(5):
+            response = self.client.get(self.url, params)
+        return sorted(question.question_text for question in response.context['cl'].result_list)
+
+    def test_status_columns(self):
+        """The status columns come from the annotations of the changelist query."""
+        create_question('Open question', -1)
+        create_question('Closed question', -10)
+        create_question('Upcoming question', 5)
+        with self.assertMaxQueries(5):
+            response = self.client.get(self.url)
+        flags = {question.question_text: (question.published_recently, question.published, question.is_open)
+                 for question in response.context['cl'].result_list}
+        self.assertEqual(flags, {
+            'Open question': (False, True, True),
+            'Closed question': (False, True, False),
+            'Upcoming question': (False, False, False),
+        })
+
+    def test_queries_do_not_grow_with_rows(self):
+        """The changelist runs the same queries for 5 or 50 questions."""
+        def count_queries():
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(self.url)
+            return len(queries)
+
+        make_questions(5, length=2)
+        few = count_queries()
+        make_questions(45, length=2)
+        self.assertEqual(count_queries(), few)
+
+    def test_status_filter(self):
+        """The status filter keeps the open, closed or upcoming questions."""
+        create_question('Open question', -1)
+        create_question('Closed question', -10)
+        create_question('Upcoming question', 5)
+        self.assertEqual(self.changelist(status='open'), ['Open question'])
+        self.assertEqual(self.changelist(status='closed'), ['Closed question'])
+        self.assertEqual(self.changelist(status='upcoming'), ['Upcoming question'])
+        self.assertEqual(len(self.changelist()), 3)
+
+    def test_vote_count_read_only(self):
+        """The choice inline shows the vote counter but saving the question cannot change it."""
+        question = create_question('Counted question', -1)
+        response = self.client.get(reverse('admin:polls_question_change', args=(question.pk,)))
+        formset = response.context['inline_admin_formsets'][0].formset
+        self.assertNotIn('vote_count', formset.forms[0].fields)
+        self.assertContains(response, 'field-vote_count')
+
+    def test_search(self):
+        """The search matches every word anywhere in the question text, in any case, the last as a prefix."""
+        create_question('Favourite colour?', -1)
+        create_question('Your favourite pet?', -1)
+        create_question('Best pet food?', -1)
+        self.assertEqual(self.changelist(q='favourite'), ['Favourite colour?', 'Your favourite pet?'])
+        self.assertEqual(self.changelist(q='FAVOURITE col'), ['Favourite colour?'])
+        self.assertEqual(self.changelist(q='pe'), [])
+
+    def test_search_ranked(self):
+        """Search results are listed best match first."""
+        create_question('Pet food, pet toys or pet beds?', -1)
+        create_question('Favourite colour of a pet?', -1)
+        with self.assertMaxQueries(5):
+            response = self.client.get(self.url, {'q': 'pet'})
+        self.assertEqual([question.question_text for question in response.context['cl'].result_list],
+                         ['Pet food, pet toys or pet beds?', 'Favourite colour of a pet?'])
+
+
+class EstimatedCountPaginatorTest(TestCase):
+    """Test cases for the paginator that estimates large counts."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create questions and gather statistics."""
+        make_questions(30, length=2)
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+    def test_unfiltered_count_is_estimated(self):
+        """An unfiltered table over the threshold is counted from the statistics."""
+        if connection.vendor != 'sqlite':
+            self.skipTest('The statistics are gathered on SQLite.')
+        paginator = EstimatedCountPaginator(Question.objects.order_by('pk'), 10)
+        paginator.estimate_threshold = 10
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(paginator.count, 30)
+        self.assertNotIn('COUNT', queries[0]['sql'].upper())
+
+    def test_small_or_filtered_count_is_exact(self):
+        """Small tables and filtered querysets are counted."""
+        self.assertEqual(EstimatedCountPaginator(Question.objects.order_by('pk'), 10).count, 30)
+        paginator = EstimatedCountPaginator(Question.objects.filter(question_text__startswith='Question 1'), 10)
+        paginator.estimate_threshold = 1
+        self.assertEqual(paginator.count, 11)
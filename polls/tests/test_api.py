@@ -0,0 +1,151 @@
+"""JSON API tests."""
+from django.shortcuts import reverse
+from django.test import TestCase, override_settings
+
+from .. import ratelimit
+from ..cache import get_cache
+from ..models import Vote
+from .factories import create_question, create_user
+from .utils import MaxQueriesMixin
+
+
+def create_api_question(question_text, days, choices=2):
+    """Create a question published days ago that is open for two days, with choices."""
+    return create_question(question_text, pub=-days, end=2 - days, choices=choices)
+
+
+class ReadApiTests(MaxQueriesMixin, TestCase):
+    """Test cases for the read endpoints of the API."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create three questions, the oldest closed."""
+        cls.questions = [create_api_question(f'Question {days}', days) for days in (5, 1, 0)]
+
+    def setUp(self):
+        """Start with an empty results cache."""
+        get_cache().clear()
+
+    def test_question_list_pages(self):
+        """Questions come newest first, and the next cursor leads to the following page."""
+        with self.assertMaxQueries(1):
+            response = self.client.get(reverse('polls-api:question_list'), {'limit': 2})
+        self.assertEqual(response['Content-Type'], 'application/json')
+        data = response.json()
+        self.assertEqual([question['question_text'] for question in data['questions']], ['Question 0', 'Question 1'])
+        self.assertTrue(data['questions'][0]['open'])
+        with self.assertNumQueries(1):
+            data = self.client.get(reverse('polls-api:question_list'), {'limit': 2, 'after': data['next']}).json()
+        self.assertEqual([question['question_text'] for question in data['questions']], ['Question 5'])
+        self.assertFalse(data['questions'][0]['open'])
+        self.assertIsNone(data['next'])
+
+    def test_question_list_invalid(self):
+        """A malformed cursor or limit is a 400."""
+        for params in ({'after': '!'}, {'limit': 'x'}, {'limit': 0}):
+            with self.subTest(params=params):
+                with self.assertMaxQueries(0):
+                    response = self.client.get(reverse('polls-api:question_list'), params)
+                self.assertEqual(response.status_code, 400)
+
+    def test_question_detail(self):
+        """The detail lists the choices with two queries."""
+        question = self.questions[2]
+        with self.assertNumQueries(2):
+            data = self.client.get(reverse('polls-api:question_detail', args=(question.pk,))).json()
+        self.assertEqual(data['question_text'], 'Question 0')
+        self.assertEqual([choice['choice_text'] for choice in data['choices']], ['Choice 0', 'Choice 1'])
+        with self.assertMaxQueries(1):
+            response = self.client.get(reverse('polls-api:question_detail', args=(999,)))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {'error': 'No question matches the given id.'})
+
+    def test_results(self):
+        """The results of a question are served from the cache after the first request."""
+        url = reverse('polls-api:question_results', args=(self.questions[0].pk,))
+        with self.assertMaxQueries(2):
+            data = self.client.get(url).json()
+        self.assertEqual(data['total_votes'], 0)
+        self.assertFalse(data['open'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).json(), data)
+
+    def test_results_batch(self):
+        """One request returns the tallies of many questions with at most two queries."""
+        ids = [question.pk for question in self.questions]
+        url = reverse('polls-api:results_batch')
+        with self.assertNumQueries(2):
+            data = self.client.get(url, {'ids': ','.join(map(str, [*ids, 999]))}).json()
+        self.assertEqual([results['question'] for results in data['results']], ids)
+        self.assertEqual(len(data['results'][0]['choices']), 2)
+        with self.assertNumQueries(0):
+            self.client.get(url, {'ids': ','.join(map(str, ids))})
+
+    @override_settings(POLLS_API_MAX_BATCH=2)
+    def test_results_batch_invalid(self):
+        """Malformed ids or too many ids are a 400."""
+        url = reverse('polls-api:results_batch')
+        with self.assertMaxQueries(0):
+            self.assertEqual(self.client.get(url, {'ids': '1,x'}).json(), {'error': 'Invalid ids.'})
+            self.assertEqual(self.client.get(url, {'ids': '1,2,3'}).status_code, 400)
+
+
+class VoteApiTests(MaxQueriesMixin, TestCase):
+    """Test cases for casting a vote through the API."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create a user and an open question."""
+        cls.user = create_user('nice')
+        cls.question = create_api_question('Question', 1)
+        cls.choice = cls.question.choices[0]
+
+    def setUp(self):
+        """Start with full rate limit buckets and an empty results cache."""
+        ratelimit.reset()
+        get_cache().clear()
+        self.url = reverse('polls-api:vote', args=(self.question.pk,))
+
+    def test_vote(self):
+        """A JSON body casts the vote and the results show it."""
+        self.client.force_login(self.user)
+        with self.captureOnCommitCallbacks(execute=True), self.assertMaxQueries(9):
+            response = self.client.post(self.url, {'choice': self.choice.pk}, content_type='application/json')
+        self.assertEqual(response.json(), {'question': self.question.pk, 'choice': self.choice.pk})
+        self.assertEqual(Vote.objects.get().choice, self.choice)
+        results = self.client.get(reverse('polls-api:question_results', args=(self.question.pk,))).json()
+        self.assertEqual(results['total_votes'], 1)
+
+    def test_vote_form_field(self):
+        """The choice can be sent as a form field."""
+        self.client.force_login(self.user)
+        with self.assertMaxQueries(9):
+            response = self.client.post(self.url, {'choice': self.choice.pk})
+        self.assertEqual(response.status_code, 200)
+
+    def test_not_authenticated(self):
+        """Anonymous votes are a 401."""
+        with self.assertMaxQueries(0):
+            response = self.client.post(self.url, {'choice': self.choice.pk})
+        self.assertEqual(response.status_code, 401)
+
+    def test_invalid_choice(self):
+        """A choice of another question or no choice is a 400."""
+        self.client.force_login(self.user)
+        other = create_api_question('Other', 1).choices[0]
+        self.assertEqual(self.client.post(self.url, {'choice': other.pk}).status_code, 400)
+        self.assertEqual(self.client.post(self.url).status_code, 400)
+        self.assertEqual(self.client.post(self.url, 'not json', content_type='application/json').status_code, 400)
+
+    def test_closed_question(self):
+        """A closed question cannot be voted on."""
+        self.client.force_login(self.user)
+        closed = create_api_question('Closed', 5)
+        url = reverse('polls-api:vote', args=(closed.pk,))
+        with self.assertMaxQueries(3):
+            response = self.client.post(url, {'choice': closed.choices[0].pk})
+        self.assertEqual(response.status_code, 403)
+
+    def test_get_not_allowed(self):
+        """Votes are only cast with POST."""
+        self.assertEqual(self.client.get(self.url).status_code, 405)
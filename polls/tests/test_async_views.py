@@ -0,0 +1,92 @@
+"""Async views tests."""
+from django.shortcuts import reverse
+from django.test import TestCase, override_settings
+
+from .. import ratelimit
+from ..cache import aresults_version, get_cache
+from ..models import Vote
+from .factories import create_question, create_user
+from .utils import MaxQueriesMixin
+
+
+@override_settings(ROOT_URLCONF='mysite.urls_async')
+class AsyncViewsTest(MaxQueriesMixin, TestCase):
+    """Test cases for the polls pages served by the async views."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Initialize the user and the question with choices."""
+        cls.question = create_question('Test question', pub=0, end=3, choices=3)
+        cls.choices = cls.question.choices
+        cls.user = create_user('nicenicegame')
+
+    def setUp(self):
+        """Log the async client in, with full rate limit buckets and an empty cache."""
+        ratelimit.reset()
+        get_cache().clear()
+        self.async_client.force_login(self.user)
+
+    async def test_index(self):
+        """The index lists the question, the second request is served from the fragment cache."""
+        async with self.aassertMaxQueries(3):
+            response = await self.async_client.get(reverse('polls:index'))
+        self.assertContains(response, 'Test question')
+        self.assertTrue(response.context['user'].is_authenticated)
+        response = await self.async_client.get(reverse('polls:index'))
+        self.assertContains(response, 'Test question')
+        self.assertNotIn('_rows', response.context['page'].__dict__)
+
+    async def test_index_invalid_cursor(self):
+        """A malformed cursor returns a 404 not found."""
+        async with self.aassertMaxQueries(0):
+            response = await self.async_client.get(reverse('polls:index'), {'after': '!'})
+        self.assertEqual(response.status_code, 404)
+
+    async def test_detail_previous_choice(self):
+        """The detail page marks the choice the user voted for."""
+        await Vote.objects.acreate(question=self.question, choice=self.choices[1], user=self.user)
+        async with self.aassertMaxQueries(5):
+            response = await self.async_client.get(reverse('polls:detail', args=(self.question.id,)))
+        self.assertEqual(response.context['previous_choice'], self.choices[1])
+        self.assertContains(response, 'previous voted choice')
+
+    async def test_detail_unknown_question(self):
+        """The detail page of a question that does not exist returns a 404 not found."""
+        async with self.aassertMaxQueries(1):
+            response = await self.async_client.get(reverse('polls:detail', args=(12345,)))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_results_unknown_question(self):
+        """The results page of a question that does not exist returns a 404 and leaves no version behind."""
+        async with self.aassertMaxQueries(1):
+            response = await self.async_client.get(reverse('polls:results', args=(12345,)))
+        self.assertEqual(response.status_code, 404)
+        self.assertIsNone(await aresults_version(12345, create=False))
+
+    async def test_vote_and_results(self):
+        """A vote updates the counters and the results page shows it."""
+        async with self.aassertMaxQueries(9):
+            response = await self.async_client.post(
+                reverse('polls:vote', args=(self.question.id,)), {'choice': self.choices[2].id})
+        self.assertRedirects(response, reverse('polls:results', args=(self.question.id,)),
+                             fetch_redirect_response=False)
+        async with self.aassertMaxQueries(4):
+            response = await self.async_client.get(reverse('polls:results', args=(self.question.id,)))
+        self.assertEqual(response.context['total_votes'], 1)
+        self.assertEqual([choice.vote_count for choice in response.context['choices']], [0, 0, 1])
+
+    async def test_vote_without_choice(self):
+        """A vote without a choice shows the detail page with an error."""
+        async with self.aassertMaxQueries(4):
+            response = await self.async_client.post(reverse('polls:vote', args=(self.question.id,)))
+        self.assertContains(response, 'Please select one choice below for voting.')
+
+    async def test_vote_not_logged_in(self):
+        """An anonymous vote is redirected to the login page."""
+        self.async_client.cookies.clear()
+        async with self.aassertMaxQueries(0):
+            response = await self.async_client.post(
+                reverse('polls:vote', args=(self.question.id,)), {'choice': self.choices[0].id})
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response.url.startswith(reverse('login')))
+        self.assertFalse(await Vote.objects.aexists())
@@ -1,32 +1,43 @@
 """Authentication tests."""
-from django.contrib.auth.models import User
+from django.contrib.auth.hashers import get_hasher
 from django.test import TestCase
 from django.shortcuts import reverse
 
+from .factories import PASSWORD, create_user
+from .utils import MaxQueriesMixin
 
-class AuthenticationTest(TestCase):
+
+class AuthenticationTest(MaxQueriesMixin, TestCase):
     """Test cases for authentication system."""
 
-    def setUp(self):
+    @classmethod
+    def setUpTestData(cls):
         """Initialize the user."""
-        self.user = {
+        cls.user = {
             'username': 'nice',
-            'password': 'ha159357'
+            'password': PASSWORD
         }
-        User.objects.create_user(**self.user)
+        create_user(**cls.user)
 
     def test_user_logged_in(self):
         """Test user logged in, the user username should display on the index page."""
-        response = self.client.post(reverse('login'), self.user)
+        with self.assertMaxQueries(9):
+            response = self.client.post(reverse('login'), self.user)
         self.assertEqual(response.status_code, 302)
-        response = self.client.get(reverse('polls:index'))
+        with self.assertMaxQueries(3):
+            response = self.client.get(reverse('polls:index'))
         self.assertTrue(response.context['user'].is_authenticated)
         self.assertContains(response, f'Hello {self.user["username"]}')
 
     def test_user_logged_out(self):
         """Test logged out, the user username will be not shown on the index page."""
         self.client.post(reverse('login'), self.user)
-        response = self.client.post(reverse('logout'))
+        with self.assertMaxQueries(4):
+            response = self.client.post(reverse('logout'))
         self.assertEqual(response.status_code, 200)
         self.assertFalse(response.context['user'].is_authenticated)
         self.assertNotContains(response, f'Hello {self.user["username"]}')
+
+    def test_fast_password_hasher(self):
+        """The test runner hashes passwords with MD5 to keep logins fast."""
+        self.assertEqual(get_hasher().algorithm, 'md5')
@@ -0,0 +1,108 @@
+"""Concurrent voting tests."""
+import threading
+from unittest import SkipTest
+
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, TransactionTestCase
+
+from ..models import Question, Choice, Vote
+from .factories import create_question, create_user
+
+
+class ConcurrentVotingTest(TransactionTestCase):
+    """Test cases for votes submitted in parallel by the same user.
+
+    Threads need their own connections to a real database, so with SQLite
+    these tests run only when TEST_DATABASE_NAME points the test database
+    at a file.
+    """
+
+    workers = 8
+    rounds = 5
+
+    @classmethod
+    def setUpClass(cls):
+        """Skip on a shared-cache in-memory SQLite test database."""
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            raise SkipTest('Concurrent voting needs a file or server test database.')
+        super().setUpClass()
+
+    def setUp(self):
+        """Initialize the user and the question with choices."""
+        self.question = create_question('Test question', pub=0, end=3, choices=3)
+        self.choices = self.question.choices
+        self.user = create_user('nicenicegame')
+
+    def cast_in_parallel(self, choices):
+        """Cast one vote per choice, each from its own thread and connection, all at once."""
+        barrier = threading.Barrier(len(choices))
+        errors = []
+
+        def cast(choice):
+            try:
+                barrier.wait()
+                Vote.objects.cast(self.user, choice)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=cast, args=(choice,)) for choice in choices]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def assert_one_consistent_vote(self):
+        """Exactly one vote row remains and every counter agrees with it."""
+        votes = list(Vote.objects.filter(question=self.question, user=self.user))
+        self.assertEqual(len(votes), 1)
+        counts = dict(Choice.objects.filter(question=self.question).values_list('pk', 'vote_count'))
+        self.assertEqual(counts, {choice.pk: int(choice.pk == votes[0].choice_id) for choice in self.choices})
+        self.assertEqual(Question.objects.get(pk=self.question.pk).vote_total, 1)
+
+    def test_parallel_first_votes(self):
+        """Parallel first votes for one user leave exactly one row and a total of one."""
+        for _ in range(self.rounds):
+            Vote.objects.all().delete()
+            Choice.objects.update(vote_count=0)
+            Question.objects.update(vote_total=0)
+            self.cast_in_parallel([self.choices[i % 3] for i in range(self.workers)])
+            self.assert_one_consistent_vote()
+
+    def test_parallel_changed_votes(self):
+        """Parallel vote changes for one user move the single count without losing or doubling it."""
+        Vote.objects.cast(self.user, self.choices[0])
+        for _ in range(self.rounds):
+            self.cast_in_parallel([self.choices[i % 3] for i in range(self.workers)])
+            self.assert_one_consistent_vote()
+
+
+class VoteConstraintTest(TestCase):
+    """Test cases for the unique vote constraint."""
+
+    def test_unique_constraint(self):
+        """The database itself rejects a second vote row for the same user and question."""
+        question = create_question('Test question', pub=0, end=3, choices=2)
+        choices = question.choices
+        user = create_user('nicenicegame')
+        Vote.objects.cast(user, choices[0])
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Vote.objects.create(question=question, choice=choices[1], user=user)
+
+    def test_fallback_insert(self):
+        """Without a conflict target a second vote moves the first, and other errors are raised."""
+        features = connection.features
+        self.addCleanup(setattr, features, 'supports_update_conflicts_with_target',
+                        features.supports_update_conflicts_with_target)
+        features.supports_update_conflicts_with_target = False
+        question = create_question('Test question', pub=0, end=3, choices=2)
+        choices = question.choices
+        user = create_user('nicenicegame')
+        self.assertIsNone(Vote.objects.cast(user, choices[0]))
+        self.assertEqual(Vote.objects.cast(user, choices[1]), choices[0].pk)
+        with self.assertRaises(IntegrityError):
+            # A choice that is not in the database: the row is rejected, not a vote already cast.
+            Vote.objects.cast(create_user('other'), Choice(question=question))
+        self.assertEqual(Vote.objects.get().choice_id, choices[1].pk)
@@ -0,0 +1,134 @@
+"""Conditional GET tests for the index and results pages."""
+from django.shortcuts import reverse
+from django.test import TestCase, override_settings
+
+from ..cache import get_cache, results_key
+from ..lifecycle import close_poll
+from ..models import Vote
+from .factories import create_question, create_user
+from .utils import MaxQueriesMixin
+
+
+class ConditionalGetTests(MaxQueriesMixin, TestCase):
+    """Test cases for ETag, Last-Modified and Cache-Control on the index and results pages."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create an open question, a closed question and a user."""
+        cls.question = create_question('Open question', pub=0, end=1, choices=2)
+        cls.closed = create_question('Closed question', pub=-5, end=-4, choices=2)
+        cls.user = create_user('nice')
+
+    def setUp(self):
+        """Start with empty caches."""
+        get_cache().clear()
+
+    def test_results_not_modified(self):
+        """A current ETag gets a 304 without rendering the template."""
+        url = reverse('polls:results', args=(self.question.pk,))
+        with self.assertMaxQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('no-cache', response['Cache-Control'])
+        with self.assertMaxQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertTemplateNotUsed(response, 'polls/results.html')
+
+    def test_results_changed_by_vote(self):
+        """A vote moves the ETag of the results on."""
+        url = reverse('polls:results', args=(self.question.pk,))
+        with self.assertMaxQueries(2):
+            etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Vote.objects.cast(self.user, self.question.choices[0])
+        with self.assertMaxQueries(2):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_results_changed_by_other_worker(self):
+        """A vote counted by another worker moves the ETag once the cached results expire."""
+        url = reverse('polls:results', args=(self.question.pk,))
+        with self.assertMaxQueries(2):
+            etag = self.client.get(url)['ETag']
+        # The other worker bumped the results version in its own cache only.
+        Vote.objects.create(question=self.question, choice=self.question.choices[0], user=self.user)
+        Vote.objects.reconcile_counters()
+        get_cache().delete(results_key(self.question.pk))
+        with self.assertMaxQueries(2):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_votes'], 1)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_if_modified_since(self):
+        """Anonymous pages answer If-Modified-Since."""
+        url = reverse('polls:results', args=(self.question.pk,))
+        with self.assertMaxQueries(2):
+            response = self.client.get(url)
+        with self.assertMaxQueries(0):
+            response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_closed_results_long_lifetime(self):
+        """The results of a closed poll may be kept for a day."""
+        with self.assertMaxQueries(2):
+            response = self.client.get(reverse('polls:results', args=(self.closed.pk,)))
+        self.assertIn('max-age=86400', response['Cache-Control'])
+        self.assertIn('public', response['Cache-Control'])
+
+    def test_closed_early_long_lifetime(self):
+        """A poll closed before its end date gets the long lifetime of a closed poll."""
+        close_poll(self.question.pk)
+        response = self.client.get(reverse('polls:results', args=(self.question.pk,)))
+        self.assertIn('max-age=86400', response['Cache-Control'])
+
+    def test_index_not_modified(self):
+        """The index answers its ETag with a 304 until a question changes."""
+        url = reverse('polls:index')
+        with self.assertMaxQueries(1):
+            etag = self.client.get(url)['ETag']
+        with self.assertMaxQueries(0):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.question.question_text = 'Edited question'
+        self.question.save()
+        with self.assertMaxQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Edited question')
+
+    def test_user_specific(self):
+        """Logged-in users get their own ETag, no Last-Modified and private caching."""
+        url = reverse('polls:index')
+        with self.assertMaxQueries(1):
+            anonymous = self.client.get(url)
+        self.client.force_login(self.user)
+        with self.assertMaxQueries(3):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=anonymous['ETag'])
+        self.assertContains(response, 'Hello nice')
+        self.assertNotEqual(response['ETag'], anonymous['ETag'])
+        self.assertFalse(response.has_header('Last-Modified'))
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_waiting_messages(self):
+        """A page with a flash message waiting is rendered even for a current ETag."""
+        with self.assertMaxQueries(1):
+            etag = self.client.get(reverse('polls:index'))['ETag']
+        with self.assertMaxQueries(1):
+            self.client.get(reverse('polls:detail', args=(self.closed.pk,)))
+        with self.assertMaxQueries(0):
+            response = self.client.get(reverse('polls:index'), HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Voting is not allowed!')
+
+    @override_settings(ROOT_URLCONF='mysite.urls_async')
+    async def test_async_views(self):
+        """The async index and results views answer a current ETag with a 304."""
+        for url, queries in ((reverse('polls:index'), 1), (reverse('polls:results', args=(self.question.pk,)), 2)):
+            with self.subTest(url=url):
+                async with self.aassertMaxQueries(queries):
+                    response = await self.async_client.get(url)
+                self.assertEqual(response.status_code, 200)
+                async with self.aassertMaxQueries(0):
+                    response = await self.async_client.get(url, headers={'If-None-Match': response['ETag']})
+                self.assertEqual(response.status_code, 304)
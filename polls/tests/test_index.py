@@ -1,30 +1,27 @@
 """Index page tests."""
-import datetime
-
 from django.shortcuts import reverse
-from django.test import TestCase
-from django.utils import timezone
+from django.test import TestCase, override_settings
 
-from ..models import Question
+from ..cache import get_cache
+from .factories import create_question, make_questions
+from .utils import MaxQueriesMixin
 
 
-def create_question(question_text, pub, end):
-    """Create question with publication date and end date.
+class QuestionIndexViewTests(MaxQueriesMixin, TestCase):
+    """Test cases for index view."""
 
-    `pub` and `end` offset to now (negative for questions published
-    in the past, positive for questions that have yet to be published).
-    """
-    pub_time = timezone.now() + datetime.timedelta(days=pub)
-    end_time = timezone.now() + datetime.timedelta(days=end)
-    return Question.objects.create(question_text=question_text, pub_date=pub_time, end_date=end_time)
+    def setUp(self):
+        """Start every test without a cached index page."""
+        get_cache().clear()
 
-
-class QuestionIndexViewTests(TestCase):
-    """Test cases for index view."""
+    def get_index(self):
+        """Return the index page, fetched within its query budget."""
+        with self.assertMaxQueries(1):
+            return self.client.get(reverse('polls:index'))
 
     def test_no_questions(self):
         """If no questions exist, an appropriate message is displayed."""
-        response = self.client.get(reverse('polls:index'))
+        response = self.get_index()
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, "No polls are available.")
         self.assertQuerysetEqual(response.context['questions'], [])
@@ -32,35 +29,95 @@ class QuestionIndexViewTests(TestCase):
     def test_past_question(self):
         """Questions with a pub_date in the past are displayed on the index page."""
         create_question(question_text="Past question.", pub=-30, end=-29)
-        response = self.client.get(reverse('polls:index'))
+        response = self.get_index()
         self.assertQuerysetEqual(
             response.context['questions'],
-            ['<Question: Past question.>']
+            ['<Question: Past question.>'],
+            transform=repr,
         )
 
     def test_future_question(self):
         """Questions with a pub_date in the future are displayed on the index page, but can't vote on them."""
         future_question = create_question(question_text="Future question.", pub=30, end=31)
-        response = self.client.get(reverse('polls:index'))
-        self.assertQuerysetEqual(response.context['questions'], ['<Question: Future question.>'])
+        response = self.get_index()
+        self.assertQuerysetEqual(response.context['questions'], ['<Question: Future question.>'], transform=repr)
         self.assertFalse(future_question.can_vote())
 
     def test_future_question_and_past_question(self):
         """Even if both past and future questions exist, and future question can't vote yet. Both will be displayed."""
         create_question(question_text="Past question.", pub=-30, end=-29)
         create_question(question_text="Future question.", pub=30, end=31)
-        response = self.client.get(reverse('polls:index'))
+        response = self.get_index()
         self.assertQuerysetEqual(
             response.context['questions'],
-            ['<Question: Future question.>', '<Question: Past question.>']
+            ['<Question: Future question.>', '<Question: Past question.>'],
+            transform=repr,
         )
 
     def test_two_past_questions(self):
         """The questions index page may display multiple questions."""
         create_question(question_text="Past question 1.", pub=-30, end=-29)
         create_question(question_text="Past question 2.", pub=-5, end=-4)
-        response = self.client.get(reverse('polls:index'))
+        response = self.get_index()
         self.assertQuerysetEqual(
             response.context['questions'],
-            ['<Question: Past question 2.>', '<Question: Past question 1.>']
+            ['<Question: Past question 2.>', '<Question: Past question 1.>'],
+            transform=repr,
         )
+
+
+@override_settings(POLLS_INDEX_PAGE_SIZE=2)
+class QuestionIndexPaginationTests(MaxQueriesMixin, TestCase):
+    """Test cases for keyset pagination and caching of the index view."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create five open questions published one day apart."""
+        cls.questions = make_questions(5)
+
+    def setUp(self):
+        """Start every test without a cached index page."""
+        get_cache().clear()
+
+    def test_pages_follow_cursor(self):
+        """Following the next cursor walks every question once, newest first."""
+        seen = []
+        response = self.client.get(reverse('polls:index'))
+        while True:
+            page = response.context['page']
+            seen += [question.question_text for question in page]
+            if not page.has_next:
+                break
+            with self.assertMaxQueries(1):
+                response = self.client.get(reverse('polls:index'), {'after': page.next_cursor})
+        self.assertEqual(seen, [f'Question {i}' for i in range(5)])
+
+    def test_invalid_cursor(self):
+        """A malformed cursor returns a 404 not found."""
+        with self.assertMaxQueries(0):
+            response = self.client.get(reverse('polls:index'), {'after': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_status_computed_in_database(self):
+        """The is_open annotation agrees with can_vote() for open and closed questions."""
+        closed_question = create_question(question_text='Closed question.', pub=-10, end=-9)
+        cursor = None
+        statuses = {}
+        while True:
+            page = self.client.get(reverse('polls:index'), {'after': cursor} if cursor else {}).context['page']
+            statuses.update((question.pk, (question.is_open, question.can_vote())) for question in page)
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+        self.assertEqual(statuses[closed_question.pk], (False, False))
+        self.assertTrue(all(is_open == can_vote for is_open, can_vote in statuses.values()))
+
+    def test_first_page_is_cached(self):
+        """The first page is served from the fragment cache until a question changes."""
+        self.client.get(reverse('polls:index'))
+        with self.assertNumQueries(0):
+            self.client.get(reverse('polls:index'))
+        create_question(question_text='Newest question.', pub=0, end=1)
+        with self.assertMaxQueries(1):
+            response = self.client.get(reverse('polls:index'))
+        self.assertContains(response, 'Newest question.')
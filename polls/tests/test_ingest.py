@@ -0,0 +1,194 @@
+"""Buffered vote ingestion tests."""
+import io
+import json
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+from django.core.management import CommandError, call_command
+from django.db import DataError, OperationalError
+from django.shortcuts import reverse
+from django.test import TestCase, override_settings
+
+from .. import ingest, ratelimit
+from ..ingest import VoteIngestor, VoteJournal, recover_journals
+from ..models import Question, Choice, Vote
+from .factories import PASSWORD, create_question, make_users
+from .utils import MaxQueriesMixin
+
+
+class BufferedVotingTest(MaxQueriesMixin, TestCase):
+    """Test cases for journaled votes written in batches."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Initialize users and the question with choices."""
+        cls.question = create_question('Test question', pub=0, end=3, choices=3)
+        cls.choices = cls.question.choices
+        cls.users = make_users(3)
+
+    def setUp(self):
+        """Start with full rate limit buckets and an empty journal directory."""
+        ratelimit.reset()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def assert_counts(self, expected):
+        """The choice counters and the question total match expected."""
+        counts = [choice.vote_count for choice in Choice.objects.filter(question=self.question).order_by('pk')]
+        self.assertEqual(counts, expected)
+        self.assertEqual(Question.objects.get(pk=self.question.pk).vote_total, sum(expected))
+
+    def test_batch_last_vote_wins(self):
+        """A batch writes one row per user with their last choice and matching counters."""
+        ingestor = VoteIngestor(self.directory, fsync=False)
+        ingestor.start(worker=False)
+        ingestor.submit(self.users[0].pk, self.question.pk, self.choices[0].pk)
+        ingestor.submit(self.users[1].pk, self.question.pk, self.choices[0].pk)
+        ingestor.submit(self.users[0].pk, self.question.pk, self.choices[2].pk)
+        with self.assertNumQueries(9):
+            ingestor.drain()
+        self.assertEqual(Vote.objects.count(), 2)
+        self.assert_counts([1, 0, 1])
+        ingestor.stop()
+        self.assertEqual(list(self.directory.iterdir()), [])
+
+    def test_batch_changes_existing_votes(self):
+        """A batch moves existing votes between choices without changing the total."""
+        Vote.objects.cast(self.users[0], self.choices[0])
+        Vote.objects.cast(self.users[1], self.choices[1])
+        Vote.objects.cast_many([
+            (self.users[0].pk, self.question.pk, self.choices[1].pk),
+            (self.users[1].pk, self.question.pk, self.choices[1].pk),
+            (self.users[2].pk, self.question.pk, self.choices[2].pk),
+        ])
+        self.assertEqual(Vote.objects.count(), 3)
+        self.assert_counts([0, 2, 1])
+
+    def test_checkpoint_empties_journal(self):
+        """Once every journaled vote is written, the journal is emptied."""
+        journal = VoteJournal(self.directory / 'votes-1.jsonl', fsync=False)
+        journal.open()
+        first = journal.append({'user': 1, 'question': 1, 'choice': 1})
+        last = journal.append({'user': 2, 'question': 1, 'choice': 1})
+        journal.checkpoint(first)
+        self.assertEqual([offset for _, offset in journal.pending()], [last])
+        journal.checkpoint(last)
+        self.assertEqual(journal.pending(), [])
+        self.assertEqual(journal.path.stat().st_size, 0)
+        journal.close()
+
+    def test_queue_in_journal_order(self):
+        """Votes submitted from many threads are queued in the order of their journal offsets."""
+        ingestor = VoteIngestor(self.directory, fsync=False)
+        ingestor.start(worker=False)
+        self.addCleanup(ingestor.stop)
+
+        def submit():
+            for _ in range(50):
+                ingestor.submit(self.users[0].pk, self.question.pk, self.choices[0].pk)
+
+        # Switch threads as often as possible, to catch one between the journal and the queue.
+        self.addCleanup(sys.setswitchinterval, sys.getswitchinterval())
+        sys.setswitchinterval(1e-6)
+        threads = [threading.Thread(target=submit) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        offsets = [offset for _, offset in ingestor._next_batch(block=False)]
+        self.assertEqual(len(offsets), 400)
+        self.assertEqual(offsets, sorted(offsets))
+
+    def test_recover_journal_after_crash(self):
+        """Votes after the checkpoint of a dead process journal are replayed, a torn last line is ignored."""
+        path = self.directory / 'votes-99999.jsonl'
+        lines = [
+            json.dumps({'user': self.users[0].pk, 'question': self.question.pk, 'choice': self.choices[0].pk}),
+            json.dumps({'user': self.users[1].pk, 'question': self.question.pk, 'choice': self.choices[1].pk}),
+        ]
+        path.write_text(lines[0] + '\n' + lines[1] + '\n' + '{"user": ')
+        path.with_suffix('.offset').write_text(str(len(lines[0]) + 1))
+        self.assertEqual(recover_journals(self.directory), 1)
+        self.assertEqual(list(Vote.objects.values_list('user', flat=True)), [self.users[1].pk])
+        self.assert_counts([0, 1, 0])
+        self.assertFalse(path.exists())
+
+    def test_recover_drops_votes_for_deleted_choice(self):
+        """A journaled vote for a deleted choice is skipped without losing the others."""
+        path = self.directory / 'votes-99999.jsonl'
+        path.write_text(
+            json.dumps({'user': self.users[0].pk, 'question': self.question.pk, 'choice': 12345}) + '\n'
+            + json.dumps({'user': self.users[1].pk, 'question': self.question.pk, 'choice': self.choices[1].pk}) + '\n'
+        )
+        recover_journals(self.directory)
+        self.assert_counts([0, 1, 0])
+
+    def fail_writes(self, error):
+        """Make every batch write raise error until the test ends; return the list of attempts."""
+        attempts = []
+
+        def write_batch(entries):
+            attempts.append(entries)
+            raise error
+
+        self.addCleanup(setattr, ingest, 'write_batch', ingest.write_batch)
+        ingest.write_batch = write_batch
+        return attempts
+
+    def submit_and_drain(self, ingestor):
+        """Journal a vote of the first user and write it."""
+        ingestor.start(worker=False)
+        self.addCleanup(ingestor.stop)
+        ingestor.submit(self.users[0].pk, self.question.pk, self.choices[0].pk)
+        with self.assertLogs('polls', 'ERROR'):
+            ingestor.drain()
+
+    def test_operational_error_retried_then_set_aside(self):
+        """A batch is retried after an OperationalError, and set aside once the retries run out."""
+        attempts = self.fail_writes(OperationalError('database is locked'))
+        ingestor = VoteIngestor(self.directory, flush_interval=0, fsync=False, retries=2)
+        self.submit_and_drain(ingestor)
+        self.assertEqual(len(attempts), 3)
+        self.assertEqual(ingestor.journal.pending(), [])
+        rejected = (self.directory / ingest.REJECTED_VOTES).read_text().splitlines()
+        self.assertEqual([json.loads(line)['user'] for line in rejected], [self.users[0].pk])
+
+    def test_other_errors_set_aside(self):
+        """Other database errors set the batch aside without retrying it."""
+        attempts = self.fail_writes(DataError('value too long'))
+        self.submit_and_drain(VoteIngestor(self.directory, flush_interval=0, fsync=False))
+        self.assertEqual(len(attempts), 1)
+        self.assertTrue((self.directory / ingest.REJECTED_VOTES).exists())
+
+    def test_replay_rejected(self):
+        """flush_votes --rejected writes the votes set aside and deletes their file."""
+        ingest.set_aside(self.directory, [(self.users[0].pk, self.question.pk, self.choices[1].pk)])
+        write_batch = ingest.write_batch
+        attempts = self.fail_writes(OperationalError('database is locked'))
+        with self.assertRaises(CommandError):
+            call_command('flush_votes', '--rejected', '--directory', str(self.directory), stdout=io.StringIO())
+        self.assertEqual(len(attempts), 1)
+        ingest.write_batch = write_batch
+        out = io.StringIO()
+        call_command('flush_votes', '--rejected', '--directory', str(self.directory), stdout=out)
+        self.assertIn('Replayed 1 rejected votes.', out.getvalue())
+        self.assert_counts([0, 1, 0])
+        self.assertEqual(list(self.directory.iterdir()), [])
+
+    def test_buffered_view(self):
+        """In buffered mode the vote view journals the vote instead of writing it."""
+        ingestor = VoteIngestor(self.directory, fsync=False)
+        ingestor.start(worker=False)
+        self.addCleanup(setattr, ingest, '_ingestor', None)
+        ingest._ingestor = ingestor
+        self.client.login(username='user0', password=PASSWORD)
+        with override_settings(POLLS_VOTE_MODE='buffered'), self.assertMaxQueries(3):
+            response = self.client.post(reverse('polls:vote', args=(self.question.id,)),
+                                        {'choice': self.choices[1].id})
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Vote.objects.exists())
+        ingestor.stop()
+        self.assert_counts([0, 1, 0])
@@ -0,0 +1,127 @@
+"""Poll lifecycle tests."""
+import datetime
+from io import StringIO
+
+from django.core.management import call_command
+from django.shortcuts import reverse
+from django.test import TestCase
+from django.utils import timezone
+
+from .. import ratelimit
+from ..cache import get_cache
+from ..lifecycle import close_due_polls, close_poll, restore_votes
+from ..models import Question, ResultSnapshot, Vote, VoteArchive, VoteHourly
+from .factories import create_question, create_user, make_users
+from .utils import MaxQueriesMixin
+
+
+class ClosePollsTests(MaxQueriesMixin, TestCase):
+    """Test cases for closing ended polls and serving their snapshots."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create an ended poll with three votes, an open poll and a poll that just ended."""
+        cls.ended = create_question('Ended', pub=-5, end=-1, choices=2)
+        cls.open = create_question('Open', pub=-5, end=1, choices=2)
+        cls.just_ended = create_question('Just ended', pub=-5, end=-datetime.timedelta(seconds=10), choices=2)
+        cls.users = make_users(3)
+        choices = cls.ended.choices
+        for user, choice in zip(cls.users, [choices[0], choices[0], choices[1]]):
+            Vote.objects.cast(user, choice)
+        cls.ended.refresh_from_db()
+
+    def setUp(self):
+        """Start with an empty results cache and rate limits."""
+        get_cache().clear()
+        ratelimit.reset()
+
+    def test_close_due_polls(self):
+        """Only polls that ended before the grace period are closed, with their final tallies."""
+        self.assertEqual(close_due_polls(grace=60), [self.ended.pk])
+        self.ended.refresh_from_db()
+        self.assertTrue(self.ended.closed)
+        self.assertFalse(self.ended.can_vote())
+        snapshot = self.ended.snapshot
+        self.assertEqual(snapshot.total_votes, 3)
+        self.assertEqual([choice['votes'] for choice in snapshot.choices], [2, 1])
+        self.assertFalse(Question.objects.get(pk=self.open.pk).closed)
+        self.assertFalse(Question.objects.get(pk=self.just_ended.pk).closed)
+        self.assertEqual(close_due_polls(grace=60), [])
+
+    def test_results_from_snapshot(self):
+        """The results of a closed poll are read with one query."""
+        close_poll(self.ended.pk)
+        get_cache().clear()
+        with self.assertMaxQueries(1):
+            response = self.client.get(reverse('polls:results', args=(self.ended.pk,)))
+        self.assertContains(response, 'Total votes: 3')
+        self.assertEqual([choice.vote_count for choice in response.context['choices']], [2, 1])
+        self.assertAlmostEqual(response.context['choices'][0].percentage, 200 / 3)
+
+    def test_closed_early_status(self):
+        """A poll closed before its end date is not open on the index or in the admin filters."""
+        close_poll(self.open.pk)
+        question = Question.objects.with_status().get(pk=self.open.pk)
+        self.assertFalse(question.is_open)
+        self.assertFalse(question.can_vote())
+        self.assertFalse(Question.objects.with_state('open').filter(pk=self.open.pk).exists())
+        self.assertTrue(Question.objects.with_state('closed').filter(pk=self.open.pk).exists())
+
+    def test_snapshot_immutable(self):
+        """A saved snapshot cannot be changed."""
+        close_poll(self.ended.pk)
+        snapshot = ResultSnapshot.objects.get(pk=self.ended.pk)
+        snapshot.total_votes = 0
+        with self.assertRaises(ValueError):
+            snapshot.save()
+
+    def test_vote_refused_after_close(self):
+        """The vote view turns away votes for a closed poll."""
+        close_poll(self.ended.pk)
+        self.client.force_login(create_user('late'))
+        with self.assertMaxQueries(3):
+            response = self.client.post(reverse('polls:vote', args=(self.ended.pk,)),
+                                        {'choice': self.ended.choices[0].pk})
+        self.assertRedirects(response, reverse('polls:index'))
+        self.assertEqual(Vote.objects.filter(question=self.ended).count(), 3)
+
+    def test_archive_votes(self):
+        """Archiving packs the votes into one row and leaves counters and history alone."""
+        votes = sorted(Vote.objects.filter(question=self.ended).values_list('user_id', 'choice_id', 'cast_at'))
+        close_poll(self.ended.pk, archive=True)
+        self.assertFalse(Vote.objects.filter(question=self.ended).exists())
+        archive = VoteArchive.objects.get(pk=self.ended.pk)
+        self.assertEqual(archive.vote_count, 3)
+        self.assertEqual(sorted(archive.votes()), votes)
+        Vote.objects.reconcile_counters()
+        self.ended.refresh_from_db()
+        self.assertEqual(self.ended.vote_total, 3)
+        VoteHourly.objects.rebuild()
+        self.assertEqual(sum(VoteHourly.objects.filter(question=self.ended).values_list('count', flat=True)), 3)
+
+    def test_reopen(self):
+        """Moving the end date of a closed poll into the future reopens it and restores its votes."""
+        close_poll(self.ended.pk, archive=True)
+        question = Question.objects.get(pk=self.ended.pk)
+        question.end_date = timezone.now() + datetime.timedelta(days=1)
+        question.save()
+        question.refresh_from_db()
+        self.assertFalse(question.closed)
+        self.assertTrue(question.can_vote())
+        self.assertFalse(ResultSnapshot.objects.filter(pk=question.pk).exists())
+        self.assertFalse(VoteArchive.objects.filter(pk=question.pk).exists())
+        self.assertEqual(Vote.objects.filter(question=question).count(), 3)
+
+    def test_restore_skips_deleted_users(self):
+        """Restoring leaves out the votes of deleted users and returns how many rows came back."""
+        close_poll(self.ended.pk, archive=True)
+        self.users[0].delete()
+        self.assertEqual(restore_votes(self.ended), 2)
+        self.assertEqual(Vote.objects.filter(question=self.ended).count(), 2)
+
+    def test_command(self):
+        """The close_polls command closes the ended polls and reports how many."""
+        out = StringIO()
+        call_command('close_polls', '--archive-votes', stdout=out)
+        self.assertEqual(out.getvalue().strip(), 'Closed 1 polls.')
+        self.assertTrue(VoteArchive.objects.filter(pk=self.ended.pk).exists())
@@ -0,0 +1,69 @@
+"""Queued logging tests."""
+import json
+import logging
+import threading
+
+from django.test import SimpleTestCase
+
+from .. import log, metrics
+
+
+class BlockingHandler(logging.Handler):
+    """Handler that waits until released before it handles a record."""
+
+    def __init__(self):
+        """Start blocked."""
+        super().__init__()
+        self.unblocked = threading.Event()
+        self.messages = []
+
+    def emit(self, record):
+        """Wait for release, then keep the message."""
+        self.unblocked.wait(5)
+        self.messages.append(record.getMessage())
+
+
+class QueuedLoggingTests(SimpleTestCase):
+    """Test cases for the bounded queue handler and the JSON formatter."""
+
+    def setUp(self):
+        """Use a private logger and reset the counters."""
+        metrics.reset()
+        self.logger = logging.getLogger('polls.tests.queued')
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        self.target = BlockingHandler()
+        self.logger.addHandler(self.target)
+        self.addCleanup(self.logger.removeHandler, self.target)
+        self.addCleanup(log.stop_listeners)
+
+    def test_records_reach_original_handlers(self):
+        """Records logged on the request thread are emitted by the listener with lazy arguments applied."""
+        handler = log.queue_logger(self.logger)
+        self.addCleanup(self.logger.removeHandler, handler)
+        self.target.unblocked.set()
+        self.logger.info('User %s voted for question id: %s', 'nice', 1)
+        log.stop_listeners()
+        self.assertEqual(self.target.messages, ['User nice voted for question id: 1'])
+
+    def test_full_queue_drops_records(self):
+        """When the sink is stuck the caller never blocks, extra records are dropped and counted."""
+        handler = log.queue_logger(self.logger, maxsize=2)
+        self.addCleanup(self.logger.removeHandler, handler)
+        for i in range(10):
+            self.logger.info('record %d', i)
+        self.assertGreaterEqual(handler.dropped, 7)
+        self.assertEqual(metrics.get_counters()['log_records_dropped'], handler.dropped)
+        self.target.unblocked.set()
+        log.stop_listeners()
+        self.assertEqual(len(self.target.messages) + handler.dropped, 10)
+
+    def test_json_formatter(self):
+        """The JSON formatter writes the message and the extra fields of a record."""
+        record = self.logger.makeRecord(
+            self.logger.name, logging.INFO, __file__, 1, 'Request %s', ('GET',), None, extra={'queries': 2},
+        )
+        entry = json.loads(log.JsonFormatter().format(record))
+        self.assertEqual(entry['message'], 'Request GET')
+        self.assertEqual(entry['queries'], 2)
+        self.assertEqual(entry['level'], 'INFO')
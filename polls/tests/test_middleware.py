@@ -0,0 +1,48 @@
+"""Request timing middleware tests."""
+from django.shortcuts import reverse
+from django.test import TestCase, override_settings
+
+from ..cache import get_cache
+from .factories import create_question
+from .utils import MaxQueriesMixin
+
+
+class TimingMiddlewareTests(MaxQueriesMixin, TestCase):
+    """Test cases for the Server-Timing header and request logging."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create an open question with one choice."""
+        cls.question = create_question('Timed question', choices=['Timed choice'])
+
+    def setUp(self):
+        """Start with an empty cache."""
+        get_cache().clear()
+
+    def test_server_timing_header(self):
+        """Every response tells the number of queries and the db, view, render and total time."""
+        with self.assertMaxQueries(2):
+            response = self.client.get(reverse('polls:results', args=(self.question.id,)))
+        server_timing = response['Server-Timing']
+        self.assertIn('desc="2 queries"', server_timing)
+        for metric in ('db;dur=', 'view;dur=', 'render;dur=', 'total;dur='):
+            self.assertIn(metric, server_timing)
+
+    def test_request_logged_with_fields(self):
+        """A request is logged on polls.requests with its timings as fields."""
+        with self.assertLogs('polls.requests', 'INFO') as logs, self.assertMaxQueries(1):
+            self.client.get(reverse('polls:index'))
+        record = logs.records[0]
+        self.assertEqual(record.levelname, 'INFO')
+        self.assertEqual((record.method, record.path, record.status), ('GET', '/polls/', 200))
+        self.assertGreaterEqual(record.total_ms, record.view_ms)
+
+    @override_settings(POLLS_SLOW_REQUEST_MS=0)
+    def test_slow_request_logged_with_queries(self):
+        """A request over the threshold is logged at WARNING with its SQL."""
+        with self.assertLogs('polls.requests', 'WARNING') as logs, self.assertMaxQueries(2):
+            self.client.get(reverse('polls:results', args=(self.question.id,)))
+        record = logs.records[0]
+        self.assertEqual(record.queries, 2)
+        self.assertEqual(len(record.sql), 2)
+        self.assertIn('polls_question', record.sql[0][0])
@@ -0,0 +1,92 @@
+"""Query plan tests for the hot queries of the polls views."""
+import re
+import unittest
+
+from django.db import connection
+from django.db.models import Count
+from django.test import TestCase
+from django.utils import timezone
+
+from ..models import Question, Choice, Vote
+from .factories import make_questions, make_users, make_votes
+
+# A line of an SQLite plan that reads a polls table without any index, or
+# sorts rows because no index gives them in the wanted order.
+TABLE_SCAN = re.compile(r'SCAN (polls_\w+)$|USE TEMP B-TREE', re.MULTILINE)
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'Query plans are checked on SQLite.')
+class HotQueryPlanTests(TestCase):
+    """Every hot query of polls/views.py is answered from an index."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Seed questions, choices, users and votes, then let SQLite gather statistics."""
+        now = timezone.now()
+        questions = make_questions(200, choices=4, now=now)
+        choices = [choice for question in questions[:20] for choice in question.choices]
+        users = make_users(100)
+        make_votes([(user, choice) for user in users for choice in choices[::4]])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        cls.question = questions[0]
+        cls.choice = choices[0]
+        cls.user = users[0]
+        cls.now = now
+
+    def assertUsesIndex(self, queryset):
+        """Fail if the plan of queryset scans a polls table or sorts in a temporary b-tree."""
+        plan = queryset.explain()
+        self.assertIsNone(TABLE_SCAN.search(plan), plan)
+
+    def test_index_first_page(self):
+        """The first index page reads questions in pub_date, id order from the index."""
+        self.assertUsesIndex(Question.objects.with_status(self.now).order_by('-pub_date', '-pk')[:21])
+
+    def test_index_next_page(self):
+        """A later index page seeks into the pub_date, id index."""
+        queryset = Question.objects.with_status(self.now).before(self.question.pub_date, self.question.pk)
+        self.assertUsesIndex(queryset.order_by('-pub_date', '-pk')[:21])
+        self.assertIn('SEARCH polls_question USING INDEX polls_question_pub_id_idx', queryset.explain())
+
+    def test_open_questions(self):
+        """The can_vote range check on pub_date and end_date uses an index."""
+        self.assertUsesIndex(Question.objects.filter(pub_date__lte=self.now, end_date__gte=self.now))
+
+    def test_detail_previous_vote(self):
+        """The previous vote of a user on a question is found by the question, user index."""
+        self.assertUsesIndex(Vote.objects.filter(question=self.question, user=self.user))
+
+    def test_vote_choice_lookup(self):
+        """The vote view loads the choice by primary key within its question."""
+        self.assertUsesIndex(Choice.objects.filter(question_id=self.question.pk, pk=self.choice.pk))
+
+    def test_results_choices(self):
+        """The results view reads the choices of a question in primary key order from an index."""
+        self.assertUsesIndex(self.question.choice_set.with_percentage().order_by('pk'))
+
+    def test_admin_prefix_search(self):
+        """The admin search on the start of the question text uses the NOCASE index."""
+        queryset = Question.objects.filter(question_text__istartswith='Question 1')
+        self.assertIn('polls_question_text_prefix_idx', queryset.explain())
+
+    def test_prefix_index_in_model_state(self):
+        """The prefix search index is part of the model, so SQLite table rebuilds create it again."""
+        index = next(index for index in Question._meta.indexes if index.name == 'polls_question_text_prefix_idx')
+        self.assertIn('COLLATE "NOCASE"', str(index.create_sql(Question, connection.schema_editor())).upper())
+
+    def test_admin_status_filters(self):
+        """The open, closed and upcoming filters of the admin use an index."""
+        for state in ('open', 'closed', 'upcoming'):
+            with self.subTest(state=state):
+                self.assertUsesIndex(Question.objects.with_state(state, self.now))
+
+    def test_votes_per_choice(self):
+        """Counting the votes of a question per choice is answered from the question, choice index."""
+        self.assertUsesIndex(
+            Vote.objects.filter(question=self.question).values('choice').annotate(n=Count('id')).order_by()
+        )
+
+    def test_due_polls(self):
+        """close_polls finds the ended open polls from an index."""
+        self.assertUsesIndex(Question.objects.filter(closed=False, end_date__lt=self.now).order_by('end_date'))
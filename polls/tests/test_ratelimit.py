@@ -0,0 +1,145 @@
+"""Vote rate limiting tests."""
+from django.core.cache import caches
+from django.shortcuts import reverse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from .. import metrics, ratelimit
+from ..models import Vote
+from ..ratelimit import SharedTokenBucketLimiter, TokenBucketLimiter
+from ..views import get_client_ip
+from .factories import create_question, create_user
+from .utils import MaxQueriesMixin
+
+
+class TokenBucketTests(SimpleTestCase):
+    """Test cases for the token buckets."""
+
+    def test_burst_then_refill(self):
+        """A bucket lets burst requests through, then one per 1 / rate seconds."""
+        limiter = TokenBucketLimiter(rate=2, burst=3)
+        self.assertEqual([limiter.acquire('a', now=0) for _ in range(3)], [0, 0, 0])
+        self.assertAlmostEqual(limiter.acquire('a', now=0), 0.5)
+        self.assertEqual(limiter.acquire('a', now=0.5), 0)
+        self.assertEqual(limiter.acquire('b', now=0.5), 0)
+
+    def test_least_recently_used_evicted(self):
+        """Past max_keys the least recently used bucket is dropped."""
+        limiter = TokenBucketLimiter(rate=1, burst=1, max_keys=2)
+        limiter.acquire('a', now=0)
+        limiter.acquire('b', now=0)
+        limiter.acquire('a', now=0)
+        limiter.acquire('c', now=0)
+        self.assertEqual(len(limiter), 2)
+        self.assertEqual(list(limiter._buckets), ['a', 'c'])
+
+    def test_shared_between_processes(self):
+        """Limiters on the same cache share their buckets."""
+        caches['default'].clear()
+        first, second = (SharedTokenBucketLimiter(rate=1, burst=2) for _ in range(2))
+        self.assertEqual(first.acquire('a', now=0), 0)
+        self.assertEqual(second.acquire('a', now=0), 0)
+        self.assertGreater(first.acquire('a', now=0), 0)
+        self.assertGreater(second.acquire('a', now=0.1), 0)
+
+
+@override_settings(POLLS_VOTES_RATE=0.01, POLLS_VOTES_BURST=2)
+class VoteRateLimitTests(MaxQueriesMixin, TestCase):
+    """Test cases for the rate limit of the vote view."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create a user and an open question with a choice."""
+        cls.user = create_user('nice')
+        cls.question = create_question(choices=1)
+        cls.choice = cls.question.choices[0]
+
+    def setUp(self):
+        """Start with full buckets and zero counters."""
+        ratelimit.reset()
+        metrics.reset()
+        self.url = reverse('polls:vote', args=(self.question.pk,))
+
+    @override_settings(POLLS_VOTES_PER_ADDRESS_RATE=0.01, POLLS_VOTES_PER_ADDRESS_BURST=2)
+    def test_throttled_without_queries(self):
+        """Votes past the burst of the address get a 429 with Retry-After before any query."""
+        self.client.force_login(self.user)
+        for _ in range(2):
+            with self.assertMaxQueries(9):
+                response = self.client.post(self.url, {'choice': self.choice.pk})
+            self.assertEqual(response.status_code, 302)
+        with self.assertMaxQueries(0):
+            response = self.client.post(self.url, {'choice': self.choice.pk})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '100')
+        self.assertEqual(metrics.get_counters()['votes_per_address_throttled'], 1)
+        self.assertEqual(metrics.get_counters()['votes_per_address_throttled_ip'], 1)
+        self.assertEqual(Vote.objects.count(), 1)
+
+    def test_shared_address_not_limited(self):
+        """By default users behind one address only use up their own buckets."""
+        other = create_user('other')
+        for user in (self.user, other):
+            self.client.force_login(user)
+            for _ in range(2):
+                with self.assertMaxQueries(9):
+                    response = self.client.post(self.url, {'choice': self.choice.pk})
+                self.assertEqual(response.status_code, 302)
+        self.assertEqual(Vote.objects.count(), 2)
+
+    def test_user_limit_across_addresses(self):
+        """A user is limited even when the votes come from different addresses."""
+        self.client.force_login(self.user)
+        for address in ('10.0.0.1', '10.0.0.2'):
+            with self.assertMaxQueries(9):
+                self.client.post(self.url, {'choice': self.choice.pk}, REMOTE_ADDR=address)
+        with self.assertMaxQueries(1):
+            response = self.client.post(self.url, {'choice': self.choice.pk}, REMOTE_ADDR='10.0.0.3')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(metrics.get_counters()['votes_throttled_user'], 1)
+
+    def test_reads_not_limited(self):
+        """Only POSTs take tokens."""
+        for _ in range(3):
+            with self.assertMaxQueries(0):
+                response = self.client.get(self.url)
+            self.assertNotEqual(response.status_code, 429)
+
+    @override_settings(POLLS_VOTES_RATE=0)
+    def test_turned_off(self):
+        """A rate of 0 turns the limit off."""
+        self.client.force_login(self.user)
+        for _ in range(3):
+            with self.assertMaxQueries(9):
+                response = self.client.post(self.url, {'choice': self.choice.pk})
+            self.assertEqual(response.status_code, 302)
+
+    @override_settings(ROOT_URLCONF='mysite.urls_async', POLLS_VOTES_PER_ADDRESS_RATE=0.01,
+                       POLLS_VOTES_PER_ADDRESS_BURST=2)
+    async def test_async_vote(self):
+        """The async vote view is limited the same way, before the login redirect."""
+        for _ in range(2):
+            async with self.aassertMaxQueries(0):
+                response = await self.async_client.post(self.url, {'choice': self.choice.pk})
+            self.assertEqual(response.status_code, 302)
+        async with self.aassertMaxQueries(0):
+            response = await self.async_client.post(self.url, {'choice': self.choice.pk})
+        self.assertEqual(response.status_code, 429)
+
+
+class ClientAddressTests(SimpleTestCase):
+    """Test cases for the client address that votes are limited by."""
+
+    def get(self, remote_addr, forwarded):
+        """Return the client address of a request from remote_addr with X-Forwarded-For forwarded."""
+        return get_client_ip(RequestFactory().get('/', REMOTE_ADDR=remote_addr, HTTP_X_FORWARDED_FOR=forwarded))
+
+    def test_forwarded_for_ignored(self):
+        """Without trusted proxies X-Forwarded-For is whatever the client made up."""
+        self.assertEqual(self.get('10.0.0.1', '1.2.3.4'), '10.0.0.1')
+
+    @override_settings(POLLS_TRUSTED_PROXIES=['10.0.0.1', '10.0.0.2'])
+    def test_trusted_proxies(self):
+        """Behind trusted proxies the client is the last address they did not add."""
+        self.assertEqual(self.get('10.0.0.1', '6.6.6.6, 1.2.3.4, 10.0.0.2'), '1.2.3.4')
+        self.assertEqual(self.get('10.0.0.1', ''), '10.0.0.1')
+        self.assertEqual(self.get('1.2.3.4', '6.6.6.6'), '1.2.3.4')
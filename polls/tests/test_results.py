@@ -0,0 +1,116 @@
+"""Results page tests."""
+import datetime
+
+from django.shortcuts import reverse
+from django.test import TestCase
+from django.utils import timezone
+
+from .. import metrics, ratelimit
+from ..cache import get_cache, results_key, results_version
+from ..models import Question
+from .factories import PASSWORD, create_question, create_user
+from .utils import MaxQueriesMixin
+
+
+def create_results_question(question_text, choices):
+    """Create an open question with the given number of choices.
+
+    Choice `i` gets `i` votes stored in its counter.
+    """
+    return create_question(question_text, choices=choices, counts=list(range(choices)))
+
+
+class QuestionResultsViewTests(MaxQueriesMixin, TestCase):
+    """Test cases for results view."""
+
+    def setUp(self):
+        """Start every test with an empty results cache."""
+        get_cache().clear()
+
+    def test_unknown_question(self):
+        """The results of a question that does not exist returns a 404 not found."""
+        with self.assertMaxQueries(1):
+            response = self.client.get(reverse('polls:results', args=(1,)))
+        self.assertEqual(response.status_code, 404)
+        self.assertIsNone(results_version(1, create=False))
+
+    def test_totals_and_percentages(self):
+        """The results page shows each choice votes with its share and the total votes."""
+        question = create_results_question('Results question.', choices=3)
+        with self.assertMaxQueries(2):
+            response = self.client.get(reverse('polls:results', args=(question.id,)))
+        self.assertEqual(response.context['total_votes'], 3)
+        percentages = [round(choice.percentage, 1) for choice in response.context['choices']]
+        self.assertEqual(percentages, [0.0, 33.3, 66.7])
+        self.assertContains(response, 'Total votes: 3')
+
+    def test_no_votes(self):
+        """A question without votes shows zero percent instead of dividing by zero."""
+        question = create_results_question('Empty question.', choices=2)
+        question.choice_set.update(vote_count=0)
+        Question.objects.filter(pk=question.pk).update(vote_total=0)
+        with self.assertMaxQueries(2):
+            response = self.client.get(reverse('polls:results', args=(question.id,)))
+        self.assertEqual([choice.percentage for choice in response.context['choices']], [0.0, 0.0])
+
+    def test_query_count_does_not_grow_with_choices(self):
+        """The results page runs the same number of queries for 2 or 50 choices."""
+        small = create_results_question('Small question.', choices=2)
+        large = create_results_question('Large question.', choices=50)
+        with self.assertNumQueries(2):
+            self.client.get(reverse('polls:results', args=(small.id,)))
+        with self.assertNumQueries(2):
+            self.client.get(reverse('polls:results', args=(large.id,)))
+
+
+class ResultsCacheTests(MaxQueriesMixin, TestCase):
+    """Test cases for the results cache."""
+
+    def setUp(self):
+        """Start every test with an empty results cache and counters."""
+        ratelimit.reset()
+        get_cache().clear()
+        metrics.reset()
+
+    def test_second_request_is_a_hit(self):
+        """The second request for the same results runs no queries."""
+        question = create_results_question('Cached question.', choices=3)
+        self.client.get(reverse('polls:results', args=(question.id,)))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('polls:results', args=(question.id,)))
+        self.assertEqual(response.context['total_votes'], 3)
+        self.assertEqual(metrics.get_counters()['results_cache_hits'], 1)
+        self.assertEqual(metrics.get_counters()['results_cache_misses'], 1)
+
+    def test_vote_invalidates_results(self):
+        """A vote drops the cached results, so the next request shows the new total."""
+        question = create_results_question('Voted question.', choices=2)
+        self.client.get(reverse('polls:results', args=(question.id,)))
+        create_user('nice')
+        self.client.login(username='nice', password=PASSWORD)
+        with self.captureOnCommitCallbacks(execute=True), self.assertMaxQueries(9):
+            self.client.post(reverse('polls:vote', args=(question.id,)), {'choice': question.choices[0].id})
+        response = self.client.get(reverse('polls:results', args=(question.id,)))
+        self.assertEqual(response.context['total_votes'], 2)
+
+    def test_closed_question_has_no_expiry(self):
+        """Results of a question that has ended are cached without expiry."""
+        question = create_results_question('Closed question.', choices=2)
+        Question.objects.filter(pk=question.pk).update(end_date=timezone.now() - datetime.timedelta(hours=1))
+        self.client.get(reverse('polls:results', args=(question.id,)))
+        cache = get_cache()
+        self.assertIsNone(cache._expire_info[cache.make_key(results_key(question.id))])
+
+    def test_upcoming_question_expires(self):
+        """Results of a question that has not opened yet expire, so they are fresh once it opens."""
+        question = create_question('Upcoming question.', pub=1, end=2, choices=2)
+        self.client.get(reverse('polls:results', args=(question.id,)))
+        cache = get_cache()
+        self.assertIsNotNone(cache._expire_info[cache.make_key(results_key(question.id))])
+
+    def test_metrics_page(self):
+        """The metrics page exposes the hit and miss counters."""
+        question = create_results_question('Scraped question.', choices=1)
+        self.client.get(reverse('polls:results', args=(question.id,)))
+        response = self.client.get(reverse('polls:metrics'))
+        self.assertContains(response, 'polls_results_cache_misses_total 1')
@@ -0,0 +1,142 @@
+"""Live results stream tests."""
+import datetime
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.signals import request_finished
+from django.db import close_old_connections
+from django.shortcuts import reverse
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .. import metrics
+from ..cache import get_cache
+from ..feed import feed
+from ..models import Vote
+from .factories import create_question, make_users
+from .utils import MaxQueriesMixin
+
+
+def parse_event(chunk):
+    """Return the data of a results event as a dict."""
+    if isinstance(chunk, bytes):
+        chunk = chunk.decode()
+    fields = dict(line.split(': ', 1) for line in chunk.strip().splitlines())
+    return json.loads(fields['data'])
+
+
+@override_settings(POLLS_STREAM_MAX_RATE=50, POLLS_STREAM_HEARTBEAT=1, POLLS_STREAM_TIMEOUT=5)
+class ResultsStreamTest(MaxQueriesMixin, TestCase):
+    """Test cases for the Server-Sent Events stream of the results."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Initialize voters and the question with choices, and another question."""
+        cls.question = create_question('Test question', pub=0, end=3, choices=3)
+        cls.choices = cls.question.choices
+        cls.other = create_question('Other question', pub=0, end=3, choices=1)
+        cls.users = make_users(3)
+
+    def setUp(self):
+        """Start with an empty results cache and keep the URL of the stream."""
+        get_cache().clear()
+        self.url = reverse('polls:results_stream', args=(self.question.id,))
+
+    def cast(self, user, choice):
+        """Cast a vote and run its on commit callbacks, which publish it."""
+        with self.captureOnCommitCallbacks(execute=True):
+            Vote.objects.cast(user, choice)
+
+    async def close(self, response):
+        """Close the response as a server does when the client goes away.
+
+        Closing fires request_finished, which would close the connection of
+        the test transaction on a file database, so like the test client the
+        connection is kept open.
+        """
+        request_finished.disconnect(close_old_connections)
+        try:
+            await sync_to_async(response.close)()
+        finally:
+            request_finished.connect(close_old_connections)
+
+    async def test_stream_sends_new_tallies(self):
+        """The stream sends the current tallies, then the tallies after a vote."""
+        async with self.aassertMaxQueries(2):
+            response = await self.async_client.get(self.url)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = aiter(response.streaming_content)
+        first = parse_event(await anext(events))
+        self.assertEqual(first['total_votes'], 0)
+        self.assertTrue(first['open'])
+        self.assertEqual(feed.subscriber_count(self.question.id), 1)
+        await sync_to_async(self.cast)(self.users[0], self.choices[1])
+        update = parse_event(await anext(events))
+        self.assertEqual(update['total_votes'], 1)
+        self.assertEqual([choice['votes'] for choice in update['choices']], [0, 1, 0])
+        # Servers close the response when the client goes away.
+        await self.close(response)
+        self.assertEqual(feed.subscriber_count(self.question.id), 0)
+
+    async def test_burst_is_coalesced(self):
+        """A burst of votes reaches the stream as one update, loaded once."""
+        response = await self.async_client.get(self.url)
+        events = aiter(response.streaming_content)
+        await anext(events)
+        loads = metrics.get_counters().get('results_stream_snapshots', 0)
+        for user in self.users:
+            await sync_to_async(self.cast)(user, self.choices[0])
+        update = parse_event(await anext(events))
+        self.assertEqual(update['total_votes'], 3)
+        self.assertEqual(metrics.get_counters()['results_stream_snapshots'], loads + 1)
+        await self.close(response)
+
+    async def test_other_question_does_not_wake_stream(self):
+        """A vote on another question only sends keep-alive comments."""
+        choice = self.other.choices[0]
+        response = await self.async_client.get(self.url)
+        events = aiter(response.streaming_content)
+        await anext(events)
+        await sync_to_async(self.cast)(self.users[0], choice)
+        self.assertEqual(await anext(events), b': keep-alive\n\n')
+        await self.close(response)
+
+    async def test_closed_poll_stream_ends(self):
+        """The stream of a closed poll sends its tallies once and ends."""
+        self.question.end_date = timezone.now() - datetime.timedelta(days=1)
+        await self.question.asave()
+        response = await self.async_client.get(self.url)
+        chunks = [chunk async for chunk in response.streaming_content]
+        self.assertEqual(len(chunks), 1)
+        self.assertFalse(parse_event(chunks[0])['open'])
+        self.assertEqual(feed.subscriber_count(self.question.id), 0)
+
+    async def test_unknown_question(self):
+        """The stream of a question that does not exist returns a 404 not found."""
+        async with self.aassertMaxQueries(1):
+            response = await self.async_client.get(reverse('polls:results_stream', args=(12345,)))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(feed.subscriber_count(), 0)
+
+    def test_wsgi_sends_one_update(self):
+        """Under WSGI the stream sends the tallies once with a reconnect delay."""
+        with self.assertMaxQueries(2):
+            response = self.client.get(self.url)
+            chunks = list(response.streaming_content)
+        self.assertEqual(len(chunks), 1)
+        self.assertIn(b'retry: 5000\n', chunks[0])
+        self.assertEqual(parse_event(chunks[0])['total_votes'], 0)
+
+    def test_wsgi_reconnect_from_cache(self):
+        """A reconnect under WSGI reads the cached results instead of the database."""
+        self.client.get(reverse('polls:results', args=(self.question.id,)))
+        with self.assertMaxQueries(0):
+            response = self.client.get(self.url)
+            chunks = list(response.streaming_content)
+        self.assertEqual(parse_event(chunks[0])['total_votes'], 0)
+
+    def test_results_page_subscribes(self):
+        """The results page of an open poll loads the stream script."""
+        with self.assertMaxQueries(2):
+            response = self.client.get(reverse('polls:results', args=(self.question.id,)))
+        self.assertContains(response, f'data-stream="{self.url}"')
@@ -0,0 +1,121 @@
+"""Full-text search tests."""
+from django.db import connection
+from django.shortcuts import reverse
+from django.test import TestCase
+from django.utils import timezone
+
+from ..checks import check_search_triggers
+from ..models import Question
+from ..search import SearchPage, fts_query, ranked_ids, search_words
+from .factories import create_question as create_poll
+from .utils import MaxQueriesMixin
+
+
+def create_question(question_text, days=-1):
+    """Create a question published `days` from now that stays open for a week."""
+    return create_poll(question_text, pub=days, end=days + 7)
+
+
+class SearchQueryTests(TestCase):
+    """Test cases for turning what the reader typed into an index query."""
+
+    def test_words(self):
+        """Query syntax is dropped, only the words are kept."""
+        self.assertEqual(search_words('"cats" OR dogs* -(NEAR'), ['cats', 'OR', 'dogs', 'NEAR'])
+        self.assertEqual(search_words('   '), [])
+
+    def test_fts_query(self):
+        """Every word is quoted and the last one is a prefix once it is long enough."""
+        self.assertEqual(fts_query(['best', 'foo']), '"best" "foo"*')
+        self.assertEqual(fts_query(['best', 'pe']), '"best" "pe"')
+
+
+class SearchIndexTests(TestCase):
+    """Test cases for the full-text index kept in sync with the questions."""
+
+    def test_index_follows_changes(self):
+        """Created, edited and deleted questions are found, found by their new text and gone."""
+        question = create_question('Which programming language?')
+        self.assertEqual(ranked_ids('programming', 10), [question.pk])
+        question.question_text = 'Which editor?'
+        question.save()
+        self.assertEqual(ranked_ids('programming', 10), [])
+        self.assertEqual(ranked_ids('editor', 10), [question.pk])
+        question.delete()
+        self.assertEqual(ranked_ids('editor', 10), [])
+
+    def test_bulk_created(self):
+        """Questions created in bulk are indexed too."""
+        start = timezone.now()
+        Question.objects.bulk_create([
+            Question(question_text=f'Bulk question {i}', pub_date=start, end_date=start) for i in range(3)
+        ])
+        self.assertEqual(len(ranked_ids('bulk', 10)), 3)
+
+    def test_missing_triggers_reported(self):
+        """The database system check reports a full-text index that lost its triggers."""
+        if connection.vendor != 'sqlite':
+            self.skipTest('The triggers are on SQLite.')
+        self.assertEqual(check_search_triggers(None, databases=['default']), [])
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER polls_question_fts_update')
+        errors = check_search_triggers(None, databases=['default'])
+        self.assertEqual([error.id for error in errors], ['polls.E001'])
+        self.assertIn('polls_question_fts_update', errors[0].msg)
+
+    def test_accents(self):
+        """Accents are ignored on both sides."""
+        question = create_question('Café or tea?')
+        self.assertEqual(ranked_ids('cafe', 10), [question.pk])
+
+    def test_page(self):
+        """Pages hold the matches in rank order, with a link to the next page while there are more."""
+        for i in range(5):
+            create_question(f'Lunch option {i}')
+        first = SearchPage(Question.objects.with_status(), 'lunch', 1, size=3)
+        second = SearchPage(Question.objects.with_status(), 'lunch', 2, size=3)
+        self.assertEqual(len(first), 3)
+        self.assertEqual(first.next_query, 'q=lunch&page=2')
+        self.assertEqual(len(second), 2)
+        self.assertIsNone(second.next_query)
+        self.assertFalse({question.pk for question in first} & {question.pk for question in second})
+
+
+class SearchViewTests(MaxQueriesMixin, TestCase):
+    """Test cases for the public search page."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create an open question and one that is not published yet."""
+        create_question('Where to eat lunch?')
+        create_question('Where to travel?', days=3)
+
+    def test_search(self):
+        """The page lists the matching questions with their status."""
+        with self.assertMaxQueries(2):
+            response = self.client.get(reverse('polls:search'), {'q': 'where'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted((q.question_text, q.is_open) for q in response.context['questions']),
+                         [('Where to eat lunch?', True), ('Where to travel?', False)])
+        self.assertContains(response, 'Where to eat lunch?')
+
+    def test_no_match(self):
+        """A search without matches or without words says so."""
+        with self.assertMaxQueries(1):
+            response = self.client.get(reverse('polls:search'), {'q': 'dinner'})
+        self.assertContains(response, 'No polls match your search.')
+        with self.assertMaxQueries(0):
+            response = self.client.get(reverse('polls:search'))
+        self.assertContains(response, 'Type words to search the polls.')
+
+    def test_invalid_page(self):
+        """Page numbers that are not numbers or past the limit are not found."""
+        for page in ('x', '0', '1000'):
+            with self.subTest(page=page):
+                with self.assertMaxQueries(0):
+                    response = self.client.get(reverse('polls:search'), {'q': 'lunch', 'page': page})
+                self.assertEqual(response.status_code, 404)
+
+    def test_index_has_search_form(self):
+        """The index page links to the search."""
+        self.assertContains(self.client.get(reverse('polls:index')), f'action="{reverse("polls:search")}"')
@@ -0,0 +1,110 @@
+"""Session and cached user tests."""
+from django.conf import settings
+from django.shortcuts import reverse
+from django.test import TestCase, override_settings
+
+from .. import ratelimit
+from ..auth import get_cache, user_key
+from ..checks import check_user_cache
+from .factories import PASSWORD, create_question, create_user
+from .utils import MaxQueriesMixin
+
+CACHED_AUTH_MIDDLEWARE = [
+    'polls.middleware.CachedAuthenticationMiddleware'
+    if name == 'django.contrib.auth.middleware.AuthenticationMiddleware' else name
+    for name in settings.MIDDLEWARE
+]
+
+
+def table_queries(queries, table):
+    """Return the captured queries that read or write table."""
+    return [query['sql'] for query in queries if f'"{table}"' in query['sql']]
+
+
+class AnonymousSessionTests(MaxQueriesMixin, TestCase):
+    """Anonymous readers never get a session."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create an open question with a choice."""
+        cls.question = create_question(choices=1)
+
+    def test_no_session_for_readers(self):
+        """The index, detail and results pages neither touch nor create a session."""
+        for url in (reverse('polls:index'), reverse('polls:detail', args=(self.question.pk,)),
+                    reverse('polls:results', args=(self.question.pk,))):
+            with self.subTest(url=url), self.assertMaxQueries(2) as queries:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+                self.assertEqual(table_queries(queries, 'django_session'), [])
+                self.assertEqual(table_queries(queries, 'auth_user'), [])
+
+
+@override_settings(
+    SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies',
+    MESSAGE_STORAGE='django.contrib.messages.storage.cookie.CookieStorage',
+    MIDDLEWARE=CACHED_AUTH_MIDDLEWARE,
+)
+class CachedUserTests(MaxQueriesMixin, TestCase):
+    """Logged-in users are loaded from the cache, not the database."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create a user and an open question with a choice."""
+        cls.user = create_user('nice')
+        cls.question = create_question(choices=1)
+
+    def setUp(self):
+        """Log the user in and start with an empty user cache."""
+        ratelimit.reset()
+        get_cache().clear()
+        self.client.post(reverse('login'), {'username': 'nice', 'password': PASSWORD})
+
+    def test_user_from_cache(self):
+        """Only the first request after login loads the user, no request touches the session table."""
+        self.client.get(reverse('polls:index'))
+        self.assertIsNotNone(get_cache().get(user_key(self.user.pk)))
+        with self.assertMaxQueries(0) as queries:
+            response = self.client.get(reverse('polls:index'))
+        self.assertContains(response, 'Hello nice')
+        self.assertEqual(table_queries(queries, 'auth_user'), [])
+        self.assertEqual(table_queries(queries, 'django_session'), [])
+
+    def test_logout_drops_user(self):
+        """Logging out removes the cached user and the next request is anonymous."""
+        self.client.get(reverse('polls:index'))
+        self.client.post(reverse('logout'))
+        self.assertIsNone(get_cache().get(user_key(self.user.pk)))
+        with self.assertMaxQueries(1):
+            response = self.client.get(reverse('polls:index'))
+        self.assertFalse(response.context['user'].is_authenticated)
+
+    def test_password_change_ends_session(self):
+        """A new password drops the cached user, and the old session no longer authenticates."""
+        self.client.get(reverse('polls:index'))
+        self.user.set_password('another-password')
+        self.user.save()
+        self.assertIsNone(get_cache().get(user_key(self.user.pk)))
+        with self.assertMaxQueries(2):
+            response = self.client.get(reverse('polls:index'))
+        self.assertFalse(response.context['user'].is_authenticated)
+
+    def test_vote_with_cached_user(self):
+        """The cached user can vote."""
+        self.client.get(reverse('polls:index'))
+        with self.assertMaxQueries(7):
+            response = self.client.post(reverse('polls:vote', args=(self.question.pk,)),
+                                        {'choice': self.question.choices[0].pk})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.question.vote_set.get().user, self.user)
+
+    def test_shared_cache_required(self):
+        """The cached user must live in a cache every process shares."""
+        self.assertEqual([error.id for error in check_user_cache(None)], ['polls.E002'])
+        shared = {**settings.CACHES, 'users': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+                                               'LOCATION': 'polls_user_cache'}}
+        with override_settings(CACHES=shared, POLLS_USER_CACHE='users'):
+            self.assertEqual(check_user_cache(None), [])
+        with override_settings(MIDDLEWARE=[]):
+            self.assertEqual(check_user_cache(None), [])
@@ -0,0 +1,83 @@
+"""Static files pipeline tests."""
+import gzip
+import json
+import tempfile
+from pathlib import Path
+
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.utils.http import http_date
+
+from ..middleware import StaticFilesMiddleware, accepted_encodings
+
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'polls.storage.CompressedManifestStaticFilesStorage'},
+}
+
+
+class StaticFilesTest(SimpleTestCase):
+    """Test cases for the compressed manifest storage and the static files middleware."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Collect the polls static files into a temporary STATIC_ROOT."""
+        super().setUpClass()
+        directory = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(directory.cleanup)
+        cls.root = Path(directory.name)
+        cls.enterClassContext(override_settings(STATIC_ROOT=str(cls.root), STORAGES=STORAGES))
+        call_command('collectstatic', interactive=False, verbosity=0, ignore_patterns=['admin'])
+        manifest = json.loads((cls.root / 'staticfiles.json').read_text())
+        cls.script = manifest['paths']['polls/results.js']
+
+    def setUp(self):
+        """Make the middleware in front of a view that answers 404."""
+        self.middleware = StaticFilesMiddleware(lambda request: HttpResponse(status=404))
+        self.factory = RequestFactory()
+
+    def get(self, path, **headers):
+        """Send a GET request for path through the middleware."""
+        return self.middleware(self.factory.get(path, **headers))
+
+    def test_precompressed_copies(self):
+        """Text assets get a gzip copy with the same content."""
+        original = (self.root / self.script).read_bytes()
+        self.assertEqual(gzip.decompress((self.root / (self.script + '.gz')).read_bytes()), original)
+
+    def test_hashed_name_is_immutable(self):
+        """A hashed name is sent compressed and cached for a year."""
+        response = self.get(f'/static/{self.script}', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/javascript')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(gzip.decompress(response.content), (self.root / self.script).read_bytes())
+
+    def test_plain_name_short_lifetime(self):
+        """An unhashed name is sent uncompressed to clients without gzip and cached briefly."""
+        response = self.get('/static/polls/results.js')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response['Cache-Control'], 'public, max-age=60')
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+
+    def test_not_modified(self):
+        """A request with a current If-Modified-Since gets a 304."""
+        response = self.get(f'/static/{self.script}')
+        response = self.get(f'/static/{self.script}', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+        response = self.get(f'/static/{self.script}', HTTP_IF_MODIFIED_SINCE=http_date(0))
+        self.assertEqual(response.status_code, 200)
+
+    def test_other_requests_pass_through(self):
+        """Unknown files and other paths reach the rest of the stack."""
+        self.assertEqual(self.get('/static/polls/missing.js').status_code, 404)
+        self.assertEqual(self.get('/polls/').status_code, 404)
+
+    def test_accepted_encodings(self):
+        """Codings with a zero quality are refused and * accepts every coding."""
+        self.assertEqual(accepted_encodings('gzip, br;q=0'), {'gzip'})
+        self.assertEqual(accepted_encodings('*'), {'*', 'br', 'gzip'})
+        self.assertEqual(accepted_encodings(''), set())
@@ -0,0 +1,138 @@
+"""Shared tally store tests."""
+import os
+import tempfile
+
+from django.shortcuts import reverse
+from django.test import TestCase, override_settings
+
+from .. import ratelimit, tallies
+from ..cache import get_cache
+from ..models import Vote
+from ..tallies import LocalTallyStore, SQLiteTallyStore, TallyStore
+from .factories import create_question, create_user
+from .utils import MaxQueriesMixin
+
+
+class TallyStoreMixin:
+    """Tests every tally store passes; make_store() returns a new store."""
+
+    def test_unknown_question(self):
+        """A question is not counted until its counts are loaded."""
+        store = self.make_store()
+        store.record(1, 10)
+        self.assertIsNone(store.get(1))
+
+    def test_record_and_move(self):
+        """A vote adds one to its choice and a moved vote takes one from the previous choice."""
+        store = self.make_store()
+        version, counts = store.reconcile(1, {10: 0, 11: 2})
+        self.assertEqual(counts, {10: 0, 11: 2})
+        store.record(1, 10)
+        store.record(1, 10, previous_choice_id=11)
+        new_version, counts, _ = store.get(1)
+        self.assertEqual(counts, {10: 2, 11: 1})
+        self.assertGreater(new_version, version)
+
+    def test_reconcile(self):
+        """Reconciling replaces drifted counts and moves the version only when they change."""
+        store = self.make_store()
+        version, _ = store.reconcile(1, {10: 1})
+        self.assertEqual(store.reconcile(1, {10: 1})[0], version)
+        new_version, counts = store.reconcile(1, {10: 3, 11: 0})
+        self.assertGreater(new_version, version)
+        self.assertEqual(store.get(1)[1], {10: 3, 11: 0})
+
+
+class LocalTallyStoreTests(TallyStoreMixin, TestCase):
+    """Test cases for the in-process tally store."""
+
+    def make_store(self):
+        """Return a new local store."""
+        return LocalTallyStore()
+
+    def test_incomplete_store(self):
+        """A store that leaves out a method of TallyStore cannot be made."""
+        class NoClearStore(TallyStore):
+            get = LocalTallyStore.get
+            record = LocalTallyStore.record
+            reconcile = LocalTallyStore.reconcile
+
+        with self.assertRaises(TypeError):
+            NoClearStore()
+
+
+class SQLiteTallyStoreTests(TallyStoreMixin, TestCase):
+    """Test cases for the tally store in a shared SQLite file."""
+
+    def setUp(self):
+        """Put the store files in a temporary directory."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'tallies.sqlite3')
+
+    def make_store(self):
+        """Return a store in the temporary file."""
+        return SQLiteTallyStore(self.path)
+
+    def test_shared_between_stores(self):
+        """Votes counted by one store are read by another store on the same file, as other workers do."""
+        first, second = SQLiteTallyStore(self.path), SQLiteTallyStore(self.path)
+        first.reconcile(1, {10: 0, 11: 0})
+        second.record(1, 11)
+        first.record(1, 11)
+        self.assertEqual(first.get(1)[1], {10: 0, 11: 2})
+
+
+@override_settings(POLLS_TALLY_STORE='local', POLLS_TALLY_RECONCILE_INTERVAL=60)
+class TalliedResultsTests(MaxQueriesMixin, TestCase):
+    """Test cases for the results pages reading their counts from the tally store."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create an open question with two choices and a voter."""
+        cls.question = create_question('Tallied', choices=2)
+        cls.choices = cls.question.choices
+        cls.user = create_user()
+
+    def setUp(self):
+        """Start every test with empty caches, buckets and tally store."""
+        get_cache().clear()
+        ratelimit.reset()
+        tallies.reset()
+        self.addCleanup(tallies.reset)
+
+    def test_counts_from_store(self):
+        """The results show the counts of the store, which follow committed votes."""
+        url = reverse('polls:results', args=(self.question.pk,))
+        with self.assertMaxQueries(4):
+            response = self.client.get(url)
+        self.assertEqual(response.context['total_votes'], 0)
+        etag = response['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Vote.objects.cast(self.user, self.choices[1])
+        self.assertEqual(tallies.get_store().get(self.question.pk)[1], {self.choices[0].pk: 0, self.choices[1].pk: 1})
+        with self.assertMaxQueries(2):
+            response = self.client.get(url)
+        self.assertEqual([choice.vote_count for choice in response.context['choices']], [0, 1])
+        self.assertEqual(response.context['total_votes'], 1)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_moved_vote(self):
+        """A vote moved to another choice is moved in the store."""
+        self.client.get(reverse('polls:results', args=(self.question.pk,)))
+        with self.captureOnCommitCallbacks(execute=True):
+            Vote.objects.cast(self.user, self.choices[0])
+        with self.captureOnCommitCallbacks(execute=True):
+            Vote.objects.cast(self.user, self.choices[1])
+        with self.assertMaxQueries(2):
+            response = self.client.get(reverse('polls-api:question_results', args=(self.question.pk,)))
+        self.assertEqual([choice['votes'] for choice in response.json()['choices']], [0, 1])
+
+    @override_settings(POLLS_TALLY_RECONCILE_INTERVAL=0)
+    def test_reconcile_drift(self):
+        """Counts that drifted from the votes are fixed at the next reconcile."""
+        store = tallies.get_store()
+        store.reconcile(self.question.pk, {self.choices[0].pk: 5})
+        Vote.objects.create(question=self.question, choice=self.choices[1], user=self.user)
+        version, counts = tallies.get_tally(store, self.question.pk)
+        self.assertEqual(counts, {self.choices[0].pk: 0, self.choices[1].pk: 1})
@@ -0,0 +1,172 @@
+"""Bulk import and export tests."""
+import csv
+import datetime
+import io
+import json
+import tempfile
+from pathlib import Path
+
+from django.contrib.auth.models import Permission, User
+from django.core.management import CommandError, call_command
+from django.shortcuts import reverse
+from django.test import TestCase
+
+from ..cache import index_version
+from ..models import Question, Choice, Vote
+from .factories import PASSWORD, create_question, make_users
+from .utils import MaxQueriesMixin
+
+CSV_POLLS = '''question_text,pub_date,end_date,choice_text
+Favourite colour?,2020-10-01T00:00:00+00:00,2020-10-31T00:00:00+00:00,Red
+Favourite colour?,2020-10-01T00:00:00+00:00,2020-10-31T00:00:00+00:00,Blue
+Best pet?,2020-11-01 12:00,2020-11-30 12:00,Cat
+Best pet?,2020-11-01 12:00,2020-11-30 12:00,Dog
+Best pet?,2020-11-01 12:00,2020-11-30 12:00,Fish
+'''
+
+
+class ImportPollsTest(TestCase):
+    """Test cases for the import_polls command."""
+
+    def setUp(self):
+        """Make a directory for the files to import."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def import_file(self, name, content, *args):
+        """Write content to a file called name, import it and return the output."""
+        path = self.directory / name
+        path.write_text(content)
+        out = io.StringIO()
+        call_command('import_polls', str(path), *args, stdout=out)
+        return out.getvalue()
+
+    def test_import_csv(self):
+        """Consecutive rows of a question become one question with its choices."""
+        version = index_version()
+        # One insert of the questions and one of the choices, in a savepoint.
+        with self.assertNumQueries(4):
+            output = self.import_file('polls.csv', CSV_POLLS)
+        self.assertIn('Imported 2 questions with 5 choices.', output)
+        pets = Question.objects.get(question_text='Best pet?')
+        self.assertEqual(list(pets.choice_set.values_list('choice_text', flat=True)), ['Cat', 'Dog', 'Fish'])
+        self.assertEqual(pets.pub_date, datetime.datetime(2020, 11, 1, 12, tzinfo=datetime.timezone.utc))
+        self.assertNotEqual(index_version(), version)
+
+    def test_import_jsonl(self):
+        """JSON Lines records are imported the same way."""
+        lines = [
+            {'question_text': 'Tea or coffee?', 'pub_date': '2020-10-01T00:00:00Z',
+             'end_date': '2020-10-02T00:00:00Z', 'choice_text': choice}
+            for choice in ('Tea', 'Coffee')
+        ]
+        output = self.import_file('polls.jsonl', '\n'.join(json.dumps(line) for line in lines) + '\n')
+        self.assertIn('Imported 1 questions with 2 choices.', output)
+        self.assertEqual(Choice.objects.count(), 2)
+
+    def test_invalid_date(self):
+        """An invalid date stops the import with its line number."""
+        content = 'question_text,pub_date,end_date,choice_text\nBroken?,yesterday,2020-10-02,Yes\n'
+        with self.assertRaisesMessage(CommandError, "Line 2: pub_date 'yesterday' is not a date and time."):
+            self.import_file('polls.csv', content)
+        self.assertFalse(Question.objects.exists())
+
+    def test_invalid_text(self):
+        """A text that is not a string or is too long stops the import with its line number."""
+        record = {'question_text': 'Numbers?', 'pub_date': '2020-10-01T00:00:00Z', 'end_date': '2020-10-02T00:00:00Z'}
+        with self.assertRaisesMessage(CommandError, 'Line 1: choice_text 5 is not text.'):
+            self.import_file('polls.jsonl', json.dumps({**record, 'choice_text': 5}) + '\n')
+        with self.assertRaisesMessage(CommandError, 'Line 1: question_text is longer than 200 characters.'):
+            self.import_file('polls.jsonl', json.dumps({**record, 'question_text': 'x' * 201}) + '\n')
+        self.assertFalse(Question.objects.exists())
+
+    def test_unknown_format(self):
+        """A file without a known extension needs --format."""
+        with self.assertRaisesMessage(CommandError, 'use --format'):
+            self.import_file('polls.txt', CSV_POLLS)
+        self.assertIn('Imported 2 questions', self.import_file('polls.txt', CSV_POLLS, '--format', 'csv'))
+
+
+class ExportPollsTest(MaxQueriesMixin, TestCase):
+    """Test cases for the export_polls command and the admin downloads."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create a question with votes and an admin."""
+        cls.question = create_question('Test question', pub=-1, end=3, choices=2)
+        cls.choices = cls.question.choices
+        cls.users = make_users(3)
+        for i, user in enumerate(cls.users):
+            Vote.objects.cast(user, cls.choices[i % 2])
+        User.objects.create_superuser(username='admin', password=PASSWORD)
+
+    def export(self, *args):
+        """Run export_polls and return its output."""
+        out = io.StringIO()
+        call_command('export_polls', *args, stdout=out)
+        return out.getvalue()
+
+    def test_export_tallies_csv(self):
+        """The tallies export has one row per choice with its votes."""
+        rows = list(csv.DictReader(io.StringIO(self.export('tallies'))))
+        self.assertEqual([(row['choice_text'], row['votes']) for row in rows],
+                         [(choice.choice_text, str(Choice.objects.get(pk=choice.pk).vote_count))
+                          for choice in self.choices])
+
+    def test_export_votes_jsonl(self):
+        """The votes export has one object per vote with the voter and cast time."""
+        records = [json.loads(line) for line in self.export('votes', '--format', 'jsonl').splitlines()]
+        self.assertEqual(sorted(record['username'] for record in records), ['user0', 'user1', 'user2'])
+        self.assertTrue(all(record['cast_at'] for record in records))
+
+    def test_round_trip(self):
+        """A tallies export imports as a copy of the questions and choices."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'tallies.csv'
+            self.export('tallies', '--output', str(path))
+            call_command('import_polls', str(path), stdout=io.StringIO())
+        copy = Question.objects.exclude(pk=self.question.pk).get()
+        self.assertEqual(copy.question_text, self.question.question_text)
+        self.assertEqual(copy.pub_date, self.question.pub_date)
+        self.assertEqual(copy.choice_set.count(), 2)
+
+    def test_admin_download(self):
+        """The admin streams the votes export as a CSV attachment."""
+        self.client.login(username='admin', password=PASSWORD)
+        with self.assertMaxQueries(3):
+            response = self.client.get(reverse('admin:polls_question_export', args=('votes', 'csv')))
+            content = b''.join(response.streaming_content).decode()
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="polls-votes.csv"')
+        self.assertEqual(len(content.splitlines()), 4)
+        response = self.client.get(reverse('admin:polls_question_export', args=('users', 'csv')))
+        self.assertEqual(response.status_code, 404)
+
+    def test_admin_action(self):
+        """The admin action exports the tallies of the selected questions only."""
+        other = create_question('Other', pub=0, end=0, choices=['Other choice'])
+        self.client.login(username='admin', password=PASSWORD)
+        with self.assertMaxQueries(6):
+            response = self.client.post(reverse('admin:polls_question_changelist'), {
+                'action': 'export_tallies', '_selected_action': [other.pk],
+            })
+            rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual([row['choice_text'] for row in rows], ['Other choice'])
+
+    def test_admin_votes_need_vote_permission(self):
+        """Staff who may only view questions get the tallies but not the voters."""
+        staff = User.objects.create_user(username='staff', password=PASSWORD, is_staff=True)
+        staff.user_permissions.add(Permission.objects.get(codename='view_question'))
+        self.client.login(username='staff', password=PASSWORD)
+        response = self.client.get(reverse('admin:polls_question_export', args=('votes', 'csv')))
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(reverse('admin:polls_question_export', args=('tallies', 'csv')))
+        self.assertEqual(response.status_code, 200)
+
+    def test_admin_requires_staff(self):
+        """Users who are not staff are sent to the admin login."""
+        self.client.login(username='user0', password=PASSWORD)
+        with self.assertMaxQueries(2):
+            response = self.client.get(reverse('admin:polls_question_export', args=('votes', 'csv')))
+        self.assertEqual(response.status_code, 302)
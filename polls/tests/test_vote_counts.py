@@ -0,0 +1,136 @@
+"""Vote counter tests."""
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.shortcuts import reverse
+from django.test import TestCase
+
+from .. import ratelimit
+from ..models import Question, Choice, Vote, VoteHourly
+from ..signals import vote_cast, votes_deleted
+from .factories import PASSWORD, create_question, create_user, make_users
+from .utils import MaxQueriesMixin
+
+
+class VoteCounterTest(MaxQueriesMixin, TestCase):
+    """Test cases for the stored vote counters."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Initialize the user and the question with choices."""
+        cls.question = create_question('Test question', pub=0, end=3, choices=3)
+        cls.choices = cls.question.choices
+        create_user('nicenicegame')
+
+    def setUp(self):
+        """Log the user in."""
+        ratelimit.reset()
+        self.client.post(reverse('login'), {'username': 'nicenicegame', 'password': PASSWORD})
+
+    def vote(self, choice):
+        """Vote for choice through the vote view, within its query budget."""
+        with self.assertMaxQueries(10):
+            return self.client.post(reverse('polls:vote', args=(self.question.id,)), {'choice': choice.id})
+
+    def test_new_vote_increments_counters(self):
+        """A new vote adds one to the choice counter and the question total."""
+        self.vote(self.choices[0])
+        self.assertEqual(Choice.objects.get(pk=self.choices[0].pk).vote_count, 1)
+        self.assertEqual(Question.objects.get(pk=self.question.pk).vote_total, 1)
+
+    def test_changed_vote_moves_counter(self):
+        """Changing a vote moves one count between choices and keeps the total."""
+        self.vote(self.choices[0])
+        self.vote(self.choices[1])
+        self.assertEqual(Choice.objects.get(pk=self.choices[0].pk).vote_count, 0)
+        self.assertEqual(Choice.objects.get(pk=self.choices[1].pk).vote_count, 1)
+        self.assertEqual(Question.objects.get(pk=self.question.pk).vote_total, 1)
+        self.assertEqual(Vote.objects.count(), 1)
+
+    def test_same_vote_twice(self):
+        """Voting for the same choice again does not change the counters."""
+        self.vote(self.choices[2])
+        self.vote(self.choices[2])
+        self.assertEqual(Choice.objects.get(pk=self.choices[2].pk).vote_count, 1)
+        self.assertEqual(Question.objects.get(pk=self.question.pk).vote_total, 1)
+
+    def test_rebuild_vote_counts(self):
+        """The rebuild_vote_counts command repairs counters that drifted from the Vote table."""
+        self.vote(self.choices[0])
+        Choice.objects.filter(pk=self.choices[0].pk).update(vote_count=7)
+        Question.objects.filter(pk=self.question.pk).update(vote_total=0)
+        out = StringIO()
+        call_command('rebuild_vote_counts', stdout=out)
+        self.assertIn('Fixed 1 stale choice counters and 1 stale question totals.', out.getvalue())
+        self.assertEqual(Choice.objects.get(pk=self.choices[0].pk).vote_count, 1)
+        self.assertEqual(Question.objects.get(pk=self.question.pk).vote_total, 1)
+
+    def test_check_vote_counts(self):
+        """The --check option reports stale counters without fixing them."""
+        self.vote(self.choices[0])
+        Choice.objects.filter(pk=self.choices[0].pk).update(vote_count=7)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_vote_counts', '--check', stdout=StringIO())
+        self.assertEqual(Choice.objects.get(pk=self.choices[0].pk).vote_count, 7)
+
+    def test_reconcile_locks_before_counting(self):
+        """The counters are read, and locked where the database can, before the votes are counted."""
+        with self.assertMaxQueries(6) as queries:
+            Vote.objects.reconcile_counters(fix=False)
+        tables = [table for query in queries.captured_queries
+                  for table in ('polls_choice', 'polls_question', 'polls_vote') if f'FROM "{table}"' in query['sql']]
+        self.assertEqual(tables, ['polls_choice', 'polls_question', 'polls_vote', 'polls_vote'])
+
+    def test_deleted_votes_leave_counters(self):
+        """Deleting a vote, or the user who cast it, takes it off the counters and the hourly rollup."""
+        self.vote(self.choices[0])
+        Vote.objects.get().delete()
+        self.assertEqual(Choice.objects.get(pk=self.choices[0].pk).vote_count, 0)
+        self.assertEqual(Question.objects.get(pk=self.question.pk).vote_total, 0)
+        self.assertEqual(sum(VoteHourly.objects.values_list('count', flat=True)), 0)
+        self.vote(self.choices[1])
+        User.objects.get(username='nicenicegame').delete()
+        self.assertEqual(Choice.objects.get(pk=self.choices[1].pk).vote_count, 0)
+        self.assertEqual(Vote.objects.reconcile_counters(fix=False), ([], []))
+
+    def test_deleted_choice(self):
+        """Deleting a choice takes its votes off the question total."""
+        self.vote(self.choices[0])
+        Choice.objects.get(pk=self.choices[0].pk).delete()
+        self.assertEqual(Question.objects.get(pk=self.question.pk).vote_total, 0)
+        self.assertEqual(Vote.objects.reconcile_counters(fix=False), ([], []))
+
+    def test_deletions_grouped(self):
+        """Deleting a choice or a user with many votes takes them off in a few queries and one signal."""
+        users = make_users(50)
+        Vote.objects.cast_many([(user.pk, self.question.pk, self.choices[i % 2].pk) for i, user in enumerate(users)])
+        sent = []
+
+        def deleted(question_ids, **kwargs):
+            sent.append(question_ids)
+
+        votes_deleted.connect(deleted)
+        self.addCleanup(votes_deleted.disconnect, deleted)
+        with self.captureOnCommitCallbacks(execute=True), self.assertMaxQueries(6):
+            Choice.objects.get(pk=self.choices[0].pk).delete()
+        self.assertEqual(sent, [{self.question.pk}])
+        self.assertEqual(Question.objects.get(pk=self.question.pk).vote_total, 25)
+        with self.assertMaxQueries(7):
+            Vote.objects.filter(user__in=users[1:11]).delete()
+        self.assertEqual(Choice.objects.get(pk=self.choices[1].pk).vote_count, 20)
+        self.assertEqual(sum(VoteHourly.objects.values_list('count', flat=True)), 20)
+        self.assertEqual(Vote.objects.reconcile_counters(fix=False), ([], []))
+
+    def test_failing_receiver(self):
+        """A vote_cast receiver that raises is logged, and the committed vote still redirects to the results."""
+        def broken(**kwargs):
+            raise ConnectionError('cache is down')
+
+        vote_cast.connect(broken)
+        self.addCleanup(vote_cast.disconnect, broken)
+        with self.assertLogs('polls', 'ERROR') as logs, self.captureOnCommitCallbacks(execute=True):
+            response = self.vote(self.choices[0])
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('cache is down', logs.output[0])
+        self.assertEqual(Choice.objects.get(pk=self.choices[0].pk).vote_count, 1)
@@ -0,0 +1,109 @@
+"""Hourly vote rollup tests."""
+import datetime
+from io import StringIO
+
+from django.core.management import call_command
+from django.shortcuts import reverse
+from django.test import TestCase
+from django.utils import timezone
+
+from ..models import Vote, VoteHourly, hour_bucket
+from .factories import create_question, make_users
+from .utils import MaxQueriesMixin
+
+
+class VoteHourlyTest(MaxQueriesMixin, TestCase):
+    """Test cases for the rollup of votes per choice and hour."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Initialize users and the question with choices."""
+        cls.question = create_question('Test question', pub=-1, end=3, choices=3)
+        cls.choices = cls.question.choices
+        cls.users = make_users(3)
+
+    def setUp(self):
+        """Keep the current hour."""
+        self.hour = hour_bucket(timezone.now())
+
+    def buckets(self):
+        """Return the non-empty buckets as a {(choice_id, hour): count} dict."""
+        return {(choice_id, hour): count
+                for choice_id, hour, count in VoteHourly.objects.exclude(count=0).values_list('choice', 'hour', 'count')}
+
+    def assert_matches_rebuild(self):
+        """The maintained rollup equals the one recounted from the Vote table."""
+        maintained = self.buckets()
+        VoteHourly.objects.rebuild()
+        self.assertEqual(maintained, self.buckets())
+
+    def test_cast_counts_current_hour(self):
+        """A new vote adds one to its choice in the current hour."""
+        Vote.objects.cast(self.users[0], self.choices[0])
+        Vote.objects.cast(self.users[1], self.choices[0])
+        self.assertEqual(self.buckets(), {(self.choices[0].pk, self.hour): 2})
+        self.assert_matches_rebuild()
+
+    def test_changed_vote_moves_between_hours(self):
+        """A changed vote leaves the hour it was cast in and counts in the current hour."""
+        Vote.objects.cast(self.users[0], self.choices[0])
+        earlier = timezone.now() - datetime.timedelta(hours=3)
+        Vote.objects.update(cast_at=earlier)
+        VoteHourly.objects.rebuild()
+        Vote.objects.cast(self.users[0], self.choices[1])
+        self.assertEqual(self.buckets(), {(self.choices[1].pk, self.hour): 1})
+        self.assert_matches_rebuild()
+
+    def test_legacy_vote_without_cast_time(self):
+        """A vote from before cast times were recorded only counts once it changes."""
+        Vote.objects.cast(self.users[0], self.choices[0])
+        Vote.objects.update(cast_at=None)
+        VoteHourly.objects.rebuild()
+        self.assertEqual(self.buckets(), {})
+        Vote.objects.cast(self.users[0], self.choices[2])
+        self.assertEqual(self.buckets(), {(self.choices[2].pk, self.hour): 1})
+
+    def test_cast_many(self):
+        """Batched votes keep the rollup equal to a recount."""
+        Vote.objects.cast(self.users[0], self.choices[0])
+        Vote.objects.cast_many([
+            (self.users[0].pk, self.question.pk, self.choices[1].pk),
+            (self.users[1].pk, self.question.pk, self.choices[1].pk),
+            (self.users[2].pk, self.question.pk, self.choices[2].pk),
+        ])
+        self.assertEqual(self.buckets(), {(self.choices[1].pk, self.hour): 2, (self.choices[2].pk, self.hour): 1})
+        self.assert_matches_rebuild()
+
+    def test_backfill_command(self):
+        """The backfill command recounts the rollup from the votes."""
+        earlier = timezone.now() - datetime.timedelta(days=2)
+        Vote.objects.bulk_create([
+            Vote(question=self.question, choice=self.choices[0], user=self.users[0], cast_at=earlier),
+            Vote(question=self.question, choice=self.choices[0], user=self.users[1], cast_at=earlier),
+            Vote(question=self.question, choice=self.choices[1], user=self.users[2], cast_at=None),
+        ])
+        out = StringIO()
+        call_command('backfill_vote_hourly', stdout=out)
+        self.assertIn('Wrote 1 hourly vote buckets.', out.getvalue())
+        self.assertEqual(self.buckets(), {(self.choices[0].pk, hour_bucket(earlier)): 2})
+
+    def test_history_view(self):
+        """The history view reads the votes per hour and choice from the rollup."""
+        Vote.objects.cast(self.users[0], self.choices[0])
+        Vote.objects.cast(self.users[1], self.choices[2])
+        earlier = self.hour - datetime.timedelta(hours=5)
+        VoteHourly.objects.add({(self.question.pk, self.choices[1].pk, earlier): 4})
+        with self.assertMaxQueries(3):
+            response = self.client.get(reverse('polls:results_history', args=(self.question.id,)))
+        data = response.json()
+        self.assertEqual([choice['id'] for choice in data['choices']], [choice.pk for choice in self.choices])
+        self.assertEqual(data['history'], [
+            {'hour': earlier.isoformat(), 'votes': {str(self.choices[1].pk): 4}},
+            {'hour': self.hour.isoformat(), 'votes': {str(self.choices[0].pk): 1, str(self.choices[2].pk): 1}},
+        ])
+
+    def test_history_unknown_question(self):
+        """The history of a question that does not exist returns a 404 not found."""
+        with self.assertMaxQueries(1):
+            response = self.client.get(reverse('polls:results_history', args=(12345,)))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,44 @@
+"""Assertions shared by the polls tests."""
+from contextlib import asynccontextmanager, contextmanager
+
+from asgiref.sync import sync_to_async
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+
+
+class MaxQueriesMixin:
+    """Test case mixin with assertMaxQueries(), a query budget for a block.
+
+    Every view test runs its requests under a budget, so a change that
+    adds queries to a page fails the suite instead of slowing production.
+    """
+
+    def _check_queries(self, context, maximum):
+        executed = len(context)
+        if executed > maximum:
+            queries = '\n'.join(f'{number}. {query["sql"]}' for number, query in enumerate(context.captured_queries, 1))
+            self.fail(f'{executed} queries executed, at most {maximum} expected:\n{queries}')
+
+    @contextmanager
+    def assertMaxQueries(self, maximum, using='default'):
+        """Fail if the block runs more than maximum queries on the using database.
+
+        The failure lists every query, so the new one is easy to spot.
+        """
+        with CaptureQueriesContext(connections[using]) as context:
+            yield context
+        self._check_queries(context, maximum)
+
+    @asynccontextmanager
+    async def aassertMaxQueries(self, maximum, using='default'):
+        """Fail if the block runs more than maximum queries, in an async test.
+
+        The queries of the async ORM run in the test thread, so the
+        capture is started and stopped there.
+        """
+        context = await sync_to_async(lambda: CaptureQueriesContext(connections[using]).__enter__())()
+        try:
+            yield context
+        finally:
+            await sync_to_async(context.__exit__)(None, None, None)
+        self._check_queries(context, maximum)
@@ -0,0 +1,227 @@
+"""Bulk import and streaming export of polls for KU Polls.
+
+Questions and choices are imported from CSV or JSON Lines with one record
+per choice: ``question_text``, ``pub_date``, ``end_date`` and
+``choice_text``.  Consecutive records of the same question (the same
+``question_id`` when the column is there, otherwise the same text and
+dates) make one question, so a tallies export can be imported again.
+
+Exports read their rows with ``iterator(chunk_size=...)`` and yield the
+encoded lines in chunks, so memory stays flat however many rows there are.
+"""
+import csv
+import datetime
+import json
+from itertools import groupby
+
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .cache import bump_index_version
+from .models import Question, Choice, Vote
+
+FORMATS = ('csv', 'jsonl')
+
+CONTENT_TYPES = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+
+TALLY_COLUMNS = ('question_id', 'question_text', 'pub_date', 'end_date', 'choice_id', 'choice_text', 'votes')
+
+VOTE_COLUMNS = ('vote_id', 'question_id', 'choice_id', 'username', 'cast_at')
+
+
+def read_records(stream, fmt):
+    """Yield (line number, record dict) pairs from a CSV or JSON Lines text stream.
+
+    Raise:
+        ValueError if a JSON line is not an object.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+        return
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as error:
+            raise ValueError(f'Line {number}: {error}') from error
+        if not isinstance(record, dict):
+            raise ValueError(f'Line {number}: expected a JSON object.')
+        yield number, record
+
+
+def parse_date(value, number, field):
+    """Return value as an aware datetime, naive values are in the current time zone.
+
+    Raise:
+        ValueError if value is not a date and time.
+    """
+    parsed = parse_datetime(str(value or '').strip())
+    if parsed is None:
+        raise ValueError(f'Line {number}: {field} {value!r} is not a date and time.')
+    return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed)
+
+
+def parse_text(record, field, number, model):
+    """Return the stripped text of field in record, empty if it is missing.
+
+    Raise:
+        ValueError if the value is not a string or is longer than the model field allows.
+    """
+    value = record.get(field)
+    if value is None:
+        return ''
+    if not isinstance(value, str):
+        raise ValueError(f'Line {number}: {field} {value!r} is not text.')
+    value = value.strip()
+    max_length = model._meta.get_field(field).max_length
+    if len(value) > max_length:
+        raise ValueError(f'Line {number}: {field} is longer than {max_length} characters.')
+    return value
+
+
+def read_questions(stream, fmt):
+    """Yield unsaved questions, each with the list of its choice texts in ``choice_texts``.
+
+    Raise:
+        ValueError if a record has no question text, a text that is not a
+        string or too long, or an invalid date.
+    """
+    def key(item):
+        number, record = item
+        if record.get('question_id') not in (None, ''):
+            return str(record['question_id'])
+        return record.get('question_text'), record.get('pub_date'), record.get('end_date')
+
+    for _, items in groupby(read_records(stream, fmt), key=key):
+        items = list(items)
+        number, record = items[0]
+        text = parse_text(record, 'question_text', number, Question)
+        if not text:
+            raise ValueError(f'Line {number}: question_text is empty.')
+        question = Question(
+            question_text=text,
+            pub_date=parse_date(record.get('pub_date'), number, 'pub_date'),
+            end_date=parse_date(record.get('end_date'), number, 'end_date'),
+        )
+        choice_texts = (parse_text(record, 'choice_text', number, Choice) for number, record in items)
+        question.choice_texts = [text for text in choice_texts if text]
+        yield question
+
+
+def _write_questions(questions):
+    with transaction.atomic():
+        if connection.features.can_return_rows_from_bulk_insert:
+            Question.objects.bulk_create(questions)
+        else:
+            for question in questions:
+                question.save()
+        choices = Choice.objects.bulk_create(
+            [Choice(question=question, choice_text=text) for question in questions for text in question.choice_texts],
+            batch_size=1000,
+        )
+    return len(questions), len(choices)
+
+
+def import_polls(stream, fmt, batch_size=500):
+    """Create the questions and choices read from stream, batch_size questions per transaction.
+
+    Raise:
+        ValueError on the first invalid record; the batches before it are kept.
+    Return:
+        Tuple of the number of (questions, choices) created.
+    """
+    created_questions = created_choices = 0
+    batch = []
+    try:
+        for question in read_questions(stream, fmt):
+            batch.append(question)
+            if len(batch) >= batch_size:
+                questions, choices = _write_questions(batch)
+                created_questions += questions
+                created_choices += choices
+                batch = []
+        if batch:
+            questions, choices = _write_questions(batch)
+            created_questions += questions
+            created_choices += choices
+    finally:
+        if created_questions:
+            # bulk_create sends no post_save, so move the index page on here.
+            bump_index_version()
+    return created_questions, created_choices
+
+
+def tally_rows(question_ids=None, chunk_size=2000):
+    """Yield the header, then one row per choice with its question and votes."""
+    choices = Choice.objects.order_by('question_id', 'pk')
+    if question_ids is not None:
+        choices = choices.filter(question_id__in=question_ids)
+    yield TALLY_COLUMNS
+    yield from choices.values_list(
+        'question_id', 'question__question_text', 'question__pub_date', 'question__end_date',
+        'pk', 'choice_text', 'vote_count',
+    ).iterator(chunk_size=chunk_size)
+
+
+def vote_rows(question_ids=None, chunk_size=2000):
+    """Yield the header, then one row per vote."""
+    votes = Vote.objects.order_by('pk')
+    if question_ids is not None:
+        votes = votes.filter(question_id__in=question_ids)
+    yield VOTE_COLUMNS
+    yield from votes.values_list(
+        'pk', 'question_id', 'choice_id', 'user__username', 'cast_at',
+    ).iterator(chunk_size=chunk_size)
+
+
+EXPORTS = {'tallies': tally_rows, 'votes': vote_rows}
+
+
+class _Echo:
+    """File-like object that returns what is written, for csv.writer."""
+
+    def write(self, value):
+        """Return value instead of writing it."""
+        return value
+
+
+def _csv_value(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return '' if value is None else value
+
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, datetime.datetime) else value
+
+
+def render(rows, fmt, chunk_bytes=64 * 1024):
+    """Yield rows from tally_rows() or vote_rows() encoded as CSV or JSON Lines.
+
+    Lines are joined into strings of about chunk_bytes, so a streamed
+    download is not sent one small write per row.
+    """
+    rows = iter(rows)
+    header = next(rows)
+    if fmt == 'csv':
+        writer = csv.writer(_Echo())
+        lines = (writer.writerow([_csv_value(value) for value in row]) for row in rows)
+        first = writer.writerow(header)
+    else:
+        lines = (json.dumps(dict(zip(header, map(_json_value, row)))) + '\n' for row in rows)
+        first = ''
+    buffer = [first]
+    size = len(first)
+    for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= chunk_bytes:
+            yield ''.join(buffer)
+            buffer = []
+            size = 0
+    if size:
+        yield ''.join(buffer)
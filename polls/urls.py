@@ -3,10 +3,20 @@ from django.urls import path
 
 from . import views
 
+
+def view_patterns(views):
+    """Return the URL patterns of the polls pages served by the views module."""
+    return [
+        path('', views.index, name='index'),
+        path('search/', views.search, name='search'),
+        path('<int:question_id>/', views.detail, name='detail'),
+        path('<int:question_id>/results/', views.results, name='results'),
+        path('<int:question_id>/results/stream/', views.results_stream, name='results_stream'),
+        path('<int:question_id>/results/history/', views.results_history, name='results_history'),
+        path('<int:question_id>/vote/', views.vote, name='vote'),
+        path('metrics/', views.metrics, name='metrics'),
+    ]
+
+
 app_name = 'polls'
-urlpatterns = [
-    path('', views.index, name='index'),
-    path('<int:question_id>/', views.detail, name='detail'),
-    path('<int:question_id>/results/', views.results, name='results'),
-    path('<int:question_id>/vote/', views.vote, name='vote')
-]
+urlpatterns = view_patterns(views)
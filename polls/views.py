@@ -1,57 +1,152 @@
 """Create Polls application view."""
-import logging.config
+import logging
+from itertools import groupby
+from operator import itemgetter
 
-from django.contrib import messages
+from django.conf import settings
+from django.contrib import auth, messages
 from django.contrib.auth import user_logged_in, user_logged_out, user_login_failed
 from django.contrib.auth.decorators import login_required
+from django.core.handlers.asgi import ASGIRequest
 from django.dispatch import receiver
-from django.http import HttpResponseRedirect
-from django.shortcuts import render, get_object_or_404, redirect
+from django.http import Http404, HttpResponse, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, redirect
+from django.template.response import TemplateResponse
 from django.urls import reverse
+from django.utils import timezone
 
-from .models import Question, Choice, Vote
-from .settings import LOGGING
+from . import metrics as polls_metrics
+from .cache import get_results, index_version, results_version
+from .conditional import conditional_response, index_validators, results_max_age, results_validators
+from .feed import EventStream, cached_snapshot, feed, format_event, load_snapshot
+from .ingest import cast_vote
+from .models import Question, Choice, Vote, VoteHourly
+from .pagination import KeysetPage
+from .ratelimit import rate_limit
+from .search import SearchPage
+from .tallies import tallied_results
 
-logging.config.dictConfig(LOGGING)
 logger = logging.getLogger('polls')
 
+# What the vote views load of the choice: its question and whether it can be voted on.
+VOTE_CHOICE_FIELDS = ('question__pub_date', 'question__end_date', 'question__closed')
+
 
 def get_client_ip(request):
-    """Return client ip address."""
-    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-    if x_forwarded_for:
-        ip = x_forwarded_for.split(',')[0]
-    else:
-        ip = request.META.get('REMOTE_ADDR')
-    return ip
+    """Return client ip address.
+
+    X-Forwarded-For is only read when the request comes from one of
+    POLLS_TRUSTED_PROXIES, and then the client is the last address in it
+    that is not a trusted proxy: the addresses before it are whatever the
+    client sent.
+    """
+    remote_addr = request.META.get('REMOTE_ADDR')
+    proxies = getattr(settings, 'POLLS_TRUSTED_PROXIES', ())
+    if remote_addr not in proxies:
+        return remote_addr
+    forwarded = [address.strip() for address in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',')]
+    for address in reversed(forwarded):
+        if address and address not in proxies:
+            return address
+    return remote_addr
+
+
+def vote_address_keys(request):
+    """Yield the rate limit key of the client address of a vote.
+
+    Many users may share one address behind a NAT, so the address has a
+    limit of its own, see POLLS_VOTES_PER_ADDRESS_RATE.
+    """
+    yield f'ip:{get_client_ip(request)}'
+
+
+def vote_rate_keys(request):
+    """Yield the rate limit key of the user of the session of a vote.
+
+    The user is read from the session only, so a throttled vote does not
+    load the user from the database.
+    """
+    try:
+        yield f'user:{auth._get_user_session_key(request)}'
+    except KeyError:
+        pass
 
 
 @receiver(user_logged_in)
 def user_logged_in_callback(sender, request, user, **kwargs):
     """Log the detail of user and ip address when user logged in."""
-    logger.info(f'User {user.username} logged in from {get_client_ip(request)}')
+    logger.info('User %s logged in from %s', user.username, get_client_ip(request))
 
 
 @receiver(user_logged_out)
 def user_logged_out_callback(sender, request, user, **kwargs):
     """Log the detail of user and ip address when user logged out."""
-    logger.info(f'User {user.username} logged out from {get_client_ip(request)}')
+    logger.info('User %s logged out from %s', user.username, get_client_ip(request))
 
 
 @receiver(user_login_failed)
 def user_login_failed_callback(sender, credentials, request, **kwargs):
     """Log the detail of user and ip address when user login failed."""
-    logger.warning(f'User {request.POST["username"]} login failed from {get_client_ip(request)}')
+    logger.warning('User %s login failed from %s', credentials.get('username'), get_client_ip(request))
 
 
 def index(request):
     """View for polls index page.
 
+    Questions are paginated newest first with the cursor in the ``after``
+    query parameter, and their open status is computed in the database
+    against one timestamp.  The first page is cached as a fragment, so its
+    query only runs when the fragment is rebuilt.
+
     Return:
-        Render HTML index page with context of all questions.
+        Render HTML index page with context of one page of questions.
+    """
+    now = timezone.now()
+    version = index_version()
+    try:
+        page = KeysetPage(
+            Question.objects.with_status(now),
+            cursor=request.GET.get('after'),
+            size=getattr(settings, 'POLLS_INDEX_PAGE_SIZE', 20),
+        )
+    except ValueError:
+        raise Http404('Invalid page.')
+    return conditional_response(request, index_validators(request, version, now), lambda: TemplateResponse(
+        request, 'polls/index.html', {
+            'questions': page,
+            'page': page,
+            'index_version': version if page.is_first else None,
+            'index_cache_timeout': getattr(settings, 'POLLS_INDEX_CACHE_TIMEOUT', 60),
+        },
+    ))
+
+
+def search(request):
+    """Search page for poll questions.
+
+    Questions that match every word of the ``q`` query parameter are
+    listed best match first, ``POLLS_INDEX_PAGE_SIZE`` per page, from the
+    full-text index, see polls.search.
     """
-    questions = Question.objects.all().order_by('-pub_date')
-    return render(request, 'polls/index.html', {'questions': questions})
+    text = request.GET.get('q', '').strip()
+    try:
+        number = int(request.GET.get('page', 1))
+    except ValueError:
+        raise Http404('Invalid page.')
+    if not 1 <= number <= getattr(settings, 'POLLS_SEARCH_MAX_PAGES', 50):
+        raise Http404('Invalid page.')
+    page = SearchPage(
+        Question.objects.with_status(timezone.now()), text, number,
+        size=getattr(settings, 'POLLS_INDEX_PAGE_SIZE', 20),
+    )
+    return TemplateResponse(request, 'polls/search.html', {
+        'questions': page,
+        'page': page,
+        'query': text,
+        'list_title': 'Matching Polls',
+        'next_label': 'More results',
+        'empty_message': 'No polls match your search.' if text else 'Type words to search the polls.',
+    })
 
 
 def detail(request, question_id):
@@ -66,22 +161,98 @@ def detail(request, question_id):
     if not question.can_vote():
         messages.info(request, 'Voting is not allowed!')
         return redirect('polls:index')
+    if not request.user.is_authenticated:
+        return TemplateResponse(request, 'polls/detail.html', {'question': question})
     try:
         previous_choice = question.vote_set.get(user=request.user).choice
     except (KeyError, Vote.DoesNotExist):
-        return render(request, 'polls/detail.html', {'question': question})
-    return render(request, 'polls/detail.html', {'question': question, 'previous_choice': previous_choice})
+        return TemplateResponse(request, 'polls/detail.html', {'question': question})
+    return TemplateResponse(request, 'polls/detail.html', {'question': question, 'previous_choice': previous_choice})
 
 
 def results(request, question_id):
     """Results page for the poll question.
 
     This page display all question choices and their votes.
+    The question and its choices with their share of the votes are
+    loaded with one query each, however many choices there are, and
+    kept in the results cache until the next vote.
+
+    A client that has the current page gets a 304 without a render, and
+    the results of a closed poll may be kept for a day.
+    """
+    now = timezone.now()
+    # Read before the results, so a vote in between makes the page look older, not newer;
+    # started only once the question is known to exist.
+    version = results_version(question_id, create=False)
+    results = tallied_results(get_results(question_id))
+    version = version or results_version(question_id)
+    question = results['question']
+    return conditional_response(
+        request, results_validators(request, results, version, now),
+        lambda: TemplateResponse(request, 'polls/results.html', results),
+        max_age=results_max_age(question, now),
+    )
+
+
+def results_history(request, question_id):
+    """Votes per hour for every choice of the poll question, as JSON.
+
+    Read from the hourly rollup only, so a poll costs one row per choice
+    and hour with votes however many votes it has.  Hours are UTC.
+    """
+    question = get_object_or_404(Question, pk=question_id)
+    buckets = (
+        VoteHourly.objects.filter(question=question).exclude(count=0)
+        .order_by('hour', 'choice').values_list('hour', 'choice_id', 'count')
+    )
+    return JsonResponse({
+        'question': question.pk,
+        'choices': [{'id': pk, 'text': text}
+                    for pk, text in question.choice_set.order_by('pk').values_list('pk', 'choice_text')],
+        'history': [
+            {'hour': hour.isoformat(), 'votes': {str(choice_id): count for _, choice_id, count in group}}
+            for hour, group in groupby(buckets, key=itemgetter(0))
+        ],
+    })
+
+
+async def results_stream(request, question_id):
+    """Stream the results of the poll question as Server-Sent Events.
+
+    Under ASGI the stream stays open and sends the new tallies after every
+    vote, coalesced to at most ``POLLS_STREAM_MAX_RATE`` updates a second.
+    Under WSGI an open stream would hold a worker thread, so the tallies
+    are sent once and the browser reconnects after ``POLLS_STREAM_RETRY_MS``.
     """
-    question = Question.objects.get(pk=question_id)
-    return render(request, 'polls/results.html', {'question': question})
+    retry_ms = getattr(settings, 'POLLS_STREAM_RETRY_MS', 5000)
+    if isinstance(request, ASGIRequest):
+        subscription = feed.subscribe(question_id)
+        try:
+            snapshot = await subscription.snapshot(load_snapshot)
+        except Http404:
+            subscription.close()
+            raise
+        events = EventStream(
+            subscription,
+            snapshot,
+            max_rate=getattr(settings, 'POLLS_STREAM_MAX_RATE', 2.0),
+            heartbeat=getattr(settings, 'POLLS_STREAM_HEARTBEAT', 15),
+            timeout=getattr(settings, 'POLLS_STREAM_TIMEOUT', 300),
+            retry_ms=retry_ms,
+        )
+    else:
+        # Every client reconnects on its own, so read the cache like the results page.
+        events = [format_event(await cached_snapshot(question_id), retry_ms)]
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Keep nginx from buffering the events.
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 
+@rate_limit('votes_per_address', vote_address_keys)
+@rate_limit('votes', vote_rate_keys)
 @login_required()
 def vote(request, question_id):
     """Vote for the selected choice in question.
@@ -92,21 +263,25 @@ def vote(request, question_id):
         If the choice is valid, redirect to results page.
         If not, render the detail page.
     """
-    question = get_object_or_404(Question, pk=question_id)
     try:
-        selected_choice = question.choice_set.get(pk=request.POST['choice'])
-    except (KeyError, Choice.DoesNotExist):
+        selected_choice = Choice.objects.select_related('question').only(*VOTE_CHOICE_FIELDS).get(
+            question_id=question_id, pk=request.POST['choice'])
+    except (KeyError, ValueError, Choice.DoesNotExist):
+        question = get_object_or_404(Question, pk=question_id)
         messages.error(request, "Please select one choice below for voting.")
-        return render(request, 'polls/detail.html', {'question': question})
+        return TemplateResponse(request, 'polls/detail.html', {'question': question})
+    if not selected_choice.question.can_vote():
+        messages.info(request, 'Voting is not allowed!')
+        return redirect('polls:index')
     else:
-        if question.vote_set.filter(user=request.user).exists():
-            this_vote = question.vote_set.get(user=request.user)
-            this_vote.choice = selected_choice
-            this_vote.save()
-        else:
-            selected_choice.vote_set.create(user=request.user, question=question)
+        cast_vote(request.user, selected_choice)
         vote_again_url = reverse('polls:detail', args=(question_id,))
         vote_again_url_with_html = f'<a href="{vote_again_url}">here</a>'
-        logger.info(f'User {request.user.username} voted for question id: {question.id} from {get_client_ip(request)}')
+        logger.info('User %s voted for question id: %s from %s', request.user.username, question_id, get_client_ip(request))
         messages.success(request, f'Vote successfully. Click {vote_again_url_with_html} to vote again.')
         return HttpResponseRedirect(reverse('polls:results', args=(question_id,)))
+
+
+def metrics(request):
+    """Counters of this process in the Prometheus text format."""
+    return HttpResponse(polls_metrics.render(), content_type='text/plain; version=0.0.4')